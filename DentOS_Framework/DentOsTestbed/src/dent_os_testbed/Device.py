@@ -6,11 +6,13 @@ import tempfile
 import time
 from enum import Enum, unique
 
-from net_utils.PingUtil import PingUtil
+from net_utils.IcmpProber import IcmpProber
 
 from dent_os_testbed.logger.Logger import DeviceLogger
 from dent_os_testbed.utils.ConnectionHandlers import ConnectionParams
 from dent_os_testbed.utils.ConnectionHandlers.ConnectionManager import ConnectionManager
+from dent_os_testbed.utils.ConnectionHandlers.DeviceAgent import DeviceAgentError, DeviceAgentStartError
+from dent_os_testbed.utils.ConnectionHandlers.SSHHandler import SSHConnection
 
 
 @unique
@@ -37,6 +39,9 @@ class Device(object):
     """
 
     PING_PKT_LOSS_TRESHOLD_PERCENT = 20
+    PING_PKT_COUNT = 5
+    PING_PKT_SUCCESSES = 3
+    PING_PKT_INTERVAL = 0.2
     SERIAL_LOG_FILE_NAME = 'serial_logs.txt'
     SSH_LOG_FILE_NAME = 'ssh_logs.txt'
     LOGS_BASE_DIR = './logs/'
@@ -61,6 +66,8 @@ class Device(object):
         try:
             self.loop = loop
             self.friendly_name = params['friendlyName']
+            # the connections created by the device tag the logs on their own
+            self.logger = logger
             self.applog = logger.tag_logs(self.friendly_name)
             self.applog.debug('Initializing device')
             self.os = params['os']
@@ -105,6 +112,11 @@ class Device(object):
                 .password(self.login['password'])
                 .hostname(self.host_name)
                 .logger(self.ssh_log)
+                .pool_size(params.get('sshPoolSize', -1))
+                .max_channels(params.get('sshMaxChannels', -1))
+                .idle_timeout(params.get('sshIdleTimeout', -1))
+                .root_shell(params.get('rootShell', False))
+                .agent(params.get('agent', False))
                 .build()
             )
             if 'pssh' in params:
@@ -130,6 +142,9 @@ class Device(object):
             self.conn_mgr = ConnectionManager(
                 logger, loop, self.ssh_conn_params, self.serial_conn_params
             )
+            # None until the first SSH connection attempt, see prewarm
+            self._reachable = None
+            self.conn_mgr.get_ssh_connection().add_listener(self._on_ssh_event)
             self.applog.debug('Device successfully initialized')
 
         except Exception as e:
@@ -151,21 +166,24 @@ class Device(object):
         """
         try:
             self.applog.debug('Testing reachability through ping..')
-            exec_time = 0
-            while exec_time <= timeout:
-                ping_chk_stime = time.time()
-                reachable = await PingUtil.verify_ping(
-                    self.ip, Device.PING_PKT_LOSS_TRESHOLD_PERCENT
+            start = time.time()
+            while True:
+                stats = await IcmpProber.get().probe(
+                    self.ip,
+                    count=Device.PING_PKT_COUNT,
+                    successes=Device.PING_PKT_SUCCESSES,
+                    interval=Device.PING_PKT_INTERVAL,
                 )
-                ping_chk_etime = time.time()
-                if reachable:
-                    self.applog.debug('Device is reachable through ping')
+                if stats['received'] and stats['loss'] <= Device.PING_PKT_LOSS_TRESHOLD_PERCENT:
+                    self.applog.debug(f'Device is reachable through ping {stats}')
                     return
-                exec_time += int(ping_chk_etime - ping_chk_stime)
+                elapsed = time.time() - start
+                if elapsed > timeout:
+                    break
                 self.applog.debug(
-                    f'Not reachable after {exec_time} secs, retrying ping to {self.host_name}'
+                    f'Not reachable after {elapsed:.1f} secs, retrying ping to {self.host_name}'
                 )
-            raise TimeoutError(f'No ping response from {self.host_name} after timeout secs')
+            raise TimeoutError(f'No ping response from {self.host_name} after {timeout} secs')
         except Exception as e:
             self._handle_exception(e, 'Error in ping')
 
@@ -216,7 +234,7 @@ class Device(object):
         except Exception as e:
             self._handle_exception(e, 'Error in scp')
 
-    async def run_cmd(self, cmd, console='ssh', sudo=False):
+    async def run_cmd(self, cmd, console='ssh', sudo=False, input=None):
         """
         Run the command on the devices console SSH/Serial
 
@@ -224,16 +242,34 @@ class Device(object):
             cmd(string): Command to execute on the device
             console(string): Console on which the command needs to be run ("ssh"/"serial")
             sudo(boolean): If set to true, the command will be executed as the sudo user
+            input(string): Data to feed to the standard input of the command (SSH only)
 
         Raises:
             Exception: For generic failures
         """
         try:
+            for shell in [self.conn_mgr.get_agent(), self.conn_mgr.get_root_shell()] if console == 'ssh' else []:
+                if not shell or not (sudo or cmd.startswith('sudo ') or self.username == 'root'):
+                    continue
+                # the agent and the shell are root already, no sudo needed
+                root_cmd = cmd[len('sudo '):] if not sudo and cmd.startswith('sudo ') else cmd
+                self.applog.debug(f'Executing command {root_cmd} in {shell.__class__.__name__}')
+                try:
+                    exit_status, stdout = await shell.run_cmd(root_cmd, input=input)
+                except DeviceAgentError as e:
+                    if shell.available and not isinstance(e, DeviceAgentStartError):
+                        raise
+                    # no agent running on the device, fall back to the shell or the SSH channels
+                    continue
+                self.applog.debug(f'{cmd} executed, ret_code = {exit_status}')
+                return exit_status, stdout
             if sudo:
                 cmd = self._get_sudo_cmd(cmd)
             self.applog.debug(f'Executing command {cmd}')
             if console == 'ssh':
-                exit_status, stdout = await self.conn_mgr.get_ssh_connection().run_cmd(cmd)
+                exit_status, stdout = await self.conn_mgr.get_ssh_connection().run_cmd(
+                    cmd, input=input
+                )
             elif console == 'serial':
                 exit_status, stdout = await self.conn_mgr.get_serial_connection().run_cmd(cmd)
             self.applog.debug(f'{cmd} executed, ret_code = {exit_status}')
@@ -241,6 +277,48 @@ class Device(object):
         except Exception as e:
             self._handle_exception(e, f'Error executing {cmd}')
 
+    async def stream_cmd(self, cmd, sudo=False):
+        """
+        Run a long-lived command on the device over SSH and yield its output
+        line by line as it is produced
+
+        Args:
+            cmd(string): Command to execute on the device
+            sudo(boolean): If set to true, the command will be executed as the sudo user
+
+        Raises:
+            Exception: For generic failures
+        """
+        try:
+            if sudo:
+                cmd = self._get_sudo_cmd(cmd)
+            self.applog.debug(f'Streaming command {cmd}')
+            async for line in self.conn_mgr.get_ssh_connection().stream_cmd(cmd):
+                yield line
+        except Exception as e:
+            self._handle_exception(e, f'Error streaming {cmd}')
+
+    async def stream_bytes(self, cmd, sudo=False):
+        """
+        Run a command on the device over SSH and yield its raw output in chunks,
+        e.g. to transfer an archive written to stdout over a single channel
+
+        Args:
+            cmd(string): Command to execute on the device
+            sudo(boolean): If set to true, the command will be executed as the sudo user
+
+        Raises:
+            Exception: For generic failures
+        """
+        try:
+            if sudo:
+                cmd = self._get_sudo_cmd(cmd)
+            self.applog.debug(f'Streaming command {cmd}')
+            async for chunk in self.conn_mgr.get_ssh_connection().stream_bytes(cmd):
+                yield chunk
+        except Exception as e:
+            self._handle_exception(e, f'Error streaming {cmd}')
+
     async def get_os_info(self):
         """
         Get OS information of the device
@@ -274,6 +352,47 @@ class Device(object):
         except Exception as e:
             self._handle_exception(e, 'Error in reboot')
 
+    def _on_ssh_event(self, connected):
+        if connected != self._reachable:
+            self.applog.debug(f'Device is {"reachable" if connected else "unreachable"}')
+        self._reachable = connected
+
+    @property
+    def is_reachable(self):
+        """
+        Cached SSH reachability of the device, kept up to date by the SSH connection
+        events without a round trip to the device. A device that was never connected
+        (no prewarm) is not known to be reachable, check_reachable probes it.
+        """
+        return self._reachable is True
+
+    async def check_reachable(self):
+        """
+        Reachability of the device, the cached one while the device is reachable and a
+        live probe (is_connected) when it was never connected or once it is not, so a
+        device that came back is used again
+
+        Returns:
+            True if the device is reachable
+        """
+        if self.is_reachable:
+            return True
+        self._on_ssh_event(await self.is_connected())
+        return self.is_reachable
+
+    async def prewarm(self):
+        """
+        Open and authenticate the SSH connections of the device
+
+        Returns:
+            True if the device is reachable
+        """
+        try:
+            await self.conn_mgr.get_ssh_connection().connect()
+        except Exception as e:
+            self.applog.info(f'Device is not reachable: {e}')
+        return self.is_reachable
+
     async def is_connected(self):
         """
         Verify connectivity (SSH) to the device.
@@ -293,6 +412,19 @@ class Device(object):
             self.applog.exception(f'Exception --> {Device.is_connected.__qualname__}', exc_info=e)
         return result
 
+    def open_ssh_connection(self, loop):
+        """
+        Create an SSH connection to the device outside of its pool, e.g. for a monitor running
+        on a loop of its own. It is opened on first use and the caller disconnects it.
+
+        Args:
+            loop: Event loop the connection is used from
+
+        Returns:
+            SSHConnection
+        """
+        return SSHConnection(self.logger, loop, self.ssh_conn_params)
+
     async def cleanup(self):
         """
         Clean up the device - Close open connections(SSH/Serial) of the device
@@ -12,13 +12,14 @@ class DeviceGroup:
     DeviceGroup class for controlling a group of devices
     """
 
-    def __init__(self, logger, loop):
+    def __init__(self, logger, loop, image_fanout=None):
         """
         Initializliation for DeviceGroup
 
         Args:
             logger(Logger.Apploger): Logger
             loop: Event loop to use for scheduling the async methods for this class
+            image_fanout(int): Max number of devices the OS image is pushed to at a time
 
         Raises:
             Exception: For generic failures.
@@ -26,7 +27,7 @@ class DeviceGroup:
         self.devices = []
         self.applog = logger
         self.loop = loop
-        self.installer = OsInstallerOnieSelect(self.applog, self.loop)
+        self.installer = OsInstallerOnieSelect(self.applog, self.loop, image_fanout=image_fanout)
 
     def add_device(self, device):
         """
@@ -64,12 +65,13 @@ class DeviceGroup:
         """
         pass
 
-    async def install_os(self, os_image_download_url):
+    async def install_os(self, os_image_download_url, sha256=None):
         """
         Install OS for this DeviceGroup (all the devices in the group)
 
         Args:
             os_image_download_url(str): HTTP url of the OS image
+            sha256(str): Expected sha256 of the OS image, optional
         """
         coroutines = []
         self.applog.debug('DeviceGroup::install_image++')
@@ -79,7 +81,7 @@ class DeviceGroup:
                 staging_path = '/onie-installer'
                 coroutines.append(
                     self.installer.install_os(
-                        device, os_image_download_url, staging_device, staging_path
+                        device, os_image_download_url, staging_device, staging_path, sha256=sha256
                     )
                 )
         results = await asyncio.gather(*coroutines, return_exceptions=True)
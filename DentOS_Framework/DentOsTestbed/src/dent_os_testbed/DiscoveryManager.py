@@ -118,4 +118,3 @@ class DiscoveryManager:
         # XXX rothcar -- all modules must pass!
 
         self.reports.saveReport(rpt)
-        self.reports.collectReports()
@@ -7,24 +7,29 @@ from dent_os_testbed.utils.perf_util import PerfUtil
 class PerfMonitor:
     """Class that abstracts PerfUtil"""
 
-    def __init__(self, logger, devices):
+    def __init__(self, logger, loop, devices, frequency, thresholds=None):
         """Initializer for PerfMonitor
         Args:
             logger (Logger.Apploger): Logger
+            loop: Event loop of the testbed, the samplers run on a loop of their own
             devices (list): List of Device instances whose performance needs to be monitored
+            frequency (int): Seconds between two samples of a device
+            thresholds (dict): Thresholds checked on every sample
         """
-        self.perf_util = PerfUtil(devices=devices)
+        self.perf_util = PerfUtil(
+            devices=devices, frequency=frequency, thresholds=thresholds or {}, loop=loop
+        )
         self.monitoring = False
         self.applog = logger
 
     def start(self):
-        """Start performance monitoring"""
+        """Start performance monitoring on a thread of its own"""
         try:
-            self.perf_util.start_monitoring()
+            self.perf_util.start_thread()
             self.monitoring = True
         except Exception as e:
             self.applog.exception(
-                f'Exception occured --> {PerfMonitor.start.__qualname__}', exec_info=e
+                f'Exception occured --> {PerfMonitor.start.__qualname__}', exc_info=e
             )
             raise
 
@@ -32,9 +37,27 @@ class PerfMonitor:
         """Stop performance monitoring monitoring"""
         try:
             if self.monitoring:
-                self.perf_util.stop_monitoring()
+                self.perf_util.stop_thread()
+                self.monitoring = False
         except Exception as e:
             self.applog.exception(
-                f'Exception occured --> {PerfMonitor.stop.__qualname__}', exec_info=e
+                f'Exception occured --> {PerfMonitor.stop.__qualname__}', exc_info=e
             )
             raise
+
+    def export(self, log_dir, fmt='csv'):
+        """Export the collected samples of each device to log_dir
+
+        Args:
+            log_dir (str): Directory to write perf_<host_name>.<fmt> files to
+            fmt (str): csv or parquet
+        """
+        try:
+            for path in self.perf_util.export(log_dir, fmt=fmt):
+                self.applog.info(f'Exported performance samples to {path}')
+            for violation in self.perf_util.get_violations():
+                self.applog.warning(f'Performance threshold violated: {violation}')
+        except Exception as e:
+            self.applog.exception(
+                f'Exception occured --> {PerfMonitor.export.__qualname__}', exc_info=e
+            )
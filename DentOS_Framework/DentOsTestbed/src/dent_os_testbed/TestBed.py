@@ -2,13 +2,16 @@
     Testbed contains devices and configurations.
     Orchestrates - installation, discovery and test execution.
 """
+import asyncio
 import json
-import time
 
+from dent_os_testbed.constants import LOGDIR
 from dent_os_testbed.Device import Device
 from dent_os_testbed.DeviceGroup import DeviceGroup
 from dent_os_testbed.DiscoveryManager import DiscoveryManager
-# from dent_os_testbed.PerfMonitor import PerfMonitor
+from dent_os_testbed.logger.Logger import DeviceLogger
+from dent_os_testbed.PerfMonitor import PerfMonitor
+from dent_os_testbed.utils.netlink_monitor import NetlinkMonitor
 from dent_os_testbed.utils.FileHandlers.FileHandlerFactory import (
     FileHandlerFactory,
     FileHandlerTypes,
@@ -41,7 +44,11 @@ class TestBed:
             file_handler = FileHandlerFactory.get_file_handler(FileHandlerTypes.LOCAL, self.applog)
             self.config = json.loads(file_handler.read(args.config))
             self.loop = loop
-            self.device_group = DeviceGroup(self.applog, self.loop)
+            DeviceLogger.MAX_OUTPUT_LOG = self.config.get('logOutputLimit', DeviceLogger.MAX_OUTPUT_LOG)
+            DeviceLogger.COMPRESS_ROTATED = self.config.get('logCompress', DeviceLogger.COMPRESS_ROTATED)
+            self.device_group = DeviceGroup(
+                self.applog, self.loop, image_fanout=self.config.get('osImageFanout', None)
+            )
             if args.use_pssh:
                 for cfg in self.config['devices']:
                     cfg['pssh'] = True
@@ -55,8 +62,18 @@ class TestBed:
             self.device_group.add_devices(self.devices)
             self.devices_dict = {d.host_name: d for d in self.devices}
             self.discovery_report = None
-            # self.perf_monitor = PerfMonitor(self.devices)
-            # self.perf_monitor.start()
+            self.perf_monitor = None
+            self.perf_util = None
+            if self.config.get('perfMonitorInterval', 0) > 0:
+                self.perf_monitor = PerfMonitor(
+                    self.applog,
+                    self.loop,
+                    [d for d in self.devices if d.os != 'ixnetwork'],
+                    self.config['perfMonitorInterval'],
+                    self.config.get('perfThresholds', {}),
+                )
+                self.perf_util = self.perf_monitor.perf_util
+                self.perf_monitor.start()
             self.applog.debug('TestBed initialized')
         except Exception as e:
             self.applog.exception('Error initializing testbed:', exc_info=e)
@@ -69,12 +86,40 @@ class TestBed:
         Raises:
             Exception: For generic failures.
         """
+        if self.perf_monitor:
+            # a failure to stop the samplers must not skip the cleanup of the devices
+            try:
+                self.perf_monitor.stop()
+                self.perf_monitor.export(LOGDIR)
+            except Exception:
+                self.applog.exception('Error occurred in stopping the performance monitor')
+        try:
+            NetlinkMonitor.stop_all()
+        except Exception:
+            self.applog.exception('Error occurred in stopping the netlink monitors')
         try:
-            # self.perf_monitor.stop()
             await self.device_group.cleanup()
         except Exception:
             self.applog.exception('Error occurred in stopping asyncio loop')
 
+    async def prewarm(self):
+        """
+        Open the SSH connections to all the devices concurrently, the reachability of the
+        devices is then tracked from the connection events (see Device.is_reachable)
+        """
+        devices = [d for d in self.devices if d.os != 'ixnetwork']
+        await asyncio.gather(*[d.prewarm() for d in devices])
+        unreachable = [d.host_name for d in devices if not d.is_reachable]
+        if unreachable:
+            self.applog.info(f'Unreachable devices: {unreachable}')
+
+    @property
+    def reachability(self):
+        """
+        Cached reachability of the devices {host_name: bool}
+        """
+        return {d.host_name: d.is_reachable for d in self.devices}
+
     async def install_os(self):
         """
         Install OS on the devices in the testbed
@@ -84,9 +129,11 @@ class TestBed:
         """
         try:
             self.applog.debug('TestBed::_install_image++')
-            await self.device_group.install_os(self.args.os_image_download_url)
+            await self.device_group.install_os(
+                self.args.os_image_download_url, sha256=self.config.get('osImageSha256', None)
+            )
+            # the installs return once the devices are reachable again
             self.applog.debug('TestBed::_install_image--')
-            time.sleep(7 * 60)
             # self.applog.debug("TestBed::_verify_image++")
             # await self.device_group.verify_os(self.args.os_image_download_url)
             # self.applog.debug("TestBed::_install_image--")
@@ -270,6 +270,7 @@ async def setup(args, applog):
         Exception: Generic errors
     """
     try:
+        await pytest.testbed.prewarm()
         if args.os_image_download_url is not None:
             await pytest.testbed.install_os()
         if args.discovery_force:
@@ -318,7 +319,7 @@ async def testbed_update_login_banner(devices, args, applog, add):
     for d in devices:
         if d.type == DeviceType.TRAFFIC_GENERATOR:
             continue
-        if not await d.is_connected():
+        if not await d.check_reachable():
             continue
         cos.append(_update_device_login_banner(d, args.notify_testbed, applog, add))
     results = await asyncio.gather(*cos, return_exceptions=False)
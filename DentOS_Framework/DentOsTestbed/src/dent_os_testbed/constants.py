@@ -11,6 +11,7 @@ OS_IMAGE_DOWNLOAD_URL = (
     'DENTOS-master_ONL-OS9_2020-09-01.2242-c800338_ARM64_INSTALLED_INSTALLER'
 )
 LOGDIR = 'logs'
+OS_IMAGE_CACHE_DIR = 'image_cache'
 DEFAULT_LOGGER = 'DENT'
 
 # First define the suite in PYTEST_SUITES and map the suite to a suite group in
@@ -0,0 +1,145 @@
+"""Module for caching OS images on the controller and pushing them to the devices
+"""
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+
+from dent_os_testbed.constants import OS_IMAGE_CACHE_DIR
+from dent_os_testbed.utils.Utils import download_file, get_url_validators
+
+
+class OsImageCache:
+    """
+    Content addressed cache of OS images, each image is downloaded once per URL
+    (and sha256 if given) and pushed to the devices over their SSH connections.
+    Without a sha256 the cached image is only used while the ETag, Last-Modified and
+    Content-Length of the URL are unchanged, so a moving URL (latest, nightly) is
+    downloaded again once it points to a new image
+    """
+
+    FANOUT = 4
+    HASH_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, logger, cache_dir=OS_IMAGE_CACHE_DIR, fanout=None):
+        """
+        Initializliation for OsImageCache
+
+        Args:
+            logger (Logger.Apploger): Logger
+            cache_dir (str): Local directory of the cached images
+            fanout (int): Max number of devices the image is pushed to at a time
+        """
+        self.applog = logger
+        self.cache_dir = cache_dir
+        self.fanout = fanout or OsImageCache.FANOUT
+        self._locks = {}
+        self._semaphore = None
+
+    @staticmethod
+    def _sha256(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(OsImageCache.HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _entry(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()[:16]
+        path = os.path.join(self.cache_dir, key, url.split('/')[-1])
+        return path, path + '.sha256', path + '.validators'
+
+    async def _is_current(self, url, validators_path):
+        # the cached image is still the one the URL points to
+        if not os.path.exists(validators_path):
+            return False
+        with open(validators_path) as f:
+            cached = json.load(f)
+        try:
+            current = await get_url_validators(url)
+        except Exception as e:
+            self.applog.debug(f'Could not revalidate {url}: {e}')
+            return False
+        return bool(cached) and cached == current
+
+    async def fetch(self, url, sha256=None):
+        """
+        Get the image of the URL from the cache, download it first if it is missing,
+        its content does not match sha256 or, without sha256, the URL changed
+
+        Args:
+            url (str): HTTP URL of the image
+            sha256 (str): Expected sha256 of the image, optional
+
+        Returns:
+            (path, sha256) of the cached image
+
+        Raises:
+            ValueError: If the downloaded image does not match sha256
+        """
+        lock = self._locks.setdefault(url, asyncio.Lock())
+        # concurrent installs of the same image share a single download
+        async with lock:
+            path, digest_path, validators_path = self._entry(url)
+            if os.path.exists(path) and os.path.exists(digest_path):
+                with open(digest_path) as f:
+                    digest = f.read().strip()
+                if digest == sha256 or (not sha256 and await self._is_current(url, validators_path)):
+                    self.applog.debug(f'Using cached image {path}')
+                    return path, digest
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + '.part'
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            self.applog.debug(f'Downloading {url} to {path}')
+            try:
+                validators = await download_file(url, tmp)
+            except Exception:
+                # a failed download is never cached
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+            digest = await asyncio.get_running_loop().run_in_executor(None, OsImageCache._sha256, tmp)
+            if sha256 and digest != sha256:
+                os.remove(tmp)
+                raise ValueError(f'Checksum mismatch for {url}: expected {sha256} got {digest}')
+            shutil.move(tmp, path)
+            with open(digest_path, 'w') as f:
+                f.write(digest)
+            with open(validators_path, 'w') as f:
+                json.dump(validators or {}, f)
+            return path, digest
+
+    async def _remote_sha256(self, device, remote_path):
+        rc, out = await device.run_cmd(f'sha256sum {remote_path}', sudo=True)
+        return out.split()[0] if rc == 0 and out.split() else None
+
+    async def push(self, device, url, remote_path, sha256=None):
+        """
+        Copy the image of the URL to remote_path of the device, at most fanout devices at a time,
+        the copy is skipped if the device already has the image
+
+        Args:
+            device (Device): Device to push the image to
+            url (str): HTTP URL of the image
+            remote_path (str): Path of the image on the device
+            sha256 (str): Expected sha256 of the image, optional
+
+        Raises:
+            Exception: If the image on the device does not match the cached one
+        """
+        path, digest = await self.fetch(url, sha256)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.fanout)
+        async with self._semaphore:
+            if await self._remote_sha256(device, remote_path) == digest:
+                self.applog.debug(f'{device.host_name} already has {remote_path}')
+                return
+            self.applog.debug(f'Pushing {path} to {device.host_name}:{remote_path}')
+            await device.scp(path, remote_path, sudo=True)
+            remote_digest = await self._remote_sha256(device, remote_path)
+        if remote_digest != digest:
+            e = Exception(f'Checksum mismatch of {remote_path} on {device.host_name}: {remote_digest}')
+            e.extra_info = device.friendly_name
+            raise e
@@ -1,8 +1,10 @@
 """Module for installing OS through onie-select
 """
-import os
+import asyncio
 import time
 
+from dent_os_testbed.installers.OsImageCache import OsImageCache
+
 
 class OsInstallerOnieSelect:
     """
@@ -10,14 +12,18 @@ class OsInstallerOnieSelect:
     """
 
     DEVICE_UP_WAIT_TIME_SECS = 60 * 3
+    DEVICE_DOWN_WAIT_TIME_SECS = 60 * 2
+    INSTALL_WAIT_TIME_SECS = 60 * 15
+    POLL_INTERVAL_SECS = 10
 
-    def __init__(self, logger, loop):
+    def __init__(self, logger, loop, image_fanout=None):
         """
         Initializliation for OsInstallerOnieSelect
 
         Args:
             logger (Logger.Apploger): Logger
             loop: Event loop to use for scheduling the async methods for this class
+            image_fanout (int): Max number of devices the OS image is pushed to at a time
 
         Raises:
             ValueError: If event loop is not passed
@@ -30,20 +36,22 @@ class OsInstallerOnieSelect:
                 )
             self.loop = loop
             self.applog = logger
+            self.image_cache = OsImageCache(logger, fanout=image_fanout)
         except Exception as e:
             if self.applog:
                 self.applog.exception('Error initializing OsInstallerOnieSelect', exc_info=e)
             raise
 
-    async def install_os(self, device, os_image_download_url, staging_device, staging_path):
+    async def install_os(self, device, os_image_download_url, staging_device, staging_path, sha256=None):
         """
-        Install OS
+        Install OS, returns once the device is reachable again
 
         Args:
             device (Device): Device on which the OS needs to be installed
             os_image_download_url (str): HTTP URL to download the OS image from
             staging_device (Device): Device to stage the OS image,from which onie-select picks it up
             staging_path(str): Path on the staging device to which the OS image is copied to.
+            sha256 (str): Expected sha256 of the OS image, optional
 
         Raises:
             ValueError: If event loop is not passed
@@ -51,9 +59,10 @@ class OsInstallerOnieSelect:
         """
         try:
             self.applog.debug('Starting installation..')
-            await self._stage_os_image(os_image_download_url, staging_device, staging_path)
+            await self._stage_os_image(os_image_download_url, staging_device, staging_path, sha256)
             await self._run_onie_select(device)
             await self._reboot(device)
+            await self._wait_for_device(device)
             self.applog.debug('Successfully installed image')
         except Exception as e:
             self.applog.exception('OsInstallerOnie.install_os', exc_info=e)
@@ -102,37 +111,63 @@ class OsInstallerOnieSelect:
             self.applog.exception(f'{OsInstallerOnieSelect._reboot.__qualname__}', exc_info=e)
             raise
 
+    async def _poll_connected(self, device):
+        try:
+            return await asyncio.wait_for(device.is_connected(), OsInstallerOnieSelect.POLL_INTERVAL_SECS)
+        except Exception:
+            return False
+
+    async def _wait_for_device(self, device):
+        """Wait for the device to go down for the install and come back with the new image"""
+        try:
+            start_time = time.time()
+            while True:
+                if not await self._poll_connected(device):
+                    break
+                if time.time() - start_time >= OsInstallerOnieSelect.DEVICE_DOWN_WAIT_TIME_SECS:
+                    # still up on the old image, onie-select or the reboot did not happen
+                    raise TimeoutError(f'{device.host_name} did not go down for the installation')
+                await asyncio.sleep(OsInstallerOnieSelect.POLL_INTERVAL_SECS)
+            self.applog.debug(f'Waiting for {device.host_name} to come back')
+            while time.time() - start_time < OsInstallerOnieSelect.INSTALL_WAIT_TIME_SECS:
+                if await self._poll_connected(device):
+                    self.applog.debug(f'{device.host_name} is up after {int(time.time() - start_time)}s')
+                    return
+                await asyncio.sleep(OsInstallerOnieSelect.POLL_INTERVAL_SECS)
+            raise TimeoutError(f'{device.host_name} is not up after the installation')
+        except Exception as e:
+            self.applog.exception(f'{OsInstallerOnieSelect._wait_for_device.__qualname__}', exc_info=e)
+            e.extra_info = device.friendly_name
+            raise
+
     async def _validate_installation(self, device, expected_version):
         try:
-            total_time = 0
-            while total_time <= OsInstallerOnieSelect.DEVICE_UP_WAIT_TIME_SECS:
-                start_time = time.time()
+            start_time = time.time()
+            os_info = None
+            while time.time() - start_time <= OsInstallerOnieSelect.DEVICE_UP_WAIT_TIME_SECS:
                 self.applog.debug('Retrieving OS info to validate installation')
-                os_info = await device.get_os_info()
-                if os_info == expected_version:
+                try:
+                    os_info = await device.get_os_info()
+                except Exception as e:
+                    # the device may still be booting
+                    self.applog.debug(f'Retrieving OS info failed: {e}')
+                if os_info and expected_version in os_info:
                     return
-                else:
-                    err_str = f'Installation failed. expected:{expected_version} actual:{os_info}'
-                    self.applog.error(err_str)
-                    raise Exception(err_str)
-                total_time += time.time() - start_time
-            raise TimeoutError('Installation timeout')
+                await asyncio.sleep(OsInstallerOnieSelect.POLL_INTERVAL_SECS)
+            err_str = f'Installation failed. expected:{expected_version} actual:{os_info}'
+            self.applog.error(err_str)
+            raise Exception(err_str)
         except Exception as e:
             self.applog.exception('Exception occured in retrieving OS information', exc_info=e)
             raise
 
-    async def _stage_os_image(self, os_image_download_url, staging_device, staging_path):
+    async def _stage_os_image(self, os_image_download_url, staging_device, staging_path, sha256=None):
         """OS image will be staged in the path 'onie_select_src_path; of 'onie_select_src_host'"""
         try:
             self.applog.debug(f'Staging OS image on {staging_device} at {staging_path}')
-            await staging_device.run_cmd(
-                f'wget {os_image_download_url} -O {staging_path}', sudo=True
-            )
+            # the image is downloaded once to the controller and pushed to each device
+            await self.image_cache.push(staging_device, os_image_download_url, staging_path, sha256)
             self.applog.debug('Staging complete')
         except Exception as e:
             self.applog.exception('Exception occured --> stage_os_image', exc_info=e)
             raise
-        finally:
-            if os.path.exists(staging_path):
-                self.applog.debug(f'Removing {staging_path}')
-                os.remove(staging_path)
@@ -1,15 +1,93 @@
 """ Logger module
+
+The log records are handed over to a single writer thread through a queue, the
+formatting by the handlers and the file I/O happen there instead of on the event
+loop thread.
 """
+import atexit
+import gzip
 import logging
 import logging.config
 import os
-from logging.handlers import TimedRotatingFileHandler
+import queue
+import shutil
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
 
 import yaml
 
 from dent_os_testbed.constants import LOGDIR
 
 app_logging_configured = False
+_log_writer = None
+
+
+class LogWriter(QueueListener):
+    """
+    Writer thread of the log pipeline, each queued item carries the handler it is meant for
+    """
+
+    def handle(self, item):
+        handler, record = item
+        if record.levelno >= handler.level:
+            handler.handle(record)
+
+
+def _get_log_writer():
+    global _log_writer
+    if _log_writer is None:
+        _log_writer = LogWriter(queue.SimpleQueue())
+        _log_writer.start()
+        # flush whatever is still queued on exit
+        atexit.register(stop_log_writer)
+    return _log_writer
+
+
+def stop_log_writer():
+    """
+    Stop the writer thread after it wrote all the queued records
+    """
+    global _log_writer
+    if _log_writer is not None:
+        _log_writer.stop()
+        _log_writer = None
+
+
+class AsyncLogHandler(QueueHandler):
+    """
+    Queues the records for the handler passed in. The message is merged with its arguments
+    at enqueue time (QueueHandler.prepare) since they may change before the writer thread
+    gets to them, the formatting by the handler and the write happen on the writer thread
+    """
+
+    def __init__(self, handler):
+        super(AsyncLogHandler, self).__init__(_get_log_writer().queue)
+        self.handler = handler
+        self.setLevel(handler.level)
+
+    def enqueue(self, record):
+        self.queue.put_nowait((self.handler, record))
+
+    def close(self):
+        self.handler.close()
+        super(AsyncLogHandler, self).close()
+
+
+def _gzip_rotator(source, dest):
+    with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def _defer_handlers(logger):
+    """
+    Move the handlers of the logger behind the writer thread
+    """
+    for handler in list(logger.handlers):
+        # console handlers stay in line with print
+        if not isinstance(handler, logging.FileHandler):
+            continue
+        logger.removeHandler(handler)
+        logger.addHandler(AsyncLogHandler(handler))
 
 
 def setup_logging(default_path='log_config.yaml', default_level=logging.INFO):
@@ -27,6 +105,7 @@ def setup_logging(default_path='log_config.yaml', default_level=logging.INFO):
                     os.makedirs(LOGDIR)
                 config = yaml.safe_load(f.read())
                 logging.config.dictConfig(config)
+                _defer_handlers(logging.getLogger())
                 app_logging_configured = True
             except Exception as e:
                 print(e)
@@ -182,6 +261,15 @@ class Logger:
         """
         self.logger.exception(*args, **kw_args)
 
+    def isEnabledFor(self, level):
+        """
+        Check if a message of the level would be logged, to skip building expensive messages
+
+        Args:
+            level (int): Log level
+        """
+        return self.logger.isEnabledFor(level)
+
     def tag_logs(self, tag):
         """
         Tag this logger with a given tag
@@ -201,6 +289,10 @@ class DeviceLogger(Logger):
     """
 
     LOG_MSG_FMT = '%(asctime)s - %(name)s - %(levelname)s  - %(message)s'
+    # max number of characters of a command output written to the log, 0 for no limit
+    MAX_OUTPUT_LOG = 64 * 1024
+    # gzip the rotated log files
+    COMPRESS_ROTATED = False
 
     def __init__(self, device_name=None, log_file_name=None, logger=None):
         """
@@ -218,6 +310,7 @@ class DeviceLogger(Logger):
             self.logger = logging.getLogger(device_name)
         elif logger:
             self.logger = logger
+            return
         else:
             raise ValueError(
                 'Either logger instance or device_name' + 'log_filename should be passed'
@@ -227,11 +320,29 @@ class DeviceLogger(Logger):
         if not os.path.exists(log_dir):
             os.makedirs(log_dir)
         handler = TimedRotatingFileHandler(
-            log_dir + '/' + log_file_name, when='h', interval=1, backupCount=10
+            log_dir + '/' + log_file_name, when='h', interval=1, backupCount=10, delay=True
         )
+        if DeviceLogger.COMPRESS_ROTATED:
+            handler.namer = lambda name: name + '.gz'
+            handler.rotator = _gzip_rotator
         handler.setLevel(logging.DEBUG)
         handler.setFormatter(logging.Formatter(DeviceLogger.LOG_MSG_FMT))
-        self.logger.addHandler(handler)
+        self.logger.addHandler(AsyncLogHandler(handler))
+
+    def output(self, output):
+        """
+        Debug log of a command output, truncated to MAX_OUTPUT_LOG characters
+
+        Args:
+            output (str): Output of the command
+        """
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        limit = DeviceLogger.MAX_OUTPUT_LOG
+        if limit and len(output) > limit:
+            self.logger.debug('%s\n... %d characters truncated', output[:limit], len(output) - limit)
+        else:
+            self.logger.debug('%s', output)
 
     def getChild(self, suffix):
         """
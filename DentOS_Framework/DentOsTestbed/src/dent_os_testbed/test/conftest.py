@@ -16,13 +16,11 @@ from dent_os_testbed.utils.test_utils.cleanup_utils import (
     cleanup_ip_addrs as _cleanup_ip_addrs,
     cleanup_bridges as _cleanup_bridges,
     cleanup_qdiscs as _cleanup_qdiscs,
-    cleanup_routes as _cleanup_routes,
     cleanup_bonds as _cleanup_bonds,
-    cleanup_vrf_table_ids as _cleanup_vrf_table_ids,
     cleanup_vrfs as _cleanup_vrfs,
     cleanup_sysctl as _cleanup_sysctl,
-    get_initial_routes,
-    get_initial_tables,
+    get_device_snapshot,
+    revert_to_snapshot,
 )
 from dent_os_testbed.utils.test_utils.tgen_utils import (
     tgen_utils_get_dent_devices_with_tgen,
@@ -190,26 +188,33 @@ async def cleanup_tgen(testbed):
     await tgen_utils_stop_traffic(tgen_dev)
 
 
-@pytest_asyncio.fixture
-async def cleanup_routes(testbed):
+async def _snapshot_and_revert(testbed, families):
     devices = await _get_dent_devs_from_testbed(testbed)
-    initial_routes = dict()
-    for dev in devices:
-        initial_routes[dev.host_name] = await get_initial_routes(dev)
+    snapshots = await asyncio.gather(*[get_device_snapshot(dev, families) for dev in devices])
     yield
-    routes_cleanups = [_cleanup_routes(dev, initial_routes[dev.host_name]) for dev in devices]
-    await asyncio.gather(*routes_cleanups)
+    await asyncio.gather(*[revert_to_snapshot(dev, snapshot) for dev, snapshot in zip(devices, snapshots)])
+
+
+@pytest_asyncio.fixture
+async def cleanup_routes(testbed):
+    async for _ in _snapshot_and_revert(testbed, ['routes']):
+        yield
 
 
 @pytest_asyncio.fixture
 async def cleanup_vrf_table_ids(testbed):
-    devices = await _get_dent_devs_from_testbed(testbed)
-    initial_tables = dict()
-    for dev in devices:
-        initial_tables[dev.host_name] = await get_initial_tables(dev)
-    yield
-    table_cleanups = [_cleanup_vrf_table_ids(dev, initial_tables[dev.host_name]) for dev in devices]
-    await asyncio.gather(*table_cleanups)
+    async for _ in _snapshot_and_revert(testbed, ['routes']):
+        yield
+
+
+@pytest_asyncio.fixture
+async def cleanup_state(testbed):
+    """
+    Revert the links (bridges, vrfs, bonds, ...), addresses, routes, qdiscs and
+    net sysctls of all the dent devices to their state before the test
+    """
+    async for _ in _snapshot_and_revert(testbed, ['links', 'addresses', 'routes', 'qdiscs', 'sysctls']):
+        yield
 
 
 @pytest_asyncio.fixture
@@ -7,7 +7,7 @@ from dent_os_testbed.lib.bridge.bridge_link import BridgeLink
 from dent_os_testbed.lib.interfaces.interface import Interface
 from dent_os_testbed.lib.ip.ip_link import IpLink
 from dent_os_testbed.lib.os.service import Service
-from dent_os_testbed.lib.os.system import System
+from dent_os_testbed.utils.test_utils.reboot_utils import reboot_devices_and_wait
 from dent_os_testbed.utils.test_utils.tb_utils import tb_reload_nw_and_flush_firewall
 from dent_os_testbed.utils.test_utils.tgen_utils import (
     tgen_utils_create_devices_and_connect,
@@ -66,9 +66,7 @@ async def test_dentv2_vlan_port_isolation_system_reload(testbed):
     await tb_reload_nw_and_flush_firewall(infra_devices)
     await _test_dentv2_vlan_port_isolation_helper(tgen_dev, infra_devices)
 
-    for dd in infra_devices:
-        out = await System.reboot(input_data=[{dd.host_name: [{}]}])
-        assert out[0][dd.host_name]['rc'] == 0, f'Failed to reboot system {out}'
+    await reboot_devices_and_wait(infra_devices)
 
     await tb_reload_nw_and_flush_firewall(infra_devices)
     await _test_dentv2_vlan_port_isolation_helper(tgen_dev, infra_devices)
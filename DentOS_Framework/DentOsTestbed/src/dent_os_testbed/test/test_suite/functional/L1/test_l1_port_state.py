@@ -1,9 +1,9 @@
-import asyncio
 import pytest
 import time
 
 from dent_os_testbed.lib.ip.ip_link import IpLink
 
+from dent_os_testbed.utils.test_utils.reboot_utils import reboot_device_and_wait
 from dent_os_testbed.utils.test_utils.tgen_utils import (
     tgen_utils_get_dent_devices_with_tgen
 )
@@ -68,14 +68,8 @@ async def port_state(testbed, counter, software_reboot=False):
             assert all(links_up), "One of the ports, or even all of them, are not in the 'UP' state."
         print(f"It took {datetime.now() - start_time} to set entities to 'UP' state.\n")
         if software_reboot:
-            await dent_dev.reboot()
-            start = time.time()
-            while time.time() < start + 300:
-                await asyncio.sleep(15)
-                device_up = await dent_dev.is_connected()
-                if device_up:
-                    break
-            assert device_up, f'Verify that device: {dent_dev} is up!\n'
+            # the ports are brought up and timed by the next iteration
+            await reboot_device_and_wait(dent_dev, timeout=300, ports=[])
 
 
 async def test_l1_port_state_status(testbed):
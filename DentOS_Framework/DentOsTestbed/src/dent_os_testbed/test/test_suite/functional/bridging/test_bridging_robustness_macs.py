@@ -2,6 +2,7 @@ import random
 import pytest
 import asyncio
 
+from dent_os_testbed.lib.bridge.bridge_fdb import BridgeFdb
 from dent_os_testbed.lib.ip.ip_link import IpLink
 
 from dent_os_testbed.utils.test_utils.tgen_utils import (
@@ -115,10 +116,11 @@ async def test_bridging_robustness_macs(testbed):
             loss = tgen_utils_get_loss(row)
             assert loss == 0, f'Expected loss: 0%, actual: {loss}%'
 
-        rc, out = await dent_dev.run_cmd("bridge fdb show br br0 | grep 'extern_learn.*offload' | wc -l")
-        assert rc == 0, "Failed to grep 'extern_learn.*offload'."
+        out = await BridgeFdb.count(input_data=[{dent_dev.host_name: [
+            {'br': 'br0', 'where': {'extern_learn': True, 'offload': True}}]}], parse_output=True)
+        assert out[0][dent_dev.host_name]['rc'] == 0, 'Failed to count the extern_learn offload entries.'
 
-        amount = int(out) - ixia_vhost_mac_count
+        amount = out[0][dent_dev.host_name]['parsed_output'] - ixia_vhost_mac_count
         err_msg = f'Expected count of extern_learn offload entities: >{mac_count}*{tolerance}, Actual count: {amount}'
         assert amount > mac_count*tolerance, err_msg
         if x != 2:
@@ -11,6 +11,7 @@ from dent_os_testbed.lib.bridge.bridge_vlan import BridgeVlan
 from dent_os_testbed.lib.ip.ip_link import IpLink
 from dent_os_testbed.lib.interfaces.interface import Interface
 
+from dent_os_testbed.utils.test_utils.reboot_utils import reboot_device_and_wait
 from dent_os_testbed.utils.test_utils.tgen_utils import (
     tgen_utils_start_traffic,
     tgen_utils_stop_traffic,
@@ -217,15 +218,8 @@ async def reboot_and_wait(dent_dev):
     Args:
         dent_dev (str): Dut name
     """
-    await dent_dev.reboot()
-    await asyncio.sleep(30)
-
-    async def _verify(dut):
-        is_up = await dut.is_connected()
-        assert is_up, 'DUT is not up'
-
-    await tgen_utils_poll(dent_dev, _verify, dut=dent_dev,
-                          interval=15, timeout=300)
+    # the config under test may bring up a different set of ports
+    await reboot_device_and_wait(dent_dev, timeout=300, ports=[])
 
     # https://github.com/dentproject/dentOS/issues/152#issuecomment-973264204
     rc, _ = await dent_dev.run_cmd('/lib/platform-config/current/onl/bin/onlpdump', sudo=True)
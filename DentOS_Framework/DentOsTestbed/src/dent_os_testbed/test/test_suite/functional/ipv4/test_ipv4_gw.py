@@ -61,7 +61,9 @@ async def test_ipv4_default_gw(testbed):
     port_mac = {}
     for port in ports:
         swp_info = {}
-        await tgen_utils_get_swp_info(dent_dev, port, swp_info)
+        # nothing was configured yet so the cached results are not stale, the ports of the
+        # same PVID vlan share the lookup of its address
+        await tgen_utils_get_swp_info(dent_dev, port, swp_info, cache=True)
         port_mac[port] = swp_info['mac']
     address_map = (
         # swp port, tg port,    swp ip,    tg ip,    plen, tg src mac
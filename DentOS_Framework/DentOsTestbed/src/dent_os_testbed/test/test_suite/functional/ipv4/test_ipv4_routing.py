@@ -403,7 +403,9 @@ async def test_ipv4_nexthop_static_route(testbed):
     port_mac = {}
     for port in ports:
         swp_info = {}
-        await tgen_utils_get_swp_info(dent_dev, port, swp_info)
+        # nothing was configured yet so the cached results are not stale, the ports of the
+        # same PVID vlan share the lookup of its address
+        await tgen_utils_get_swp_info(dent_dev, port, swp_info, cache=True)
         port_mac[port] = swp_info['mac']
 
     address_map = (
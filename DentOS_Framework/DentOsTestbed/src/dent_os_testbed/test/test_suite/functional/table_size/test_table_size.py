@@ -2,7 +2,9 @@ import asyncio
 import pytest
 import json
 
+from dent_os_testbed.lib.bridge.bridge_fdb import BridgeFdb
 from dent_os_testbed.lib.ip.ip_link import IpLink
+from dent_os_testbed.lib.ip.ip_route import IpRoute
 from dent_os_testbed.lib.tc.tc_qdisc import TcQdisc
 from dent_os_testbed.lib.tc.tc_chain import TcChain
 from dent_os_testbed.constants import PLATFORMS_CONSTANTS
@@ -84,11 +86,12 @@ async def test_ipv4_route_table_fill(testbed):
     assert rc == 0, 'Failed to fill routing table'
 
     # 4. Verify amount of route entries with matching mask
-    rc, out = await dent_dev.run_cmd('ip route | grep rt_offload | wc -l')
-    assert rc == 0, 'Failed to get number of offloaded route entries'
-    assert int(out) >= expected_route_entries, \
+    out = await IpRoute.count(input_data=[{dent: [{'where': {'rt_offload': True}}]}], parse_output=True)
+    assert out[0][dent]['rc'] == 0, 'Failed to get number of offloaded route entries'
+    amount = out[0][dent]['parsed_output']
+    assert amount >= expected_route_entries, \
         f'Device should support {expected_route_entries} offloaded routing entries, ' \
-        f'but only offloaded {out}'
+        f'but only offloaded {amount}'
 
 
 @pytest.mark.usefixtures('cleanup_bridges', 'cleanup_tgen')
@@ -173,10 +176,11 @@ async def test_bridging_mac_table_size(testbed):
         loss = tgen_utils_get_loss(row)
         assert loss == 0, f'Expected loss: 0%, actual: {loss}%'
 
-    rc, out = await dent_dev.run_cmd("bridge fdb show br br0 | grep 'extern_learn.*offload' | wc -l")
-    assert rc == 0, "Failed to grep 'extern_learn.*offload'."
+    out = await BridgeFdb.count(input_data=[{dent_dev.host_name: [
+        {'br': 'br0', 'where': {'extern_learn': True, 'offload': True}}]}], parse_output=True)
+    assert out[0][dent_dev.host_name]['rc'] == 0, 'Failed to count the extern_learn offload entries.'
 
-    amount = int(out) - num_tg_ports
+    amount = out[0][dent_dev.host_name]['parsed_output'] - num_tg_ports
     assert amount == mac_count, \
         f'Expected count of extern_learn offload entities: 4000, Actual count: {amount}'
 
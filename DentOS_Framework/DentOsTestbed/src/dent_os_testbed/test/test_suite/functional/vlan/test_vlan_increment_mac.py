@@ -2,6 +2,7 @@ import asyncio
 import pytest
 import json
 
+from dent_os_testbed.lib.bridge.bridge_fdb import BridgeFdb
 from dent_os_testbed.lib.ip.ip_link import IpLink
 from dent_os_testbed.lib.onlp.onlp_system_info import OnlpSystemInfo
 from dent_os_testbed.constants import PLATFORMS_CONSTANTS
@@ -147,10 +148,11 @@ async def test_vlan_with_increment_macs(testbed):
                     f'No traffic for traffic item : {row["Traffic Item"]} on port {row["Rx Port"]}'
 
         # 7. Verify all MAC entries were learnt or re-learnt on the VLAN
-        rc, number_of_macs = await dent_devices[0].run_cmd(
-            f"bridge fdb show dev {dut_ports[0]} | grep 'vlan {vlan}' | wc -l")
-        assert rc == 0, 'Failed getting learned vlans on the ports'
-        assert int(number_of_macs.strip()) > (mac_count * tolerance),\
-            f'Fail learning all macs with vlan: {vlan}expected {mac_count * tolerance} got {number_of_macs.strip()}'
+        out = await BridgeFdb.count(input_data=[{dent_devices[0].host_name: [
+            {'device': dut_ports[0], 'where': {'vlan': vlan}}]}], parse_output=True)
+        assert out[0][dent_devices[0].host_name]['rc'] == 0, 'Failed getting learned vlans on the ports'
+        number_of_macs = out[0][dent_devices[0].host_name]['parsed_output']
+        assert number_of_macs > (mac_count * tolerance),\
+            f'Fail learning all macs with vlan: {vlan}expected {mac_count * tolerance} got {number_of_macs}'
         await asyncio.sleep(5)  # in order tgen_utils_stop_traffic() to finish on TG
         await tgen_utils_clear_traffic_items(tgen_dev)
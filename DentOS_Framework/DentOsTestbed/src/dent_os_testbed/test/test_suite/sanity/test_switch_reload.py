@@ -8,12 +8,11 @@ import pytest
 
 from dent_os_testbed.lib.interfaces.interface import Interface
 from dent_os_testbed.lib.ip.ip_link import IpLink
-from dent_os_testbed.lib.os.system import System
 from dent_os_testbed.test.test_suite.sanity.test_check_links import check_and_validate_switch_links
+from dent_os_testbed.utils.test_utils.reboot_utils import reboot_device_and_wait, reboot_devices_and_wait
 from dent_os_testbed.utils.test_utils.tb_utils import (
     tb_check_all_devices_are_connected,
     tb_get_all_devices,
-    tb_reset_ssh_connections,
 )
 
 pytestmark = pytest.mark.suite_system_wide_testing
@@ -108,13 +107,8 @@ async def test_switch_reload_all(testbed):
                 #        host, k, v["operstate"], links[k]["operstate"]
                 #    )
 
-        for dev in devices:
-            await System.shutdown(input_data=[{dev.host_name: [{'options': '-r +1'}]}])
-
-        await tb_reset_ssh_connections(devices)
-        testbed.applog.info('zzzZZZ! (5min)')
-        for i in range(5):
-            time.sleep(60)
+        timings = await reboot_devices_and_wait(devices)
+        testbed.applog.info(f'Reboot timings {timings}')
 
 
 @pytest.mark.asyncio
@@ -159,11 +153,8 @@ async def test_switch_reload_one_switch(testbed):
         )
         for dev in devices:
             # reboot this node
-            out = await System.shutdown(input_data=[{dev.host_name: [{'options': '-r +1'}]}])
-            await tb_reset_ssh_connections(devices)
-            testbed.applog.info('zzzZZZ! (5min)')
-            for i in range(5):
-                time.sleep(60)
+            timings = await reboot_device_and_wait(dev)
+            testbed.applog.info(f'Reboot timings {timings}')
             # now check the links on all the nodes.
             await check_and_validate_switch_links(testbed)
             for dev1 in devices:
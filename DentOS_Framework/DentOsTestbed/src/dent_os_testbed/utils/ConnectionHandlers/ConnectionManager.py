@@ -1,8 +1,10 @@
 """ConnectionManager module to manage SSH and serial connections
 """
 
+from dent_os_testbed.utils.ConnectionHandlers.DeviceAgent import DeviceAgent
+from dent_os_testbed.utils.ConnectionHandlers.RootShell import RootShell
 from dent_os_testbed.utils.ConnectionHandlers.SerialHandler import SerialConsole
-from dent_os_testbed.utils.ConnectionHandlers.SSHHandler import SSHConnection
+from dent_os_testbed.utils.ConnectionHandlers.SSHConnectionPool import SSHConnectionPool
 
 
 class ConnectionManager:
@@ -10,7 +12,9 @@ class ConnectionManager:
     ConnectionManager class that implements APIs to get and release SSH/Serial connections.
     """
 
-    NUMBER_OF_SSH_CONNS = 1
+    NUMBER_OF_SSH_CONNS = 4
+    MAX_CHANNELS_PER_SSH_CONN = 8
+    SSH_CONN_IDLE_TIMEOUT = 300
 
     def __init__(self, logger, loop, ssh_conn_params=None, serial_conn_params=None):
         """
@@ -34,23 +38,61 @@ class ConnectionManager:
         self.applog = logger
         self.ssh_connection = None
         self.serial_connection = None
+        self.root_shell = None
+        self.agent = None
         self.loop = loop
         if ssh_conn_params:
-            self.ssh_connection = SSHConnection(logger, self.loop, ssh_conn_params)
+            self.ssh_connection = SSHConnectionPool(
+                logger,
+                self.loop,
+                ssh_conn_params,
+                pool_size=ssh_conn_params.pool_size
+                if ssh_conn_params.pool_size > 0
+                else ConnectionManager.NUMBER_OF_SSH_CONNS,
+                max_channels=ssh_conn_params.max_channels
+                if ssh_conn_params.max_channels > 0
+                else ConnectionManager.MAX_CHANNELS_PER_SSH_CONN,
+                idle_timeout=ssh_conn_params.idle_timeout
+                if ssh_conn_params.idle_timeout > 0
+                else ConnectionManager.SSH_CONN_IDLE_TIMEOUT,
+            )
+            if ssh_conn_params.root_shell:
+                self.root_shell = RootShell(logger, self.loop, self.ssh_connection, ssh_conn_params)
+            if ssh_conn_params.agent:
+                self.agent = DeviceAgent(logger, self.loop, self.ssh_connection, ssh_conn_params)
         if serial_conn_params:
             self.serial_connection = SerialConsole(logger, self.loop, serial_conn_params)
 
-    # TODO: Currently, we only have 1 connection. We need to extend this to
-    # a pool of connections per host
     def get_ssh_connection(self):
         """
-        Get a SSHConnection instance
+        Get the SSHConnectionPool of this device - It exposes the same APIs as
+        SSHConnection and spreads the commands over its pooled connections
 
         Returns:
-            SSHConnection
+            SSHConnectionPool
         """
         return self.ssh_connection
 
+    def get_root_shell(self):
+        """
+        Get the persistent root shell of this device
+
+        Returns:
+            RootShell or None when it is not enabled
+        """
+        return self.root_shell
+
+    def get_agent(self):
+        """
+        Get the device agent of this device
+
+        Returns:
+            DeviceAgent or None when it is not enabled or could not be started on the device
+        """
+        if self.agent and self.agent.available:
+            return self.agent
+        return None
+
     def get_serial_connection(self):
         """
         Get a SerialConsole instance
@@ -96,6 +138,10 @@ class ConnectionManager:
 
     async def _close_ssh_connection(self):
         try:
+            if self.root_shell:
+                await self.root_shell.close()
+            if self.agent:
+                await self.agent.close()
             await self.ssh_connection.disconnect()
         except Exception as e:
             self.applog.exception(
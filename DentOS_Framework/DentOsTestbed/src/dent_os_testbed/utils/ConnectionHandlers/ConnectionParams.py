@@ -28,6 +28,11 @@ class ConnectionParams:
         self.store_domain = builder._store_domain
         self.store_type = builder._store_type
         self.store_id = builder._store_id
+        self.pool_size = builder._pool_size
+        self.max_channels = builder._max_channels
+        self.idle_timeout = builder._idle_timeout
+        self.root_shell = builder._root_shell
+        self.agent = builder._agent
 
 
 class Builder:
@@ -53,6 +58,11 @@ class Builder:
         self._store_domain = ''
         self._store_type = ''
         self._store_id = ''
+        self._pool_size = -1
+        self._max_channels = -1
+        self._idle_timeout = -1
+        self._root_shell = False
+        self._agent = False
 
     def username(self, username):
         """
@@ -194,6 +204,56 @@ class Builder:
         self._store_id = store_id
         return self
 
+    def pool_size(self, pool_size):
+        """
+        Set pool_size (used in SSH connections) for this ConnectionParams.Builder.
+
+        Args:
+            pool_size(int): Number of SSH connections to keep to the device
+        """
+        self._pool_size = pool_size
+        return self
+
+    def max_channels(self, max_channels):
+        """
+        Set max_channels (used in SSH connections) for this ConnectionParams.Builder.
+
+        Args:
+            max_channels(int): Max number of concurrent channels per SSH connection
+        """
+        self._max_channels = max_channels
+        return self
+
+    def idle_timeout(self, idle_timeout):
+        """
+        Set idle_timeout (used in SSH connections) for this ConnectionParams.Builder.
+
+        Args:
+            idle_timeout(int): Seconds after which an unused SSH connection is closed
+        """
+        self._idle_timeout = idle_timeout
+        return self
+
+    def root_shell(self, root_shell):
+        """
+        Set root_shell (used in SSH connections) for this ConnectionParams.Builder.
+
+        Args:
+            root_shell(bool): Run the privileged commands in a persistent root shell
+        """
+        self._root_shell = root_shell
+        return self
+
+    def agent(self, agent):
+        """
+        Set agent (used in SSH connections) for this ConnectionParams.Builder.
+
+        Args:
+            agent(bool): Run the commands through the device agent
+        """
+        self._agent = agent
+        return self
+
     def build(self):
         """
         Build ConnectionParams with the attributes of this class.
@@ -0,0 +1,227 @@
+"""Module implementing the client of the device agent (dent_agent.py) - Used for running
+batched iproute2 operations and commands on the device over a single SSH channel
+"""
+import asyncio
+import json
+import os
+import re
+import shlex
+import uuid
+
+
+class DeviceAgentError(ConnectionError):
+    """
+    Raised when the agent could not be started or was lost with requests in flight
+    """
+
+
+class DeviceAgentStartError(DeviceAgentError):
+    """
+    Raised when the agent is not available or could not be started, nothing ran on the device
+    """
+
+
+class DeviceAgent:
+    """
+    DeviceAgent class - Starts dent_agent.py with python3 on the device over one SSH channel
+    and talks JSON-RPC to it, one JSON document per line on its stdin/stdout. The requests
+    are pipelined and matched to their responses by id. The agent source is fed over stdin
+    so nothing needs to be installed on the device. The agent is started again after it was
+    lost (connection drop, reboot) or when it is used from another event loop, the requests
+    in flight at that time fail with DeviceAgentError. A device without python3 (or with one
+    that can not run the agent) marks the agent unavailable, the other failures to start it
+    (e.g. a device in the middle of a reboot) are retried on the next call.
+    """
+
+    _SPAWN_TIMEOUT = 30
+    _EXIT_TIMEOUT = 5
+    _CHUNK_SIZE = 65536
+    # the agent can never run on this device
+    _UNAVAILABLE = re.compile(r'python3: (command )?not found|SyntaxError|ImportError')
+    _SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dent_agent.py')
+    # skips the sudo password when sudo did not ask for it, then runs the source that follows
+    _BOOTSTRAP = (
+        'import sys\n'
+        'while sys.stdin.readline().strip() != sys.argv[1]:\n'
+        '    pass\n'
+        'exec(sys.stdin.read(int(sys.stdin.readline())))\n'
+    )
+
+    def __init__(self, logger, loop, ssh_connection, connection_params):
+        """
+        Initializliation for DeviceAgent
+
+        Args:
+            logger (Logger.Apploger): Logger
+            loop: Event loop to use for scheduling the async methods for this class
+            ssh_connection (SSHConnectionPool): Connection to start the agent on
+            connection_params (ConnectionParams): Connection parameters
+
+        Raises:
+            ValueError: If event loop is not passed
+        """
+        if not loop:
+            raise ValueError('DeviceAgent class needs a running event loop to manage its async APIs')
+        self.applog = logger.tag_logs(connection_params.ip)
+        self.sshlog = connection_params.logger
+        self.loop = loop
+        self.ssh_connection = ssh_connection
+        self.user_name = connection_params.username
+        self.password = connection_params.password
+        self.available = True
+        self.process = None
+        self._reader = None
+        self._pending = {}
+        self._id = 0
+        # the lock is created on first use so it binds to the running loop
+        self._spawn_lock = None
+        self._agent_loop = None
+
+    def _check_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._agent_loop is loop:
+            return
+        # the futures and the reader of the agent belong to the previous loop
+        if self.process:
+            self._abort(self.process, 'event loop changed')
+        self._spawn_lock = asyncio.Lock()
+        self._agent_loop = loop
+
+    async def _spawn(self):
+        self._check_loop()
+        async with self._spawn_lock:
+            if self.process:
+                return
+            if not self.available:
+                raise DeviceAgentStartError('The device agent is not available')
+            marker = uuid.uuid4().hex
+            cmd = f'python3 -u -c {shlex.quote(DeviceAgent._BOOTSTRAP)} {marker}'
+            if self.user_name != 'root':
+                cmd = "sudo -S -p '' " + cmd
+            with open(DeviceAgent._SOURCE) as f:
+                source = f.read()
+            self.applog.debug('Starting device agent')
+            process = await self.ssh_connection.create_process(cmd)
+            try:
+                process.stdin.write(f'{self.password}\n{marker}\n{len(source)}\n{source}')
+                process.stdin.write(json.dumps({'id': 0, 'method': 'ping'}) + '\n')
+                line = await asyncio.wait_for(process.stdout.readline(), DeviceAgent._SPAWN_TIMEOUT)
+                if not line:
+                    result = await process.wait(timeout=DeviceAgent._EXIT_TIMEOUT)
+                    error = (result.stderr or '').strip()
+                    if result.exit_status == 127 or DeviceAgent._UNAVAILABLE.search(error):
+                        # no python3 on the device, do not try again for every command
+                        self.available = False
+                    raise DeviceAgentError(f'the agent exited with {result.exit_status}: {error}')
+                if 'result' not in json.loads(line):
+                    raise DeviceAgentError(f'unexpected response {line}')
+            except Exception as e:
+                process.close()
+                raise DeviceAgentStartError(f'Could not start the device agent: {e}')
+            self.process = process
+            self._reader = asyncio.ensure_future(self._read(process))
+            self.applog.debug('Device agent started')
+
+    async def _read(self, process):
+        # read in chunks, readline gives up on responses larger than the receive window
+        buf = ''
+        try:
+            while True:
+                data = await process.stdout.read(DeviceAgent._CHUNK_SIZE)
+                if not data:
+                    raise DeviceAgentError('the agent exited')
+                start = len(buf)
+                buf += data
+                end = buf.find('\n', start)
+                while end >= 0:
+                    self._dispatch(json.loads(buf[:end]))
+                    buf = buf[end + 1:]
+                    end = buf.find('\n')
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._abort(process, e)
+
+    def _dispatch(self, response):
+        fut = self._pending.pop(response['id'], None)
+        if not fut or fut.done():
+            return
+        if 'error' in response:
+            fut.set_exception(RuntimeError(response['error']))
+        else:
+            fut.set_result(response['result'])
+
+    def _abort(self, process, e):
+        if process is not self.process:
+            return
+        self.applog.debug(f'Device agent lost: {e}')
+        self.process = None
+        try:
+            process.close()
+        except Exception as ex:
+            self.applog.debug(f'Error closing the device agent: {ex}')
+        pending, self._pending = self._pending, {}
+        for fut in pending.values():
+            # the futures of a closed loop can not be completed anymore
+            if not fut.done() and not fut.get_loop().is_closed():
+                fut.set_exception(DeviceAgentError(f'Device agent lost: {e}'))
+        reader, self._reader = self._reader, None
+        if reader and reader is not asyncio.current_task() and not reader.get_loop().is_closed():
+            reader.cancel()
+
+    async def call(self, method, **params):
+        """
+        Call a method of the agent
+
+        Args:
+            method (str): ping, exec or batch, see dent_agent.handle
+            params: Arguments of the method
+
+        Returns:
+            result of the method
+
+        Raises:
+            DeviceAgentError: If the agent is not available or was lost
+            RuntimeError: If the method failed on the device
+        """
+        await self._spawn()
+        self._id += 1
+        process = self.process
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[self._id] = fut
+        try:
+            process.stdin.write(json.dumps({'id': self._id, 'method': method, 'params': params}) + '\n')
+        except Exception as e:
+            self._abort(process, e)
+        return await fut
+
+    async def run_cmd(self, cmd, input=None):
+        """
+        Run command on the device through the agent
+
+        Args:
+            cmd (str): Command to execute
+            input: Input data to feed to standard input of the command
+
+        Returns:
+            exit status and the output of the command (stdout followed by stderr)
+
+        Raises:
+            DeviceAgentError: If the agent is not available or was lost
+        """
+        if not cmd:
+            raise ValueError('Empty command is not allowed')
+        self.applog.debug(f'Running {cmd}')
+        self.sshlog.debug(cmd)
+        result = await self.call('exec', cmd=cmd, input=input)
+        self.sshlog.output(result['output'])
+        self.applog.debug(f'Executed {cmd}; exit_status {result["rc"]}')
+        return result['rc'], result['output']
+
+    async def close(self):
+        """
+        Stop the agent, the requests in flight fail with DeviceAgentError
+        """
+        process = self.process
+        if process:
+            self._abort(process, 'closed')
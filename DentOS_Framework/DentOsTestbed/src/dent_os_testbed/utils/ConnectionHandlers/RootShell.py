@@ -0,0 +1,251 @@
+"""Module implementing a persistent root shell over SSH - Used for executing many
+short privileged commands without a channel, a sudo authentication and a shell
+startup per command
+"""
+import asyncio
+import collections
+import shlex
+import uuid
+
+
+class RootShellError(ConnectionError):
+    """
+    Raised for the commands that were lost with the root shell
+    """
+
+
+class _Shell:
+    """
+    A single root shell process, the commands in flight in it and the task reading
+    their results back
+    """
+
+    def __init__(self, process, token):
+        self.process = process
+        self.sentinel = f'\n{token} '
+        self.pending = collections.deque()
+        self.seq = 0
+        self.reader = None
+        # (output, sentinel fields) of the commands read back from stdout and stderr
+        self.out = collections.deque()
+        self.err = collections.deque()
+
+
+class RootShell:
+    """
+    RootShell class - Keeps root shells open on SSH channels of the device and runs the
+    commands in them. Every command is written to a shell followed by a sentinel line on
+    stdout (with the exit status) and one on stderr, so the commands are pipelined: they are
+    written without waiting for the previous ones and their results are read back in order,
+    from stdout and stderr concurrently and in chunks so outputs of any size go through.
+    The commands of a shell run one after the other, so a command is sent to an idle shell
+    and up to max_shells shells are started for the concurrent commands; past that they
+    queue behind the commands of the least loaded shell. The commands are evaluated in a
+    subshell with stdin from /dev/null (or from their input), so they can neither read the
+    following commands nor change the state of the shell.
+    A shell that died (connection lost, device rebooted) is spawned again on the next command;
+    the commands that were in flight fail with RootShellError. The shells are bound to the
+    event loop that started them and are started again when used from another loop.
+    """
+
+    _SPAWN_TIMEOUT = 30
+    _MAX_SHELLS = 4
+    _CHUNK_SIZE = 65536
+    _SKIP_PASSWORD = 'while IFS= read -r line; do [ "$line" = {marker} ] && break; done; exec sh'
+
+    def __init__(self, logger, loop, ssh_connection, connection_params, max_shells=_MAX_SHELLS):
+        """
+        Initializliation for RootShell
+
+        Args:
+            logger (Logger.Apploger): Logger
+            loop: Event loop to use for scheduling the async methods for this class
+            ssh_connection (SSHConnectionPool): Connection to start the shells on
+            connection_params (ConnectionParams): Connection parameters
+            max_shells (int): Max number of root shells running commands concurrently
+
+        Raises:
+            ValueError: If event loop is not passed
+        """
+        if not loop:
+            raise ValueError('RootShell class needs a running event loop to manage its async APIs')
+        self.applog = logger.tag_logs(connection_params.ip)
+        self.sshlog = connection_params.logger
+        self.loop = loop
+        self.ssh_connection = ssh_connection
+        self.user_name = connection_params.username
+        self.password = connection_params.password
+        self.max_shells = max(1, max_shells)
+        self.shells = []
+        # the lock is created on first use so it binds to the running loop
+        self._spawn_lock = None
+        self._shells_loop = None
+
+    def _spawn_cmd(self, marker):
+        if self.user_name == 'root':
+            return 'sh'
+        # sudo only reads the password when it asks for it, the shell skips it otherwise
+        return "sudo -S -p '' sh -c " + shlex.quote(RootShell._SKIP_PASSWORD.format(marker=marker))
+
+    def _check_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._shells_loop is loop:
+            return
+        # the futures and the readers of the shells belong to the previous loop
+        for shell in list(self.shells):
+            self._abort(shell, 'event loop changed')
+        self._spawn_lock = asyncio.Lock()
+        self._shells_loop = loop
+
+    async def _acquire(self):
+        self._check_loop()
+        shell = min(self.shells, key=lambda s: len(s.pending), default=None)
+        if shell and (not shell.pending or len(self.shells) >= self.max_shells):
+            return shell
+        async with self._spawn_lock:
+            # another command may have started a shell in the meantime
+            shell = min(self.shells, key=lambda s: len(s.pending), default=None)
+            if shell and (not shell.pending or len(self.shells) >= self.max_shells):
+                return shell
+            try:
+                return await self._spawn()
+            except RootShellError:
+                if not shell:
+                    raise
+                # queue behind the shells already running
+                return shell
+
+    async def _spawn(self):
+        token = uuid.uuid4().hex
+        self.applog.debug(f'Starting root shell {len(self.shells) + 1}')
+        process = await self.ssh_connection.create_process(self._spawn_cmd(token))
+        try:
+            if self.user_name != 'root':
+                process.stdin.write(f'{self.password}\n{token}\n')
+            process.stdin.write(f'printf "%s\\n" {token}\n')
+            await asyncio.wait_for(process.stdout.readuntil(f'{token}\n'), RootShell._SPAWN_TIMEOUT)
+        except Exception as e:
+            process.close()
+            raise RootShellError(f'Could not start the root shell: {e}')
+        shell = _Shell(process, token)
+        shell.reader = asyncio.ensure_future(self._read(shell))
+        self.shells.append(shell)
+        self.applog.debug('Root shell started')
+        return shell
+
+    async def _read(self, shell):
+        # stdout and stderr are read concurrently, a command filling one of them while
+        # the other is not read would block the shell
+        readers = [
+            asyncio.ensure_future(self._read_stream(shell, shell.process.stdout, shell.out)),
+            asyncio.ensure_future(self._read_stream(shell, shell.process.stderr, shell.err)),
+        ]
+        try:
+            done, _ = await asyncio.wait(readers, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._abort(shell, e)
+        finally:
+            for task in readers:
+                task.cancel()
+
+    async def _read_stream(self, shell, stream, results):
+        # read in chunks, readuntil gives up on outputs larger than the receive window
+        buf = ''
+        start = 0
+        while True:
+            data = await stream.read(RootShell._CHUNK_SIZE)
+            if not data:
+                raise RootShellError('the root shell exited')
+            buf += data
+            while True:
+                pos = buf.find(shell.sentinel, start)
+                end = buf.find('\n', pos + len(shell.sentinel)) if pos >= 0 else -1
+                if end < 0:
+                    # the sentinel may be split across the chunks
+                    start = max(0, (pos if pos >= 0 else len(buf)) - len(shell.sentinel))
+                    break
+                results.append((buf[:pos], buf[pos + len(shell.sentinel):end].split()))
+                buf = buf[end + 1:]
+                start = 0
+                self._complete(shell)
+
+    def _complete(self, shell):
+        while shell.out and shell.err:
+            (out, (seq, exit_status)), (err, (err_seq,)) = shell.out.popleft(), shell.err.popleft()
+            expected, cmd, fut = shell.pending.popleft()
+            if int(seq) != expected or int(err_seq) != expected:
+                raise RootShellError(f'Root shell out of sync, got {seq}/{err_seq} for {expected}')
+            output = out + err
+            self.sshlog.output(output)
+            if not fut.done():
+                fut.set_result((int(exit_status), output))
+
+    def _abort(self, shell, e):
+        if shell not in self.shells:
+            return
+        self.applog.debug(f'Root shell lost: {e}')
+        self.shells.remove(shell)
+        try:
+            shell.process.close()
+        except Exception as ex:
+            self.applog.debug(f'Error closing the root shell: {ex}')
+        pending, shell.pending = shell.pending, collections.deque()
+        for _, cmd, fut in pending:
+            # the futures of a closed loop can not be completed anymore
+            if not fut.done() and not fut.get_loop().is_closed():
+                fut.set_exception(RootShellError(f'Root shell lost while running {cmd}'))
+        reader, shell.reader = shell.reader, None
+        if reader and reader is not asyncio.current_task() and not reader.get_loop().is_closed():
+            reader.cancel()
+
+    async def run_cmd(self, cmd, input=None):
+        """
+        Run command in a root shell
+
+        Args:
+            cmd (str): Command to execute
+            input: Input data to feed to standard input of the command
+
+        Returns:
+            exit status and the output of the command (stdout followed by stderr)
+
+        Raises:
+            RootShellError: If the shell was lost while running the command
+            Exception: For generic failures
+        """
+        if not cmd:
+            raise ValueError('Empty command is not allowed')
+        shell = await self._acquire()
+        shell.seq += 1
+        # eval parses the quoted command alone, a syntax error can not swallow the sentinels
+        if input is None:
+            script = f'( eval {shlex.quote(cmd)} ) </dev/null\n'
+        else:
+            # a here-document with a delimiter that can not show up in the input
+            eof = uuid.uuid4().hex
+            data = input.rstrip('\n')
+            script = f"( eval {shlex.quote(cmd)} ) <<'{eof}'\n{data}\n{eof}\n"
+        token = shell.sentinel.strip()
+        script += f'printf "\\n%s %d %d\\n" {token} {shell.seq} $?\nprintf "\\n%s %d\\n" {token} {shell.seq} >&2\n'
+        fut = asyncio.get_running_loop().create_future()
+        shell.pending.append((shell.seq, cmd, fut))
+        self.applog.debug(f'Running {cmd}')
+        self.sshlog.debug(cmd)
+        try:
+            shell.process.stdin.write(script)
+        except Exception as e:
+            self._abort(shell, e)
+        exit_status, output = await fut
+        self.applog.debug(f'Executed {cmd}; exit_status {exit_status}')
+        return exit_status, output
+
+    async def close(self):
+        """
+        Close the root shells, the commands in flight fail with RootShellError
+        """
+        for shell in list(self.shells):
+            self._abort(shell, 'closed')
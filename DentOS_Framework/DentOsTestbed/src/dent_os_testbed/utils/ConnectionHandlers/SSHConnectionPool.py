@@ -0,0 +1,274 @@
+"""Module implementing a pool of SSH connections to a single device - Used for
+executing concurrent commands over several multiplexed SSH connections
+"""
+import asyncio
+import io
+import time
+from contextlib import asynccontextmanager
+
+from dent_os_testbed.utils.ConnectionHandlers.SSHHandler import SSHConnection
+
+
+class SSHConnectionPool:
+    """
+    SSHConnectionPool class - Keeps a fixed number of SSHConnection objects to a device
+    and dispatches every command to the least loaded one. Each connection multiplexes
+    up to max_channels concurrent SSH channels, so at most pool_size * max_channels
+    commands are in flight towards the device at any time. Connections that stay idle
+    longer than idle_timeout seconds are closed and reopened on demand.
+    """
+
+    def __init__(self, logger, loop, connection_params, pool_size, max_channels, idle_timeout):
+        """
+        Initializliation for SSHConnectionPool
+
+        Args:
+            logger (Logger.Apploger): Logger
+            loop: Event loop to use for scheduling the async methods for this class
+            connection_params (ConnectionParams): Connection parameters
+            pool_size (int): Number of SSH connections to keep to the device
+            max_channels (int): Max number of concurrent channels per SSH connection
+            idle_timeout (int): Seconds after which an unused connection is closed
+
+        Raises:
+            ValueError: If arguments are invalid
+            Exception: For generic failures
+        """
+        if pool_size < 1 or max_channels < 1:
+            raise ValueError('SSHConnectionPool needs at least one connection and one channel')
+        self.applog = logger.tag_logs(connection_params.ip)
+        self.loop = loop
+        self.pool_size = pool_size
+        self.max_channels = max_channels
+        self.idle_timeout = idle_timeout
+        self.conns = [SSHConnection(logger, loop, connection_params) for _ in range(pool_size)]
+        self._in_flight = [0] * pool_size
+        self._last_used = [time.monotonic()] * pool_size
+        # the condition is created on first use so it binds to the running loop
+        self._cond = None
+        self._cond_loop = None
+
+    @asynccontextmanager
+    async def checkout(self):
+        """
+        Check out a connection from the pool for the duration of the context.
+        The connection is opened if needed and returned to the pool on exit.
+
+        Yields:
+            SSHConnection
+        """
+        idx = await self._checkout()
+        try:
+            await self.conns[idx].connect()
+            yield self.conns[idx]
+        finally:
+            await self._release(idx)
+
+    async def connect(self, count=None):
+        """
+        Prewarm the pool by opening connections to the device concurrently
+
+        Args:
+            count (int): Number of connections to open (Default: all of them)
+
+        Raises:
+            Exception: For generic failures
+        """
+        count = self.pool_size if count is None else min(count, self.pool_size)
+        await asyncio.gather(*[conn.connect() for conn in self.conns[:count]])
+        now = time.monotonic()
+        for idx in range(count):
+            self._last_used[idx] = now
+
+    async def run_cmd(self, cmd, bufsize=io.DEFAULT_BUFFER_SIZE, input=None):
+        """
+        Run command through one of the pooled SSH connections
+
+        Args:
+            cmd (str): Command to execute
+            bufsize:  Buffer size to use when feeding data from to stdin
+            input: Input data to feed to standard input of the remote process
+
+        Raises:
+            Exception: For generic failures
+        """
+        async with self.checkout() as conn:
+            return await conn.run_cmd(cmd, bufsize=bufsize, input=input)
+
+    async def stream_cmd(self, cmd):
+        """
+        Run a long-lived command through one of the pooled SSH connections and
+        yield its stdout line by line. The channel stays checked out until the
+        command exits or the caller stops iterating.
+
+        Args:
+            cmd (str): Command to execute
+
+        Raises:
+            Exception: For generic failures
+        """
+        async with self.checkout() as conn:
+            async for line in conn.stream_cmd(cmd):
+                yield line
+
+    async def stream_bytes(self, cmd):
+        """
+        Run a command through one of the pooled SSH connections and yield its
+        raw stdout in chunks
+
+        Args:
+            cmd (str): Command to execute
+
+        Raises:
+            Exception: For generic failures
+        """
+        async with self.checkout() as conn:
+            async for chunk in conn.stream_bytes(cmd):
+                yield chunk
+
+    async def create_process(self, cmd, **kwargs):
+        """
+        Start a long-lived process on the first connection of the pool, the one
+        kept warm. Its channel is not counted against max_channels.
+
+        Args:
+            cmd (str): Command to execute
+            kwargs: Extra arguments of asyncssh.SSHClientConnection.create_process
+
+        Raises:
+            Exception: For generic failures
+        """
+        conn = self.conns[0]
+        process = await conn.create_process(cmd, **kwargs)
+        self._last_used[0] = time.monotonic()
+        return process
+
+    async def copy_local_to_remote(self, src, dst):
+        """
+        SCP from local to remote over one of the pooled SSH connections
+
+        Args:
+            src (str): Source path in local host
+            dst(str): Destination path in remote host
+
+        Raises:
+            Exception: For generic failures
+        """
+        async with self.checkout() as conn:
+            await conn.copy_local_to_remote(src, dst)
+
+    async def copy_remote_to_local(self, src, dst):
+        """
+        SCP from remote to local over one of the pooled SSH connections
+
+        Args:
+            src (str): Source path in remote host
+            dst(str): Destination path in local host
+
+        Raises:
+            Exception: For generic failures
+        """
+        async with self.checkout() as conn:
+            await conn.copy_remote_to_local(src, dst)
+
+    def add_listener(self, listener):
+        """
+        Register a callback for the connection events of the pool, called with True when
+        a connection is established and with False when none of the connections is left
+
+        Args:
+            listener (callable): Callback
+        """
+        def on_event(connected):
+            listener(connected or any(conn.conn for conn in self.conns))
+
+        for conn in self.conns:
+            conn.add_listener(on_event)
+
+    async def is_connected(self):
+        """
+        Check if any of the pooled connections is in connected state
+
+        Raises:
+            Exception: For generic failures
+        """
+        for conn in self.conns:
+            if conn.conn and await conn.is_connected():
+                return True
+        return False
+
+    async def disconnect(self):
+        """
+        Disconnect all the connections of this pool
+
+        Raises:
+            Exception: For generic failures
+        """
+        try:
+            await asyncio.gather(*[conn.disconnect() for conn in self.conns if conn.conn])
+        except Exception as e:
+            self.applog.exception('Exception --> SSH pool disconnect', exc_info=e)
+            raise
+
+    def _init_primitives(self):
+        loop = asyncio.get_running_loop()
+        if self._cond_loop is loop:
+            return
+        # a new loop, the checkouts left on the previous one will never be released
+        self._cond = asyncio.Condition()
+        self._cond_loop = loop
+        self._in_flight = [0] * self.pool_size
+
+    def _pick(self):
+        # least loaded connection first, already opened ones win a tie
+        candidates = [idx for idx in range(self.pool_size) if self._in_flight[idx] < self.max_channels]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda idx: (self._in_flight[idx], self.conns[idx].conn is None))
+
+    async def _checkout(self):
+        self._init_primitives()
+        idle = await self._reserve_idle()
+        if idle:
+            await self._evict(idle)
+        async with self._cond:
+            idx = self._pick()
+            while idx is None:
+                await self._cond.wait()
+                idx = self._pick()
+            self._in_flight[idx] += 1
+        return idx
+
+    async def _release(self, idx):
+        async with self._cond:
+            self._in_flight[idx] -= 1
+            self._last_used[idx] = time.monotonic()
+            self._cond.notify()
+
+    async def _reserve_idle(self):
+        # keep the first connection warm, reserve the other idle ones for eviction
+        now = time.monotonic()
+        idle = []
+        async with self._cond:
+            for idx in range(1, self.pool_size):
+                if (
+                    self.conns[idx].conn
+                    and not self._in_flight[idx]
+                    and now - self._last_used[idx] > self.idle_timeout
+                ):
+                    self._in_flight[idx] = self.max_channels
+                    idle.append(idx)
+        return idle
+
+    async def _evict(self, idle):
+        for idx in idle:
+            try:
+                self.applog.debug(f'Closing SSH connection {idx} idle for {self.idle_timeout} secs')
+                await self.conns[idx].disconnect()
+            except Exception as e:
+                self.applog.exception('Exception --> SSH pool evict', exc_info=e)
+        async with self._cond:
+            for idx in idle:
+                self._in_flight[idx] = 0
+                self._last_used[idx] = time.monotonic()
+            self._cond.notify_all()
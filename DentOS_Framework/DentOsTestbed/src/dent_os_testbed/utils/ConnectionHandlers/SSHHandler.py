@@ -1,5 +1,6 @@
 """Module implementing SSH connection layer - Used for executing commands over SSH and SCP
 """
+import asyncio
 import io
 
 import asyncssh
@@ -10,12 +11,15 @@ class SSHClient(asyncssh.SSHClient):
     Class used to receive connnection updates for asyncssh.create_connection
     """
 
-    def __init__(self):
+    def __init__(self, on_connection_lost=None):
         self.auth_made = False
         self.conn_made = False
+        self.conn = None
+        self.on_connection_lost = on_connection_lost
 
     def connection_made(self, conn):
         self.conn_made = True
+        self.conn = conn
         print(f"Connection made to {conn.get_extra_info('peername')[0]}")
 
     def auth_completed(self):
@@ -25,6 +29,8 @@ class SSHClient(asyncssh.SSHClient):
     def connection_lost(self, exc):
         self.conn_made = False
         self.auth_made = False
+        if self.on_connection_lost:
+            self.on_connection_lost(self.conn, exc)
 
     # This is to accept public host key without a prompt
     def validate_host_public_key(self, host, addr, port, key):
@@ -33,11 +39,19 @@ class SSHClient(asyncssh.SSHClient):
 
 class SSHConnection:
     """
-    SSHConnection class - Used for executing commands over SSH and SCP
+    SSHConnection class - Used for executing commands over SSH and SCP.
+    Liveness of the connection is tracked passively - asyncssh keepalives detect
+    a dead peer and SSHClient.connection_lost drops the connection, which is then
+    reopened on the next command. Commands whose channel could not be opened are
+    retried on a fresh connection. The connection is bound to the event loop that
+    opened it and is reopened when it is used from another loop.
     """
 
     _DEFAULT_PORT = 22
     _SUCCESS = 0
+    _KEEPALIVE_INTERVAL = 15
+    _KEEPALIVE_COUNT_MAX = 3
+    _RECONNECT_RETRIES = 2
 
     def __init__(self, logger, loop, connection_params):
         """
@@ -55,6 +69,9 @@ class SSHConnection:
         try:
             self._validate_and_update_params(logger, loop, connection_params)
             self.conn = None
+            self._connect_lock = None
+            self._conn_loop = None
+            self._listeners = []
         except Exception as e:
             self.applog.exception('Error initializing SSH connection', exc_info=e)
             raise
@@ -75,16 +92,85 @@ class SSHConnection:
             if not cmd:
                 raise ValueError('Empty command is not allowed')
             self.applog.debug(f'Running {cmd}')
-            await self._connect()
             self.sshlog.debug(cmd)
-            result = await self.conn.run(cmd, bufsize=bufsize, input=input)
+            result = await self._with_reconnect(
+                lambda conn: conn.run(cmd, bufsize=bufsize, input=input)
+            )
             self.applog.debug(f'Executed {cmd}; exit_status {result.exit_status}')
-            self.sshlog.debug(result.stdout + result.stderr)
-            return result.exit_status, result.stdout + result.stderr
+            output = result.stdout + result.stderr
+            self.sshlog.output(output)
+            return result.exit_status, output
         except Exception as e:
             self.applog.exception(f'Error running command: {cmd}', exc_info=e)
             raise
 
+    async def stream_cmd(self, cmd):
+        """
+        Run a long-lived command through SSH connection and yield its stdout line
+        by line as it is produced
+
+        Args:
+            cmd (str): Command to execute
+
+        Raises:
+            Exception: For generic failures
+        """
+        try:
+            self.applog.debug(f'Streaming {cmd}')
+            self.sshlog.debug(cmd)
+            await self._connect()
+            async with self.conn.create_process(cmd) as process:
+                async for line in process.stdout:
+                    yield line
+        except Exception as e:
+            self.applog.exception(f'Error streaming command: {cmd}', exc_info=e)
+            raise
+
+    async def stream_bytes(self, cmd, chunk_size=65536):
+        """
+        Run a command through SSH connection and yield its raw stdout in chunks
+        of at most chunk_size bytes as it is produced
+
+        Args:
+            cmd (str): Command to execute
+            chunk_size (int): Max size of the chunks
+
+        Raises:
+            Exception: For generic failures
+        """
+        try:
+            self.applog.debug(f'Streaming {cmd}')
+            self.sshlog.debug(cmd)
+            await self._connect()
+            async with self.conn.create_process(cmd, encoding=None) as process:
+                while True:
+                    chunk = await process.stdout.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+        except Exception as e:
+            self.applog.exception(f'Error streaming command: {cmd}', exc_info=e)
+            raise
+
+    async def create_process(self, cmd, **kwargs):
+        """
+        Start a long-lived process through SSH connection, the caller owns the
+        returned asyncssh.SSHClientProcess and closes it
+
+        Args:
+            cmd (str): Command to execute
+            kwargs: Extra arguments of asyncssh.SSHClientConnection.create_process
+
+        Raises:
+            Exception: For generic failures
+        """
+        try:
+            self.applog.debug(f'Starting {cmd}')
+            return await self._with_reconnect(lambda conn: conn.create_process(cmd, **kwargs))
+        except Exception as e:
+            self.applog.exception(f'Error starting command: {cmd}', exc_info=e)
+            raise
+
     async def copy_local_to_remote(self, src, dst):
         """
         SCP from local to remote
@@ -98,8 +184,7 @@ class SSHConnection:
         """
         try:
             self.applog.debug(f'Copying from local {src} to remote {dst}')
-            await self._connect()
-            await asyncssh.scp(src, (self.conn, dst))
+            await self._with_reconnect(lambda conn: asyncssh.scp(src, (conn, dst)))
             self.applog.debug(f'Successfully copied from local {src} to remote {dst}')
         except Exception as e:
             self.applog.exception(f'copy_local_to_remote {src} {dst}', exc_info=e)
@@ -118,13 +203,21 @@ class SSHConnection:
         """
         try:
             self.applog.debug(f'Copying from remote {src} to local {dst}')
-            await self._connect()
-            await asyncssh.scp((self.conn, src), dst)
+            await self._with_reconnect(lambda conn: asyncssh.scp((conn, src), dst))
             self.applog.debug(f'Successfully copied from remote {src} to local {dst}')
         except Exception as e:
             self.applog.exception(f'copy_remote_to_local {src} {dst}', exc_info=e)
             raise
 
+    async def connect(self):
+        """
+        Open the SSH connection if it is not already open
+
+        Raises:
+            Exception: For generic failures
+        """
+        await self._connect()
+
     async def is_connected(self):
         """
         Check if in connected state - State ready for command execution
@@ -133,7 +226,7 @@ class SSHConnection:
             Exception: For generic failures
         """
         try:
-            return await self._connected()
+            return self._connected()
         except Exception as e:
             self.applog.exception('Exception occured --> is_connected', exc_info=e)
             raise
@@ -146,10 +239,11 @@ class SSHConnection:
             Exception: For generic failures
         """
         try:
-            if await self._connected():
+            self._check_loop()
+            if self._connected():
                 self.applog.debug('Disconnecting')
-                self.conn.close()
-                self.conn = None
+                conn, self.conn = self.conn, None
+                conn.close()
                 self.applog.debug('Disconnect complete')
             else:
                 self.applog.debug('No active connection to disconnect')
@@ -178,47 +272,97 @@ class SSHConnection:
         else:
             raise ValueError('Neither password nor public key provided to create SSHConnection')
 
-    async def _connected(self):
-        try:
-            if self.conn:
-                result = await self.conn.run('date')
-                if result.exit_status == SSHConnection._SUCCESS:
-                    stdout = result.stdout.rstrip('\n')
-                    self.applog.debug(f'Connection to device is healthy at {stdout}')
-                    result = True
-                else:
-                    result = False
-            else:
-                result = False
-            return result
-        except Exception as e:
-            print(e)
-            self.applog.debug('Currently no connection exists to device')
-            return False
+    def add_listener(self, listener):
+        """
+        Register a callback for the connection events, called with True when the connection
+        is established and False when it could not be established or was lost unexpectedly
+
+        Args:
+            listener (callable): Callback
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, connected):
+        for listener in self._listeners:
+            listener(connected)
+
+    def _connected(self):
+        return self.conn is not None and self._conn_loop is asyncio.get_running_loop()
+
+    def _check_loop(self):
+        # the connection and its lock belong to the loop that created them, they are
+        # dropped when used from another loop (e.g. each test running its own loop)
+        loop = asyncio.get_running_loop()
+        if self._conn_loop is loop:
+            return
+        if self.conn is not None:
+            self.applog.debug('Event loop changed, reconnecting')
+            conn, self.conn = self.conn, None
+            try:
+                conn.abort()
+            except Exception as e:
+                self.applog.debug(f'Error aborting the connection of the previous loop: {e}')
+        self._connect_lock = asyncio.Lock()
+        self._conn_loop = loop
+
+    def _connection_lost(self, conn, exc):
+        # ignore late notifications from connections that were already replaced
+        if conn is not None and conn is self.conn:
+            self.applog.debug(f'Connection to device lost: {exc}')
+            self.conn = None
+            self._notify(False)
+
+    async def _with_reconnect(self, op):
+        retries = SSHConnection._RECONNECT_RETRIES
+        while True:
+            await self._connect()
+            conn = self.conn
+            try:
+                return await op(conn)
+            except asyncssh.ChannelOpenError as e:
+                # the channel never opened so nothing ran on the device; safe to retry
+                if not retries:
+                    raise
+                retries -= 1
+                self.applog.debug(f'Channel open failed ({e.reason}), reconnecting')
+                if conn is self.conn:
+                    self.conn = None
+                    conn.close()
 
     async def _connect(self):
-        try:
-            if not await self._connected():
+        self._check_loop()
+        if self._connected():
+            return
+        async with self._connect_lock:
+            if self._connected():
+                return
+            try:
                 if self.password:
                     self.conn, _ = await asyncssh.create_connection(
-                        SSHClient,
+                        lambda: SSHClient(self._connection_lost),
                         self.ip,
                         username=self.user_name,
                         password=self.password,
                         known_hosts=None,
+                        keepalive_interval=SSHConnection._KEEPALIVE_INTERVAL,
+                        keepalive_count_max=SSHConnection._KEEPALIVE_COUNT_MAX,
                     )
                 elif self.public_key:
                     self.conn, _ = await asyncssh.create_connection(
-                        SSHClient,
+                        lambda: SSHClient(self._connection_lost),
                         self.ip,
                         username=self.user_name,
                         client_keys=self.public_key,
                         passphrase=self.passphrase,
                         known_hosts=None,
+                        keepalive_interval=SSHConnection._KEEPALIVE_INTERVAL,
+                        keepalive_count_max=SSHConnection._KEEPALIVE_COUNT_MAX,
                     )
                 else:
                     invalid_credentials = 'Invalid SSH credentials for device %s' % self.ip
                     raise RuntimeError(invalid_credentials)
-        except Exception as e:
-            self.applog.exception('Error establishing connection', exc_info=e)
-            raise
+            except Exception as e:
+                self.applog.exception('Error establishing connection', exc_info=e)
+                self._notify(False)
+                raise
+            self._notify(True)
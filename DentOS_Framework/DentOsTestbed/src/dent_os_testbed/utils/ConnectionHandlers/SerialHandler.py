@@ -2,10 +2,12 @@
 """
 
 import asyncio
+import codecs
 import collections
-from threading import Lock, Thread
+import os
+import re
+import uuid
 
-import pexpect.fdpexpect
 import serial
 
 
@@ -13,93 +15,14 @@ class DeviceType:
     DEVICE_DENT = 1
 
 
-class SerialAsyncLoop:
-    """
-    It is a singleton factory that has one loop for all clients
-    We want to invoke a separate thread and assign the loop to run in the thread
-    so that, all tasks related to serial connection are run in background.
-    """
-
-    _loop = None
-    _thread = None
-    THREAD_JOIN_TIMEOUT_SECS = 30
-    count = 0
-    mutex = Lock()
-
-    def __init__(self, logger):
-        """
-        Initializliation for SerialAsyncLoop
-
-        Args:
-            logger (Logger.Apploger): Logger
-        """
-        if logger:
-            logger.info('Initializing SerialAsyncLoop')
-        SerialAsyncLoop._loop = asyncio.new_event_loop()
-        SerialAsyncLoop._thread = Thread(
-            name='SerialAsyncLoop',
-            target=SerialAsyncLoop.start_loop,
-            args=[SerialAsyncLoop, SerialAsyncLoop._loop],
-        )
-        SerialAsyncLoop._thread.start()
-
-    def start_loop(self, loop):
-        """
-        Start the event loop for this thread
-
-        Args:
-            loop: Event loop to use for scheduling the async methods
-        """
-        asyncio.set_event_loop(loop)
-        loop.run_forever()
-
-    @staticmethod
-    def stop_loop(logger):
-        """
-        Stop the event loop
-
-        Args:
-            logger (Logger.Apploger): Logger
-        """
-        try:
-            SerialAsyncLoop.mutex.acquire()
-            SerialAsyncLoop.count -= 1
-            if logger:
-                logger.info(f'SerialAsyncLoop instance count: {SerialAsyncLoop.count}')
-            if SerialAsyncLoop.count == 0:
-                loop = SerialAsyncLoop._loop
-                loop.call_soon_threadsafe(loop.stop)
-                SerialAsyncLoop._thread.join(SerialAsyncLoop.THREAD_JOIN_TIMEOUT_SECS)
-        except Exception:
-            raise
-        finally:
-            SerialAsyncLoop.mutex.release()
-
-    @staticmethod
-    def get_loop(logger):
-        """
-        Static factory method to iniitalize this classs
-
-        Args:
-            logger (Logger.Apploger): Logger
-        """
-        try:
-            SerialAsyncLoop.mutex.acquire()
-            if SerialAsyncLoop.count == 0:
-                SerialAsyncLoop(logger)
-            SerialAsyncLoop.count += 1
-            if logger:
-                logger.info(f'SerialAsyncLoop instance count: {SerialAsyncLoop.count}')
-            return SerialAsyncLoop._loop
-        except Exception:
-            raise
-        finally:
-            SerialAsyncLoop.mutex.release()
-
-
 class SerialConsole:
     """
-    SerialConsole class implementing the APIs required to manage a serial connection
+    SerialConsole class implementing the APIs required to manage a serial connection.
+    The serial port is read by the event loop the console is used from, so any number
+    of consoles are served concurrently without a thread per console. The received data
+    is matched incrementally against the expected patterns and captured in a ring buffer
+    that is written to the serial log file. The reader of the port and the lock of the
+    console move to the running loop when the console is used from another loop.
     """
 
     MAX_CONSOLE_BUFFER = 1024 * 100
@@ -107,8 +30,13 @@ class SerialConsole:
     COMMAND_PROMPT = ''
     LOGIN_RETRIES = 20
     ONIE_WAIT = 30
+    LOG_FLUSH_INTERVAL = 1
+    # how far back into the received data a new chunk can complete a match
+    MATCH_LOOKBACK = 256
+    EXPECT_TIMEOUT = -1
+    EXPECT_EOF = -2
 
-    class LoginPexpectHelper:
+    class LoginExpectHelper:
         """
         Class to store constants used for serial console login
         """
@@ -116,18 +44,10 @@ class SerialConsole:
         ONIE = 0
         LOGIN = 1
         PASSWORD = 2
-        EOF = 3
-        TIMEOUT = 4
-        CMD_PROMPT = 5
-        PEXPECT_MAP = collections.OrderedDict(
-            [
-                (ONIE, 'ONIE'),
-                (LOGIN, '(?i)login'),
-                (PASSWORD, '(?i)password'),
-                (EOF, pexpect.EOF),
-                (TIMEOUT, pexpect.TIMEOUT),
-            ]
-        )
+        CMD_PROMPT = 3
+        TIMEOUT = -1  # SerialConsole.EXPECT_TIMEOUT
+        EOF = -2  # SerialConsole.EXPECT_EOF
+        PATTERNS = ['ONIE', '(?i)login', '(?i)password']
 
     def __init__(self, logger, loop, conn_params):
         """
@@ -145,19 +65,27 @@ class SerialConsole:
         try:
             self._validate_and_update_params(logger, loop, conn_params)
             self.device_type = DeviceType.DEVICE_DENT
-            self.loop = SerialAsyncLoop.get_loop(logger)
+            self.loop = loop
             self.login_done = False
             self.login_successful = False
             self.console = None
-            self.pexpect_child = None
-            self.console_buffer = ''
+            self.console_buffer = collections.deque()
+            self.console_buffer_len = 0
+            self.before = ''
+            self.match = None
+            self._rx = ''
+            self._scan_from = 0
+            self._eof = False
+            self._rx_event = None
+            self._lock = None
+            self._console_loop = None
+            self._decoder = None
+            self._flush_handle = None
             if self.username == 'root':
                 self.cmd_prompt = f'{self.username}@localhost:~#'
             else:
                 self.cmd_prompt = f'{self.username}@{self.hostname}:~$'
-            SerialConsole.LoginPexpectHelper.PEXPECT_MAP[
-                SerialConsole.LoginPexpectHelper.CMD_PROMPT
-            ] = self.cmd_prompt
+            self.login_patterns = SerialConsole.LoginExpectHelper.PATTERNS + [re.escape(self.cmd_prompt)]
             if not self.username and not self.password:
                 self.applog.info('Not trying to login since username/password ' 'not available')
                 return
@@ -188,22 +116,6 @@ class SerialConsole:
         self.baudrate = conn_params.baudrate
         self.password = conn_params.password  # Not validating - What if password is empty?
 
-    def login_cb(self, result):
-        """
-        Handles login completion from the '_login_routine'
-
-        Raises:
-            Exception: For generic failures
-        """
-        try:
-            self.applog.info('Login done. %s' % ('Succeeded' if result.result() else 'Failed'))
-            self.login_successful = result.result()
-        except Exception:
-            self.applog.exception('Login to console %s failed' % self.dev)
-            self.login_successful = False
-        self.login_done = True
-        return
-
     def login_info(self):
         """
         Get login information
@@ -213,6 +125,22 @@ class SerialConsole:
         """
         return (self.login_done, self.login_successful)
 
+    def get_console_buffer(self, clear=True):
+        """
+        Get the last MAX_CONSOLE_BUFFER characters received on the console
+
+        Args:
+            clear (bool): Clear the buffer after reading it
+
+        Returns:
+            Console output
+        """
+        output = ''.join(self.console_buffer)
+        if clear:
+            self.console_buffer.clear()
+            self.console_buffer_len = 0
+        return output
+
     async def logged_in(self):
         """
         Verify if logged in to console
@@ -223,17 +151,20 @@ class SerialConsole:
         Raises:
             Exception: For generic failures
         """
-        if not self.pexpect_child or not self.console:
+        async with self._get_lock():
+            return await self._logged_in()
+
+    async def _logged_in(self):
+        if not self.console:
             return False
         try:
             self._flush_buffer()
             exit_status, result = await self._run_cmd('who')
-            if exit_status != 0:
+            if exit_status != 0 or not result:
                 return False
-            if result:
-                fields = [line for line in result.splitlines()][0].split()
+            fields = [line for line in result.splitlines()][0].split()
             self.applog.info(f'user/ttyinfo:{fields}')
-            return fields and fields[0] == self.username and 'tty' in fields[1]
+            return len(fields) > 1 and fields[0] == self.username and 'tty' in fields[1]
         except Exception as e:
             self.applog.exception('Exception --> logged_in()', exc_info=e)
             return False
@@ -247,12 +178,12 @@ class SerialConsole:
         """
         self.applog.info('sending username %s' % self.username)
         self._flush_buffer()
-        self.pexpect_child.sendline(self.username)
-        ret = self.pexpect_child.expect(['(?i)password', pexpect.TIMEOUT, pexpect.EOF], timeout=10)
+        await self._sendline(self.username)
+        ret = await self._expect(['(?i)password'], timeout=10)
         self.applog.info('handle_username %s ret:%s' % (self.username, ret))
         if ret == 0:
             return await self.handle_password_prompt()
-        elif ret == 2:
+        elif ret == SerialConsole.EXPECT_EOF:
             self.applog.info('Login username prompt failed with %s' % ret)
         return False
 
@@ -265,10 +196,8 @@ class SerialConsole:
         """
         self.applog.info('sending password %s' % self.password)
         self._flush_buffer()
-        self.pexpect_child.sendline(self.password)
-        ret = self.pexpect_child.expect_exact(
-            [self.cmd_prompt, pexpect.TIMEOUT, pexpect.EOF], timeout=10
-        )
+        await self._sendline(self.password)
+        ret = await self._expect([re.escape(self.cmd_prompt)], timeout=10)
         if ret == 0:
             return True
         self.applog.info('handle_password_prompt failed with %s' % ret)
@@ -284,32 +213,30 @@ class SerialConsole:
         self.applog.info('----Starting login----')
         for i in range(self.LOGIN_RETRIES):
             self._flush_buffer()
-            self.pexpect_child.sendline('')
+            await self._sendline('')
             self.applog.info('retrying login: %s' % i)
-            ret = self.pexpect_child.expect(
-                list(SerialConsole.LoginPexpectHelper.PEXPECT_MAP.values()), timeout=10
-            )
+            ret = await self._expect(self.login_patterns, timeout=10)
             self.applog.info(
-                'Login expect: got %s' % SerialConsole.LoginPexpectHelper.PEXPECT_MAP[ret]
+                'Login expect: got %s' % (self.login_patterns[ret] if ret >= 0 else ret)
             )
-            if ret == SerialConsole.LoginPexpectHelper.PASSWORD:
-                if await self.handle_password_prompt() and await self.logged_in():
+            if ret == SerialConsole.LoginExpectHelper.PASSWORD:
+                if await self.handle_password_prompt() and await self._logged_in():
                     return True
-            elif ret == SerialConsole.LoginPexpectHelper.LOGIN:
-                if await self.handle_username_prompt() and await self.logged_in():
+            elif ret == SerialConsole.LoginExpectHelper.LOGIN:
+                if await self.handle_username_prompt() and await self._logged_in():
                     return True
-            elif ret == SerialConsole.LoginPexpectHelper.CMD_PROMPT:
+            elif ret == SerialConsole.LoginExpectHelper.CMD_PROMPT:
                 self.applog.info('Received command prompt, verify if already logged in')
-                if await self.logged_in():
+                if await self._logged_in():
                     return True
-            elif ret == SerialConsole.LoginPexpectHelper.EOF:
+            elif ret == SerialConsole.LoginExpectHelper.EOF:
                 self.applog.info('Login failed with EOF')
                 return False
             elif (
-                ret == SerialConsole.LoginPexpectHelper.ONIE
-                or ret == SerialConsole.LoginPexpectHelper.TIMEOUT
+                ret == SerialConsole.LoginExpectHelper.ONIE
+                or ret == SerialConsole.LoginExpectHelper.TIMEOUT
             ):
-                await asyncio.sleep(30)
+                await asyncio.sleep(self.ONIE_WAIT)
             else:
                 self.applog.info('Login attempt failed with expect ret:%s. Trying again..' % ret)
             self.applog.info('Login expect ret: %s' % ret)
@@ -319,7 +246,7 @@ class SerialConsole:
 
     async def _login(self):
         """
-        Trigger login by starting '_login_routine' in a thread
+        Open the serial port if needed and run the '_login_routine'
 
         Raises:
             Exception: For generic failures
@@ -327,57 +254,177 @@ class SerialConsole:
         try:
             self.login_done = False
             self.login_successful = False
-            if not self.console:
-                self.console = serial.Serial(
-                    self.dev,
-                    baudrate=int(self.baudrate),
-                    parity='N',
-                    stopbits=1,
-                    bytesize=8,
-                    timeout=8,
-                )
-            if not self.pexpect_child:
-                self.pexpect_child = pexpect.fdpexpect.fdspawn(
-                    self.console.fileno(), encoding='utf-8'
-                )
-                self.pexpect_child.logfile = self.log_file
-            self.connect_future = asyncio.run_coroutine_threadsafe(self._login_routine(), self.loop)
-            self.connect_future.add_done_callback(self.login_cb)
-            while not self.login_done:
-                await asyncio.sleep(2)
+            self._open()
+            try:
+                self.login_successful = await self._login_routine()
+            except Exception:
+                self.applog.exception('Login to console %s failed' % self.dev)
+                self.login_successful = False
+            self.login_done = True
+            self.applog.info('Login done. %s' % ('Succeeded' if self.login_successful else 'Failed'))
             if not self.login_successful:
                 raise RuntimeError(f'Unable to login to {self.dev}')
         except Exception as e:
             self.applog.exception('Exception occured --> __login', exc_info=e)
             raise
 
+    def _get_lock(self):
+        self._check_loop()
+        return self._lock
+
+    def _check_loop(self):
+        # the reader, the lock and the event belong to the loop they were created on,
+        # they are created again on the running loop when it changes
+        loop = asyncio.get_running_loop()
+        if self._console_loop is loop:
+            return
+        old = self._console_loop
+        if self.console and not self._eof and old and not old.is_closed():
+            old.remove_reader(self.console.fileno())
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_log()
+        self._lock = asyncio.Lock()
+        self._rx_event = asyncio.Event()
+        self._console_loop = self.loop = loop
+        if self.console and not self._eof:
+            loop.add_reader(self.console.fileno(), self._on_readable)
+
+    def _open(self):
+        if self.console:
+            return
+        # pyserial opens the port non blocking, reads return what is available
+        self.console = serial.Serial(
+            self.dev,
+            baudrate=int(self.baudrate),
+            parity='N',
+            stopbits=1,
+            bytesize=8,
+            timeout=0,
+        )
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._rx = ''
+        self._scan_from = 0
+        self._eof = False
+        self._check_loop()
+        self.loop.add_reader(self.console.fileno(), self._on_readable)
+
+    def _on_readable(self):
+        try:
+            data = self.console.read(self.console.in_waiting or 1)
+        except (serial.SerialException, OSError) as e:
+            self.applog.debug(f'Serial read failed: {e}')
+            self._set_eof()
+            return
+        if not data:
+            return
+        text = self._decoder.decode(data)
+        self._rx += text
+        if len(self._rx) > SerialConsole.MAX_CONSOLE_BUFFER:
+            # nobody is waiting for this much output, keep the tail only
+            drop = len(self._rx) - SerialConsole.MAX_CONSOLE_BUFFER
+            self._rx = self._rx[drop:]
+            self._scan_from = max(0, self._scan_from - drop)
+        self._capture(text)
+        self._rx_event.set()
+
+    def _set_eof(self):
+        if self.console and not self._eof and self._console_loop and not self._console_loop.is_closed():
+            self._console_loop.remove_reader(self.console.fileno())
+        self._eof = True
+        if self._rx_event:
+            self._rx_event.set()
+
+    def _capture(self, text):
+        # ring buffer of the console output, written to the log file in batches
+        self.console_buffer.append(text)
+        self.console_buffer_len += len(text)
+        while self.console_buffer_len - len(self.console_buffer[0]) >= SerialConsole.MAX_CONSOLE_BUFFER:
+            self.console_buffer_len -= len(self.console_buffer.popleft())
+        self.log_file.write(text)
+        if self._flush_handle is None:
+            self._flush_handle = self.loop.call_later(SerialConsole.LOG_FLUSH_INTERVAL, self._flush_log)
+
+    def _flush_log(self):
+        self._flush_handle = None
+        if not self.log_file.closed:
+            self.log_file.flush()
+
+    async def _sendline(self, line):
+        data = (line + os.linesep).encode()
+        fd = self.console.fileno()
+        while data:
+            try:
+                data = data[os.write(fd, data):]
+            except BlockingIOError:
+                pass
+            if data:
+                writable = self.loop.create_future()
+                self.loop.add_writer(fd, writable.set_result, None)
+                try:
+                    await writable
+                finally:
+                    self.loop.remove_writer(fd)
+
+    async def _expect(self, patterns, timeout):
+        """
+        Wait for the first of the patterns (regex) to show up on the console, only the
+        newly received data (and MATCH_LOOKBACK before it) is searched on every wakeup.
+
+        Returns:
+            index of the matched pattern, EXPECT_TIMEOUT or EXPECT_EOF. The data before
+            the match is left in self.before and the match object in self.match
+        """
+        regexes = [re.compile(p) for p in patterns]
+        deadline = self.loop.time() + timeout
+        while True:
+            found = None
+            for idx, regex in enumerate(regexes):
+                m = regex.search(self._rx, self._scan_from)
+                if m and (found is None or m.start() < found[1].start()):
+                    found = (idx, m)
+            if found:
+                idx, self.match = found
+                self.before = self._rx[:self.match.start()]
+                self._rx = self._rx[self.match.end():]
+                self._scan_from = 0
+                return idx
+            self._scan_from = max(0, len(self._rx) - SerialConsole.MATCH_LOOKBACK)
+            if self._eof:
+                return SerialConsole.EXPECT_EOF
+            remaining = deadline - self.loop.time()
+            if remaining <= 0:
+                return SerialConsole.EXPECT_TIMEOUT
+            self._rx_event.clear()
+            try:
+                await asyncio.wait_for(self._rx_event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
     def _flush_buffer(self):
         """
-        Flush serial console buffer
-
-        Raises:
-            Exception: For generic failures
+        Drop the console data received so far and not consumed by an expect
         """
-        self.pexpect_child.logfile = None
-        flushedStuff = ''
-        while self.pexpect_child.expect([pexpect.TIMEOUT, r'.+'], timeout=1):
-            flushedStuff += self.pexpect_child.match.group(0)
-        self.pexpect_child.logfile = self.log_file
+        self._rx = ''
+        self._scan_from = 0
 
-    def parse_cmd_output(self, cmd_out):
+    def parse_cmd_output(self, cmd_out, echo=None):
         """
         Parse output of command from stdout of serial console
 
         Return:
             Command output
         """
-        output_lines = cmd_out.splitlines()
-        res = output_lines[1].strip() if output_lines else ''
-        return res
+        if echo and echo in cmd_out:
+            # skip the echoed command line, even if the terminal wrapped it
+            cmd_out = cmd_out[cmd_out.index(echo) + len(echo):]
+        output_lines = cmd_out.splitlines()[1:]
+        return '\n'.join(line.rstrip() for line in output_lines).strip()
 
     async def _run_cmd(self, cmd, timeout=5):
         """
-        Run command (internal method)
+        Run command (internal method). The exit status is printed between two
+        markers right after the command, so a single round-trip returns both.
 
         Raises:
             Exception: For generic failures
@@ -387,20 +434,17 @@ class SerialConsole:
         """
         try:
             self._flush_buffer()
-            self.pexpect_child.sendline(cmd)
-            ret = self.pexpect_child.expect_exact(
-                [self.cmd_prompt, pexpect.TIMEOUT], timeout=timeout
-            )
-            stdout = self.parse_cmd_output(self.pexpect_child.before) if ret == 0 else ''
-            self.pexpect_child.sendline('echo $?')
-            ret = self.pexpect_child.expect_exact(
-                [self.cmd_prompt, pexpect.TIMEOUT], timeout=timeout
-            )
-            exit_status = self.parse_cmd_output(self.pexpect_child.before) if ret == 0 else -1
-            try:
-                exit_status = int(exit_status)
-            except ValueError:
-                exit_status = -1
+            marker = uuid.uuid4().hex[:8]
+            # the echoed command has '$?' between the markers, only the output has digits
+            echo = f'echo "{marker}$?{marker}"'
+            await self._sendline(f'{cmd}; {echo}')
+            ret = await self._expect([f'{marker}(\\d+){marker}'], timeout=timeout)
+            if ret != 0:
+                return -1, ''
+            exit_status = int(self.match.group(1))
+            stdout = self.parse_cmd_output(self.before, echo=echo)
+            # consume the prompt so it does not leak into the next command
+            await self._expect([re.escape(self.cmd_prompt)], timeout=timeout)
             return exit_status, stdout
         except Exception as e:
             self.applog.exception('Exception occured --> _run_command', exc_info=e)
@@ -417,18 +461,19 @@ class SerialConsole:
             exit_status, stdout of command execution
         """
         try:
-            if not await self.logged_in():
-                self.applog.info('Logging in to console')
-                await self._login()
-            self.applog.info(f'Executing command {cmd}')
-            return await self._run_cmd(cmd, timeout)
+            async with self._get_lock():
+                if not await self._logged_in():
+                    self.applog.info('Logging in to console')
+                    await self._login()
+                self.applog.info(f'Executing command {cmd}')
+                return await self._run_cmd(cmd, timeout)
         except Exception as e:
             self.applog.exception('Exception occured --> run_command', exc_info=e)
             raise
 
     def cleanup(self):
         """
-        Cleanup - Cleanup routine, disconnect and terminate login threads
+        Cleanup - Cleanup routine, disconnect and close the serial log
 
         Raises:
             Exception: For generic failures
@@ -436,7 +481,6 @@ class SerialConsole:
         try:
             self.disconnect()
             self.log_file.close()
-            SerialAsyncLoop.stop_loop(self.logger)
         except Exception as e:
             self.applog.exception(f'Exception --> {SerialConsole.cleanup.__qualname__}', exc_info=e)
             raise
@@ -451,8 +495,12 @@ class SerialConsole:
         try:
             if self.console:
                 self.applog.debug('Disconnecting serial connection')
+                self._set_eof()
+                if self._flush_handle:
+                    self._flush_handle.cancel()
+                self._flush_log()
                 self.console.close()
-                self.console = self.pexpect_child.logfile = self.pexpect_child = None
+                self.console = None
                 self.applog.debug('Serial connection disconnected')
             else:
                 self.applog.debug('No active connection to disconnect')
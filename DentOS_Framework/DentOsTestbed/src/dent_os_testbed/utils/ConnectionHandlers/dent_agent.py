@@ -0,0 +1,108 @@
+"""Agent run on the device by DeviceAgent - a single python3 process started over SSH that
+reads JSON-RPC requests from stdin and writes the responses to stdout, one JSON document
+per line:
+  -> {"id": 1, "method": "exec", "params": {"cmd": "ip link set swp1 up"}}
+  <- {"id": 1, "result": {"rc": 0, "output": ""}}
+
+The agent only uses the python standard library, the commands chained with && on iproute2
+tools are run as a single -batch invocation per tool instead of a shell and a process per
+command. The requests are handled concurrently by a pool of threads, so a long running command
+does not hold back the others, and the responses are written as they complete.
+"""
+
+import concurrent.futures
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+
+MAX_WORKERS = 16
+BATCH_TOOLS = ['ip', 'tc', 'bridge']
+BATCH_OPTIONS_WITH_VALUE = ['-n', '-netns', '-f', '-family']
+SHELL_CHARS = re.compile(r'[|;&<>\'"`$(){}*?\\]')
+
+
+def _batch_head(cmd):
+    # tool and global options of a plain iproute2 command, None if it needs a shell
+    if SHELL_CHARS.search(cmd):
+        return None, None
+    tokens = cmd.split()
+    if not tokens or tokens[0] not in BATCH_TOOLS:
+        return None, None
+    idx = 1
+    while idx < len(tokens) and tokens[idx].startswith('-'):
+        if tokens[idx] in ('-batch', '-b'):
+            return None, None
+        idx += 2 if tokens[idx] in BATCH_OPTIONS_WITH_VALUE else 1
+    return tokens[:idx], ' '.join(tokens[idx:])
+
+
+def _run(args, input=None, shell=False):
+    proc = subprocess.Popen(args, shell=shell, stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    stdout, stderr = proc.communicate(input)
+    return proc.returncode, stdout + stderr
+
+
+def run_exec(cmd, input=None):
+    """
+    Run a command like a shell would. A plain iproute2 command runs without a shell and
+    a chain of them (cmd1&& cmd2...) sharing the tool and global options runs as a single
+    '<tool> -batch -' which stops at the first failure just like the chain
+    """
+    parts = [part.strip() for part in cmd.split('&&')]
+    heads = [_batch_head(part) for part in parts]
+    if input is None and heads[0][0] and all(head == heads[0][0] for head, _ in heads):
+        if len(parts) == 1:
+            return _run(heads[0][0] + heads[0][1].split())
+        return _run(heads[0][0] + ['-batch', '-'], input='\n'.join(line for _, line in heads) + '\n')
+    return _run(cmd, input=input, shell=True)
+
+
+def handle(method, params):
+    if method == 'ping':
+        return {'pid': os.getpid()}
+    if method == 'exec':
+        rc, output = run_exec(params['cmd'], params.get('input'))
+        return {'rc': rc, 'output': output}
+    if method == 'batch':
+        # several calls in one request, each one gets its own result or error
+        results = []
+        for call in params['calls']:
+            try:
+                results.append({'result': handle(call['method'], call.get('params', {}))})
+            except Exception as e:
+                results.append({'error': '%s: %s' % (type(e).__name__, e)})
+        return results
+    raise ValueError('Unknown method %s' % method)
+
+
+def serve(request, out, lock):
+    try:
+        response = {'id': request['id'], 'result': handle(request['method'], request.get('params', {}))}
+    except Exception as e:
+        response = {'id': request['id'], 'error': '%s: %s' % (type(e).__name__, e)}
+    line = json.dumps(response, separators=(',', ':')) + '\n'
+    with lock:
+        out.write(line)
+        out.flush()
+
+
+def main():
+    out = sys.stdout
+    lock = threading.Lock()
+    # the requests in flight at the end of stdin are still answered
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        while True:
+            line = sys.stdin.readline()
+            if not line:
+                return
+            if not line.strip():
+                continue
+            pool.submit(serve, json.loads(line), out, lock)
+
+
+if __name__ == '__main__':
+    main()
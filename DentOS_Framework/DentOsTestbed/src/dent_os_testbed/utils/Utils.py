@@ -23,6 +23,34 @@ class Host:
         self.password = password
 
 
+# response headers telling whether the content of a URL changed
+URL_VALIDATORS = ['ETag', 'Last-Modified', 'Content-Length']
+
+
+def _url_validators(headers):
+    return {name: headers[name] for name in URL_VALIDATORS if name in headers}
+
+
+async def get_url_validators(http_url):
+    """
+    Get the validators (ETag, Last-Modified, Content-Length) of a HTTP URL without
+    downloading it
+
+    Args:
+        http_url(str): URL string
+
+    Returns:
+        dict of the validators the server sent
+
+    Raises:
+        aiohttp.ClientResponseError: If the server answered with an error status
+    """
+    async with aiohttp.ClientSession() as session:
+        async with session.head(http_url, allow_redirects=True) as response:
+            response.raise_for_status()
+            return _url_validators(response.headers)
+
+
 async def download_file(http_url, out_file):
     """
     Download file from a given HTTP URL
@@ -31,12 +59,18 @@ async def download_file(http_url, out_file):
         http_url(str): URL string
         out_file(str): Path to save the downloaded file
 
+    Returns:
+        dict of the validators (see get_url_validators) of the downloaded content
+
     Raises:
+        aiohttp.ClientResponseError: If the server answered with an error status
         Exception: Generic errors
     """
     try:
         async with aiofiles.open(out_file, 'ab') as f, aiohttp.ClientSession() as session:
             async with session.get(http_url) as response:
+                # do not save an error page as the file
+                response.raise_for_status()
                 print(out_file)
                 while True:
                     chunk = await response.content.read(1024)
@@ -44,6 +78,7 @@ async def download_file(http_url, out_file):
                         break
                     await f.write(chunk)
                     await f.flush()
+                return _url_validators(response.headers)
     except Exception:
         raise
 
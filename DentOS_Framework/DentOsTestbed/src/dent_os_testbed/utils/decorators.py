@@ -1,35 +1,77 @@
+import asyncio
 import functools
+import time
 
 import pytest
 
 
 class TestCaseSetup(object):
     """
-    Decorator for
+    Decorator for test cases, optional keyword arguments
+    - setup/teardown: callables invoked before/after the test case
+    - perf_thresholds: thresholds the performance samples taken during the test case are checked against,
+      see dent_os_testbed.utils.perf_util.perf_check_sample, needs perfMonitorInterval in the testbed config
     """
 
     def __init__(self, *a, **kw):
         self.conf_args = a
         self.conf_kw = kw
-        if 'perf_thresholds' in kw:
-            pytest.testbed.perf_util.set_thresholds(thresholds=kw.get('perf_thresholds'))
+
+    def _perf_util(self):
+        if 'perf_thresholds' not in self.conf_kw:
+            return None
+        testbed = getattr(pytest, 'testbed', None)
+        return getattr(testbed, 'perf_util', None)
+
+    def _before(self, func):
+        perf_util = self._perf_util()
+        if perf_util:
+            pytest.testbed.applog.info('Resuming Perf for ' + func.__name__)
+            # (re)start the samplers on the loop running this test case, unless they run on their thread
+            perf_util.start_monitoring()
+            perf_util.resume()
+        if 'setup' in self.conf_kw:
+            pytest.testbed.applog.info('Invoking test case setup for  ' + func.__name__)
+            self.conf_kw['setup']()
+        return time.time()
+
+    def _after(self, func, start, passed):
+        perf_util = self._perf_util()
+        if perf_util:
+            pytest.testbed.applog.info('Pausing Perf for ' + func.__name__)
+            perf_util.pause()
+        if 'teardown' in self.conf_kw:
+            pytest.testbed.applog.info('Invoking test case teardown for ' + func.__name__)
+            self.conf_kw['teardown']()
+        # the samples of a failed test case say nothing about the thresholds
+        if perf_util and passed:
+            perf_util.analyze(thresholds=self.conf_kw['perf_thresholds'], since=start)
 
     def __call__(self, func):
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = self._before(func)
+                passed = False
+                try:
+                    val = await func(*args, **kwargs)
+                    passed = True
+                    return val
+                finally:
+                    self._after(func, start, passed)
+
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            if 'perf_thresholds' in self.conf_kw:
-                pytest.testbed.logger.info('Resuming Perf for ' + func.__name__)
-                pytest.testbed.perf_util.resume()
-            if 'setup' in self.conf_kw:
-                pytest.testbed.logger.info('Invoking test case setup for  ' + func.__name__)
-                self.conf_kw['setup']()
-            val = func(*args, **kwargs)
-            if 'perf_thresholds' in self.conf_kw:
-                pytest.testbed.logger.info('Pausing Perf for ' + func.__name__)
-                pytest.testbed.perf_util.pause()
-            if 'teardown' in self.conf_kw:
-                pytest.testbed.logger.info('Invoking test case teardown for ' + func.__name__)
-                self.conf_kw['teardown']()
-            return val
+            start = self._before(func)
+            passed = False
+            try:
+                val = func(*args, **kwargs)
+                passed = True
+                return val
+            finally:
+                self._after(func, start, passed)
 
         return wrapper
@@ -11,7 +11,7 @@ async def bonding_get_interconnected_infra_devices(testbed, infra_devices):
             if (
                 dd2 not in testbed.devices_dict
                 or testbed.devices_dict[dd2].type != DeviceType.INFRA_SWITCH
-                or not await testbed.devices_dict[dd2].is_connected()
+                or not await testbed.devices_dict[dd2].check_reachable()
             ):
                 continue
             if testbed.devices_dict[dd2].type == DeviceType.INFRA_SWITCH:
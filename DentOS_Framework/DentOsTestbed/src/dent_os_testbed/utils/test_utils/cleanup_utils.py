@@ -1,7 +1,10 @@
+import json
+
 from dent_os_testbed.constants import DEFAULT_LOGGER
 from dent_os_testbed.lib.ip.ip_address import IpAddress
 from dent_os_testbed.lib.ip.ip_link import IpLink
 from dent_os_testbed.lib.ip.ip_route import IpRoute
+from dent_os_testbed.lib.json_parser import json_parse
 from dent_os_testbed.lib.os.recoverable_sysctl import RecoverableSysctl
 from dent_os_testbed.lib.tc.tc_qdisc import TcQdisc
 from dent_os_testbed.logger.Logger import AppLogger
@@ -20,16 +23,15 @@ async def cleanup_qdiscs(dev):
         parse_output=True
     )
     qdiscs_info = out[0][dev.host_name]['parsed_output']
+    deletes = []
     for qdisc_obj in qdiscs_info:
         if qdisc_obj.get('root'):
-            await TcQdisc.delete(
-                input_data=[{dev.host_name: [{'dev': qdisc_obj['dev'], 'root': True}]}]
-            )
-            continue
-        if qdisc_obj['kind'] != 'noqueue':
-            await TcQdisc.delete(
-                input_data=[{dev.host_name: [{'dev': qdisc_obj['dev'], 'direction': qdisc_obj['kind']}]}]
-            )
+            deletes.append({'dev': qdisc_obj['dev'], 'root': True})
+        elif qdisc_obj['kind'] != 'noqueue':
+            deletes.append({'dev': qdisc_obj['dev'], 'direction': qdisc_obj['kind']})
+    if deletes:
+        # a single tc batch, a failing entry does not stop the others
+        await TcQdisc.delete(input_data=[{dev.host_name: deletes}], batch=True)
 
 
 async def cleanup_bridges(dev):
@@ -102,11 +104,15 @@ async def cleanup_ip_addrs(dev, tgen_dev):
     ]}])
 
 
+# the fields identifying a route, the rest of 'ip -j route' (flags, ...) is not decoded
+ROUTE_FIELDS = ['dst', 'dev', 'gateway', 'table', 'type', 'protocol', 'scope', 'metric', 'prefsrc', 'nexthops']
+
+
 async def get_initial_routes(dev):
     """Gets routes defined before test. Needed to cleanup routes configured during the test"""
     out = await IpRoute.show(
         input_data=[{dev.host_name: [{'cmd_options': '-j'}]}],
-        parse_output=True
+        parse_output=True, parse_fields=ROUTE_FIELDS
     )
     return out[0][dev.host_name]['parsed_output']
 
@@ -115,11 +121,15 @@ async def get_initial_tables(dev):
     """Gets tables defined before test. Needed to cleanup tables configured during the test"""
     out = await IpRoute.show(
         input_data=[{dev.host_name: [{'table': 'all', 'cmd_options': '-j'}]}],
-        parse_output=True
+        parse_output=True, parse_fields=ROUTE_FIELDS
     )
     return out[0][dev.host_name]['parsed_output']
 
 
+def _entry_keys(entries):
+    return {json.dumps(entry, sort_keys=True) for entry in entries}
+
+
 async def cleanup_routes(dev, initial_routes):
     """
     Removes all IP routes configured during test.
@@ -129,13 +139,14 @@ async def cleanup_routes(dev, initial_routes):
     logger.info('Deleting routes')
     out = await IpRoute.show(
         input_data=[{dev.host_name: [{'cmd_options': '-j'}]}],
-        parse_output=True
+        parse_output=True, parse_fields=ROUTE_FIELDS
     )
     new_routes = out[0][dev.host_name]['parsed_output']
-    if new_routes != initial_routes:
+    initial_keys = _entry_keys(initial_routes)
+    added = [route for route in new_routes if json.dumps(route, sort_keys=True) not in initial_keys]
+    if added:
         await IpRoute.delete(input_data=[{dev.host_name: [
-            {'dev': route['dev'], 'dst': route['dst']}
-            for route in new_routes if route not in initial_routes
+            {'dev': route['dev'], 'dst': route['dst']} for route in added
         ]}])
 
 
@@ -148,15 +159,15 @@ async def cleanup_vrf_table_ids(dev, initial_tables):
     logger.info('Deleting tables')
     out = await IpRoute.show(
         input_data=[{dev.host_name: [{'table': 'all', 'cmd_options': '-j'}]}],
-        parse_output=True
+        parse_output=True, parse_fields=ROUTE_FIELDS
     )
     new_tables = out[0][dev.host_name]['parsed_output']
-    if new_tables != initial_tables:
-        for table in new_tables:
-            if 'table' in table:
-                if all([table not in initial_tables, table['table'] != 'local']):
-                    await IpRoute.flush(input_data=[{dev.host_name: [
-                        {'table': table['table']}]}])
+    initial_keys = _entry_keys(initial_tables)
+    tables = {table['table'] for table in new_tables
+              if 'table' in table and table['table'] != 'local'
+              and json.dumps(table, sort_keys=True) not in initial_keys}
+    for table in tables:
+        await IpRoute.flush(input_data=[{dev.host_name: [{'table': table}]}])
 
 
 async def cleanup_sysctl():
@@ -237,3 +248,193 @@ async def cleanup_bonds(dev):
         if name.get('linkinfo', {}).get('info_kind') == 'bond':
             await IpLink.delete(input_data=[{dev.host_name: [
                  {'device': f"{name['ifname']}"}]}])
+
+
+SNAPSHOT_FAMILIES = {
+    'links': 'ip -j -d link show',
+    'addresses': 'ip -j address show',
+    'routes': 'ip -j route show table all',
+    'qdiscs': 'tc -j qdisc show',
+    'sysctls': "sysctl -a 2>/dev/null | grep -E '^net\\.(ipv4|ipv6|bridge)\\.'",
+}
+# links of these kinds created during a test are deleted, bridges/vrfs/bonds/vlans/...
+SNAPSHOT_VIRTUAL_LINKS = {'bridge', 'vrf', 'bond', 'team', 'vlan', 'macvlan', 'veth', 'dummy', 'vxlan', 'gre', 'ipip'}
+SNAPSHOT_MARKER = '@@snapshot '
+
+
+class DeviceSnapshot:
+    """
+    State of a device captured in one round trip, each family is indexed by a hashable key
+    so that two snapshots are compared in linear time
+    """
+
+    def __init__(self, host_name, outputs):
+        self.host_name = host_name
+        self.links = {}
+        self.addresses = {}
+        self.routes = {}
+        self.qdiscs = {}
+        self.sysctls = {}
+        self.families = list(outputs)
+        for family, output in outputs.items():
+            getattr(self, f'_index_{family}')(output)
+
+    @staticmethod
+    def _json(output, fields=None):
+        try:
+            return json_parse(output, fields=fields) if output.strip() else []
+        except ValueError:
+            return []
+
+    def _index_links(self, output):
+        for link in DeviceSnapshot._json(output):
+            if 'ifname' in link:
+                self.links[link['ifname']] = link
+
+    def _index_addresses(self, output):
+        for link in DeviceSnapshot._json(output):
+            for addr in link.get('addr_info', []):
+                if addr.get('scope') == 'link' or 'local' not in addr:
+                    # link local addresses come and go with the links
+                    continue
+                self.addresses[(link.get('ifname'), addr['local'], addr.get('prefixlen'))] = addr
+
+    def _index_routes(self, output):
+        # a route whose flags changed (offload, linkdown, ...) is still the same route
+        for route in DeviceSnapshot._json(output, ROUTE_FIELDS):
+            if route.get('table') == 'local':
+                continue
+            self.routes[json.dumps(route, sort_keys=True)] = route
+
+    def _index_qdiscs(self, output):
+        for qdisc in DeviceSnapshot._json(output):
+            self.qdiscs[json.dumps(qdisc, sort_keys=True)] = qdisc
+
+    def _index_sysctls(self, output):
+        for line in output.splitlines():
+            key, sep, value = line.partition(' = ')
+            if sep:
+                self.sysctls[key.strip()] = value.strip()
+
+    def revert_script(self, current):
+        """
+        Commands bringing the device from the current snapshot back to this one:
+        the added qdiscs, route tables, routes, addresses and virtual links are removed
+        and the changed sysctls and link masters restored. Only the additions are
+        reverted, the addresses, routes and links removed during the test are not
+        restored and neither are the attributes (mtu, state, ...) of the links
+
+        Args:
+            current (DeviceSnapshot): Snapshot taken after the test
+        """
+        cmds = []
+        deleted = {name for name, link in current.links.items()
+                   if name not in self.links
+                   and link.get('linkinfo', {}).get('info_kind') in SNAPSHOT_VIRTUAL_LINKS}
+        # the state of the deleted links goes away with them
+        for key, qdisc in current.qdiscs.items():
+            if key in self.qdiscs or qdisc.get('dev') in deleted or qdisc.get('kind') == 'noqueue':
+                continue
+            if qdisc.get('root'):
+                cmds.append(f"tc qdisc del dev {qdisc['dev']} root")
+            elif qdisc.get('kind') in ('ingress', 'clsact'):
+                cmds.append(f"tc qdisc del dev {qdisc['dev']} {qdisc['kind']}")
+        new_tables = {route.get('table', 'main') for route in current.routes.values()} - \
+            {route.get('table', 'main') for route in self.routes.values()} - {'main', 'default'}
+        for table in sorted(new_tables):
+            cmds.append(f'ip route flush table {table}')
+        for key, route in current.routes.items():
+            if key in self.routes or route.get('dev') in deleted or route.get('table', 'main') in new_tables:
+                continue
+            cmd = 'ip route del '
+            if route.get('type') and route['type'] != 'unicast':
+                cmd += f"{route['type']} "
+            cmd += f"{route['dst']} table {route.get('table', 'main')}"
+            if route.get('dev'):
+                cmd += f" dev {route['dev']}"
+            if route.get('gateway'):
+                cmd += f" via {route['gateway']}"
+            if 'metric' in route:
+                cmd += f" metric {route['metric']}"
+            cmds.append(cmd)
+        for (ifname, local, prefixlen) in current.addresses:
+            if (ifname, local, prefixlen) not in self.addresses and ifname not in deleted:
+                cmds.append(f'ip address del {local}/{prefixlen} dev {ifname}')
+        for name, link in current.links.items():
+            if name in deleted or name not in self.links:
+                continue
+            master = self.links[name].get('master')
+            if link.get('master') != master and (master is None or master in current.links):
+                cmds.append(f'ip link set dev {name} ' + (f'master {master}' if master else 'nomaster'))
+        for name in sorted(deleted):
+            cmds.append(f'ip link del dev {name}')
+        for key, value in current.sysctls.items():
+            if key in self.sysctls and self.sysctls[key] != value:
+                cmds.append(f'sysctl -q -w {key}="{self.sysctls[key]}"')
+        return cmds
+
+
+def _device_sh(dev):
+    return ('sudo ' if dev.ssh_conn_params.pssh else '') + 'sh -s'
+
+
+async def get_device_snapshot(dev, families=SNAPSHOT_FAMILIES):
+    """
+    Capture the families (see SNAPSHOT_FAMILIES) of the device state in a single round trip
+
+    Args:
+        dev (Device): Device to capture
+        families (list): Families to capture, all of them by default
+
+    Returns:
+        DeviceSnapshot of the device
+    """
+    # every family is followed by its exit status, on a line of its own
+    script = ''.join(f'echo "{SNAPSHOT_MARKER}{family}"; {SNAPSHOT_FAMILIES[family]} 2>/dev/null; '
+                     f'printf "\\n{SNAPSHOT_MARKER}{family} %d\\n" $?\n'
+                     for family in families)
+    rc, out = await dev.run_cmd(_device_sh(dev), input=script)
+    assert rc == 0, f'Failed to capture the state of {dev.host_name} {out}'
+    outputs = {}
+    rcs = {}
+    family = None
+    for line in out.splitlines():
+        if line.startswith(SNAPSHOT_MARKER):
+            family, _, status = line[len(SNAPSHOT_MARKER):].strip().partition(' ')
+            if status:
+                rcs[family] = int(status)
+                family = None
+            else:
+                outputs[family] = []
+        elif family:
+            outputs[family].append(line)
+    # a family captured empty would make the revert delete all of its entries
+    failed = [f for f in families if rcs.get(f) != 0]
+    assert not failed, f'Failed to capture {failed} of {dev.host_name} {out}'
+    return DeviceSnapshot(dev.host_name, {f: '\n'.join(lines) for f, lines in outputs.items()})
+
+
+async def revert_to_snapshot(dev, snapshot):
+    """
+    Revert the device to the snapshot with a single batched script, can be used
+    separately or by using the `cleanup_state` fixture
+
+    Args:
+        dev (Device): Device to revert
+        snapshot (DeviceSnapshot): Snapshot taken before the test
+    """
+    logger = AppLogger(DEFAULT_LOGGER)
+    current = await get_device_snapshot(dev, families=snapshot.families)
+    cmds = snapshot.revert_script(current)
+    if not cmds:
+        return
+    logger.info(f'Reverting {len(cmds)} changes on {dev.host_name}')
+    # the ip commands go through a single ip batch, the others run one by one
+    ip_cmds = [cmd[3:] for cmd in cmds if cmd.startswith('ip ')]
+    script = ''.join(f'{cmd} 2>&1\n' for cmd in cmds if cmd.startswith('tc '))
+    if ip_cmds:
+        script += "ip -force -batch - 2>&1 <<'EOF'\n" + '\n'.join(ip_cmds) + '\nEOF\n'
+    script += ''.join(f'{cmd} 2>&1\n' for cmd in cmds if cmd.startswith('sysctl '))
+    rc, out = await dev.run_cmd(_device_sh(dev), input=script)
+    if out:
+        logger.info(f'Revert output on {dev.host_name}: {out}')
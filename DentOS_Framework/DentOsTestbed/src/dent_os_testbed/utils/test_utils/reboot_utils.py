@@ -0,0 +1,189 @@
+"""
+  Reboot the devices and wait for them to come back, each device is tracked
+  through the phases
+  1. down    - the device stops answering ping after the reboot was triggered
+  2. ping    - the device answers ping again
+  3. ssh     - sshd sends its banner and a command can be run
+  4. systemd - systemctl is-system-running reports the boot as complete
+  5. ports   - the ports that were UP before the reboot are UP again
+
+  The probes are cheap (a single ICMP echo, a TCP connect reading the banner)
+  and back off while a phase is expected to take long, so many devices are
+  rebooted at once and each one is released as soon as it is ready instead of
+  waiting a fixed worst case time.
+"""
+
+import asyncio
+import json
+import time
+
+from net_utils.PingUtil import PingUtil
+
+from dent_os_testbed.utils.Utils import check_asyncio_results
+
+REBOOT_PHASES = ['down', 'ping', 'ssh', 'systemd', 'ports']
+REBOOT_DOWN_TIMEOUT = 120
+REBOOT_TIMEOUT = 600
+REBOOT_POLL_INTERVAL = 1
+REBOOT_MAX_POLL_INTERVAL = 15
+REBOOT_POLL_BACKOFF = 1.5
+SSH_PORT = 22
+SYSTEMD_READY_STATES = ['running', 'degraded']
+
+
+async def reboot_poll(probe, timeout, interval=REBOOT_POLL_INTERVAL, max_interval=REBOOT_MAX_POLL_INTERVAL,
+                      backoff=REBOOT_POLL_BACKOFF):
+    """
+    Call probe until it returns True, the interval between the calls grows by backoff
+    up to max_interval
+
+    Returns:
+        True if the probe succeeded within timeout seconds, False otherwise
+    """
+    deadline = time.time() + timeout
+    while True:
+        remaining = deadline - time.time()
+        try:
+            if await asyncio.wait_for(probe(), max(remaining, 1)):
+                return True
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            pass
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return False
+        await asyncio.sleep(min(interval, remaining))
+        interval = min(interval * backoff, max_interval)
+
+
+async def reboot_probe_ssh_banner(device, timeout=2):
+    """
+    Check that sshd of the device accepts connections without authenticating
+    """
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(device.ip, SSH_PORT), timeout)
+    try:
+        banner = await asyncio.wait_for(reader.readline(), timeout)
+        return banner.startswith(b'SSH-')
+    finally:
+        writer.close()
+
+
+async def reboot_get_up_ports(device):
+    """
+    Get the names of the swp ports in operstate UP
+    """
+    rc, out = await device.run_cmd('ip -j link show')
+    if rc != 0:
+        return None
+    return {
+        link['ifname'] for link in json.loads(out)
+        if link['ifname'].startswith('swp') and link.get('operstate') == 'UP'
+    }
+
+
+async def reboot_device_and_wait(device, timeout=REBOOT_TIMEOUT, ports=None, reboot=True):
+    """
+    Reboot a device and wait until it went through all the REBOOT_PHASES
+
+    Args:
+        device (Device): device to reboot
+        timeout (int): seconds for the device to be back
+        ports (list): ports expected UP after the reboot, the ports UP before the reboot
+            when None, an empty list skips the ports phase
+        reboot (bool): trigger the reboot, False when it was triggered by the caller
+
+    Returns:
+        dict of the seconds each phase took, e.g. {'down': 3.1, 'ping': 48.2, ..., 'total': 95.4}
+
+    Raises:
+        TimeoutError: when the device did not get through a phase in time
+    """
+    if ports is None:
+        ports = await reboot_get_up_ports(device) or set()
+    ports = set(ports)
+    start = time.time()
+    if reboot:
+        try:
+            await asyncio.wait_for(device.reboot(), 30)
+        except Exception as e:
+            # the connection is usually torn down under the reboot command
+            device.applog.debug(f'Reboot command did not complete: {e}')
+
+    async def is_down():
+        return not await PingUtil.ping_once(device.ip)
+
+    async def is_pingable():
+        return await PingUtil.ping_once(device.ip)
+
+    async def is_ssh_up():
+        if not await reboot_probe_ssh_banner(device):
+            return False
+        return await device.is_connected()
+
+    async def is_systemd_ready():
+        _, out = await device.run_cmd('systemctl is-system-running')
+        return out.strip() in SYSTEMD_READY_STATES
+
+    async def are_ports_up():
+        up = await reboot_get_up_ports(device)
+        return up is not None and ports <= up
+
+    probes = {
+        'down': is_down,
+        'ping': is_pingable,
+        'ssh': is_ssh_up,
+        'systemd': is_systemd_ready,
+        'ports': are_ports_up,
+    }
+    timings = {}
+    mark = start
+    for phase in REBOOT_PHASES:
+        if phase == 'ports' and not ports:
+            continue
+        remaining = start + timeout - time.time()
+        if phase == 'down':
+            # a fast reboot is missed with a growing interval
+            ok = await reboot_poll(probes[phase], min(REBOOT_DOWN_TIMEOUT, remaining), backoff=1)
+        else:
+            ok = await reboot_poll(probes[phase], remaining)
+        if not ok:
+            raise TimeoutError(f'{device.host_name} did not get to the {phase} phase of the reboot in {timeout}s')
+        now = time.time()
+        timings[phase] = round(now - mark, 1)
+        mark = now
+        device.applog.info(f'Reboot phase {phase} reached in {timings[phase]}s')
+    timings['total'] = round(mark - start, 1)
+    device.applog.info(f'Reboot completed in {timings["total"]}s {timings}')
+    return timings
+
+
+async def reboot_devices_and_wait(devices, timeout=REBOOT_TIMEOUT, ports=None, reboot=True):
+    """
+    Reboot the devices at once and wait for all of them to be back
+
+    Args:
+        devices (list): devices to reboot
+        timeout (int): seconds for each device to be back
+        ports (dict): host_name -> ports expected UP after the reboot, see reboot_device_and_wait
+        reboot (bool): trigger the reboot, False when it was triggered by the caller
+
+    Returns:
+        dict of host_name -> phase timings
+
+    Raises:
+        Exception: when one or more devices did not come back, extra_info lists them
+    """
+    ports = ports or {}
+
+    async def reboot_one(device):
+        try:
+            return await reboot_device_and_wait(device, timeout, ports.get(device.host_name), reboot)
+        except Exception as e:
+            device.applog.error(f'Reboot failed: {e}')
+            e.extra_info = device.host_name
+            raise
+
+    results = await asyncio.gather(*[reboot_one(device) for device in devices], return_exceptions=True)
+    check_asyncio_results(results, 'reboot_devices_and_wait')
+    return {device.host_name: timing for device, timing in zip(devices, results)}
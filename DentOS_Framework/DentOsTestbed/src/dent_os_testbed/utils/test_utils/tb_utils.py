@@ -1,10 +1,15 @@
 import asyncio
+import gzip
 import json
+import math
 import os
-import time
 import re
+import shutil
+import tarfile
 import pytest
 
+from net_utils.IcmpProber import IcmpProber
+
 from dent_os_testbed.Device import DeviceType
 from dent_os_testbed.lib.interfaces.interface import Interface
 from dent_os_testbed.lib.ip.ip_link import IpLink
@@ -16,6 +21,7 @@ from dent_os_testbed.lib.os.service import Service
 from dent_os_testbed.lib.os.system import System
 from dent_os_testbed.lib.tc.tc_qdisc import TcQdisc
 from dent_os_testbed.utils.Utils import check_asyncio_results
+from dent_os_testbed.utils.netlink_monitor import NetlinkMonitor, netlink_match
 from dent_os_testbed.lib.ethtool.ethtool import Ethtool
 
 from pyvis.network import Network
@@ -69,7 +75,7 @@ async def tb_clean_config(testbed):
     for d in testbed.devices:
         if d.type == DeviceType.TRAFFIC_GENERATOR:
             continue
-        if not await d.is_connected():
+        if not await d.check_reachable():
             continue
         cos.append(tb_clean_config_device(d))
     results = await asyncio.gather(*cos, return_exceptions=True)
@@ -100,13 +106,41 @@ async def tb_flap_links(dev, ports):
             input_data=[{dev.host_name: [{'device': link_name, 'operstate': 'down'}]}],
         )
         assert out[0][dev.host_name]['rc'] == 0, f'Failed to down the link {link_name} {out}'
-        time.sleep(2)
+        # the link is brought back up as soon as it went down, or after the 2s flap interval
+        await tb_wait_for_link_state(dev, link_name, up=False, timeout=2, raise_on_timeout=False)
         out = await IpLink.set(
             input_data=[{dev.host_name: [{'device': link_name, 'operstate': 'up'}]}],
         )
         assert out[0][dev.host_name]['rc'] == 0, f'Failed to down the link {link_name}'
 
 
+async def tb_wait_for_link_state(dev, port, up=True, timeout=60, raise_on_timeout=True):
+    """
+    Wait for the carrier of port to go up/down, returns as soon as the link event
+    shows up in the ip monitor of the device instead of sleeping for timeout
+
+    - dev: dent device
+    - port: interface name
+    - up: wait for LOWER_UP to be set (True) or cleared (False)
+    - timeout: how long to wait for the link event
+    - raise_on_timeout: raise TimeoutError if the link did not change in time
+    """
+    async def check():
+        out = await IpLink.show(input_data=[{dev.host_name: [{'device': port, 'cmd_options': '-j'}]}])
+        if out[0][dev.host_name]['rc'] != 0:
+            return False
+        links = json.loads(out[0][dev.host_name]['result'])
+        return bool(links) and ('LOWER_UP' in links[0].get('flags', [])) == up
+
+    monitor = NetlinkMonitor.get(dev, 'ip', 'link')
+    try:
+        await monitor.wait_for(netlink_match('link', target=port, LOWER_UP=up), timeout=timeout, check=check)
+    except TimeoutError:
+        if raise_on_timeout:
+            raise
+        dev.applog.info(f'{port} on {dev.host_name} is not {"up" if up else "down"} after {timeout}s')
+
+
 async def tb_device_check_services(dev, prev_state, check, healthy_services=None):
     # not working on cumulus
     if dev.os == 'cumulus':
@@ -277,7 +311,7 @@ async def tb_get_device_object_from_dut(testbed, dev, skip_tg=True, skip_disconn
     device = testbed.devices_dict[dev.device_id]
     if skip_tg and device.type == DeviceType.TRAFFIC_GENERATOR:
         return None
-    if skip_disconnected and not await device.is_connected():
+    if skip_disconnected and not await device.check_reachable():
         device.applog.info('Device not connected skipping')
         return None
     return device
@@ -308,7 +342,7 @@ async def tb_get_all_devices(
             # only look for requested devices
             if include_devices is not None and dev.type not in include_devices:
                 continue
-            if skip_disconnected and not await dev.is_connected():
+            if skip_disconnected and not await dev.check_reachable():
                 continue
             devices.append(dev)
     else:
@@ -318,7 +352,7 @@ async def tb_get_all_devices(
             # only look for requested devices
             if include_devices is not None and dev.type not in include_devices:
                 continue
-            if skip_disconnected and not await dev.is_connected():
+            if skip_disconnected and not await dev.check_reachable():
                 continue
             devices.append(dev)
     return devices
@@ -338,7 +372,7 @@ async def tb_reload_nw_and_flush_firewall(devices):
 
     cos = list()
     for d in devices:
-        if not await d.is_connected():
+        if not await d.check_reachable():
             continue
         cos.append(tb_device_flush_firewall(d))
     results = await asyncio.gather(*cos, return_exceptions=True)
@@ -357,17 +391,34 @@ async def tb_reload_firewall(devices):
 
     cos = list()
     for d in devices:
-        if not await d.is_connected():
+        if not await d.check_reachable():
             continue
         cos.append(tb_device_reload_firewall(d))
     results = await asyncio.gather(*cos, return_exceptions=True)
     check_asyncio_results(results, 'tb_reload_firewall')
 
 
-async def tb_ping_device(device, target, pkt_loss_treshold=50, dump=False, count=10, interval=None):
+async def tb_ping_device(device, target, pkt_loss_treshold=50, dump=False, count=10, interval=None, successes=None):
+    """
+    Ping target from the device, or from the testbed host when device is None.
+    With successes the ping stops once that many replies came back instead of
+    sending all the count packets.
+    """
+    if device is None:
+        stats = await IcmpProber.get().probe(
+            target, count=count, successes=successes, interval=interval or 1
+        )
+        if dump:
+            print(f'Pinged {target} from the testbed host: {stats}')
+        return 0 if stats['received'] and stats['loss'] <= pkt_loss_treshold else 1
     pkt_stats = ''
     inter = f'-i {interval}' if interval is not None else ''
-    cmd = f'ping -c {count} {inter} {target}'
+    if successes:
+        # with a deadline ping exits after count replies
+        deadline = math.ceil(count * (interval or 1)) + 1
+        cmd = f'ping -c {successes} -w {deadline} {inter} {target}'
+    else:
+        cmd = f'ping -c {count} {inter} {target}'
     rc, out = await device.run_cmd(cmd, sudo=True)
     if dump:
         device.applog.info(f'Ran {cmd} on {device.host_name} with rc {rc} and out {out}')
@@ -427,73 +478,115 @@ async def tb_check_all_devices_are_connected(devices):
     return True
 
 
-def console_log_analyzer(dev, file):
+def console_log_analyzer(dev, lines):
     # check for back trace
-    pattern = re.compile('------------[ cut here ]------------')
-    for line in open(file):
-        for match in re.finditer(pattern, line):
+    pattern = re.compile(re.escape('------------[ cut here ]------------'))
+    for line in lines:
+        if pattern.search(line):
             print(line)
             return -1
     return 0
 
 
-async def tb_collect_logs_from_device(device):
-    files = [
-        '/etc/network/interfaces',
-        '/etc/frr/frr.conf',
-        '/var/log/messages',
-        '/var/log/syslog',
-        '/var/log/autoprovision',
-        '/var/log/frr/frr.log',
-        '/var/tmp/dmesg',
-        '/var/tmp/boot-0.log',
-    ]
-    file_analyzers = {
-        '/var/tmp/boot-0.log': console_log_analyzer,
-    }
-
-    await device.run_cmd('dmesg > /var/tmp/dmesg', sudo=True)
-    await device.run_cmd('journalctl -b 0 > /var/tmp/boot-0.log', sudo=True)
-    # copy to temp so that everyone can read
-    for f in files + device.files_to_collect:
-        fname = f.split('/')[-1]
-        rc, out = await device.run_cmd(f'ls {f}', sudo=True)
-        if rc != 0:
-            continue
-        await device.run_cmd(f'cp {f} /tmp/{fname}', sudo=True)
-        await device.run_cmd(f'chmod 755 /tmp/{fname}', sudo=True)
-
-    for f in files + device.files_to_collect:
-        l_f = f.split('/')[-1]
-        r_f = os.path.join('/tmp', l_f)
-        l_f = os.path.join(device.serial_logs_base_dir, l_f)
-        rc, out = await device.run_cmd(f'ls {r_f}', sudo=True)
-        if rc != 0:
-            continue
-        device.applog.info('Getting the remote file ' + r_f)
-        device.applog.info(f'Copying file {r_f} to {l_f}')
-        try:
-            await device.scp(l_f, r_f, remote_to_local=True)
-            if f in file_analyzers:
-                ret = file_analyzers[f](device, l_f)
-                assert ret == 0, f'Found Errors in {f} on {device.host_name}'
-        except Exception as e:
-            device.applog.error(str(e))
+TB_LOG_FILES = [
+    '/etc/network/interfaces',
+    '/etc/frr/frr.conf',
+    '/var/log/messages',
+    '/var/log/syslog',
+    '/var/log/autoprovision',
+    '/var/log/frr/frr.log',
+    '/var/tmp/dmesg',
+    '/var/tmp/boot-0.log',
+]
+TB_LOG_ANALYZERS = {
+    'boot-0.log': console_log_analyzer,
+}
+TB_LOG_COMPRESSORS = {
+    'gz': 'gzip -c',
+    'zstd': 'zstd -c -T0',
+}
+
+
+def _tb_open_logs_archive(path, compress):
+    # the decompressed stream of the archive, the tar is read from it
+    if compress != 'zstd':
+        return gzip.open(path, 'rb')
+    # zstandard is only needed for zstd archives
+    import zstandard
+
+    return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'))
+
+
+async def tb_collect_logs_from_device(device, since=None, compress='gz'):
+    """
+    Collect the logs of the device in a single round trip, the DUT writes one
+    compressed tar of the existing log files to stdout which is streamed back
+    over one SSH channel and unpacked into the serial logs directory of the device
+
+    - device: dent device
+    - since: epoch, only collect the journal entries newer than since
+    - compress: gz or zstd (needs zstd on the DUT and the zstandard module locally)
+    """
+    journal = f'journalctl -b 0 --since @{int(since)}' if since else 'journalctl -b 0'
+    files = ' '.join(TB_LOG_FILES + device.files_to_collect)
+    cmd = (
+        f"sh -c 'dmesg > /var/tmp/dmesg; {journal} > /var/tmp/boot-0.log; "
+        f'for f in {files}; do [ -f $f ] && echo $f; done | '
+        f"tar -cf - -T - 2>/dev/null | {TB_LOG_COMPRESSORS[compress]}'"
+    )
+    archive = os.path.join(device.serial_logs_base_dir, f'logs.tar.{compress}')
+    device.applog.info(f'Collecting the logs of {device.host_name} to {archive}')
+    with open(archive, 'wb') as f:
+        async for chunk in device.stream_bytes(cmd, sudo=True):
+            f.write(chunk)
+
+    try:
+        with _tb_open_logs_archive(archive, compress) as stream, tarfile.open(fileobj=stream, mode='r|') as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                name = os.path.basename(member.name)
+                device.applog.info(f'Unpacking {name} to {device.serial_logs_base_dir}')
+                try:
+                    src = tar.extractfile(member)
+                    with open(os.path.join(device.serial_logs_base_dir, name), 'wb') as f:
+                        try:
+                            if name in TB_LOG_ANALYZERS:
+                                # analyze the lines while they are written out
+                                lines = (f.write(line) and line.decode('utf-8', errors='replace') for line in src)
+                                ret = TB_LOG_ANALYZERS[name](device, lines)
+                                assert ret == 0, f'Found Errors in {name} on {device.host_name}'
+                        except Exception as e:
+                            device.applog.error(str(e))
+                        # the rest of the file the analyzer did not read
+                        shutil.copyfileobj(src, f)
+                except Exception as e:
+                    device.applog.error(str(e))
+            # the tar ends before the compressed stream does, the checksum of the stream is
+            # only verified at its end
+            while stream.read(65536):
+                pass
+    except Exception as e:
+        # a truncated or corrupt archive, the files before the error are kept
+        device.applog.error(f'Failed to unpack {archive}: {e}')
 
 
 async def tb_collect_logs_from_devices(devices,
                                        exclude_devices=[DeviceType.TRAFFIC_GENERATOR],
+                                       since=None,
+                                       compress='gz',
                                        ):
     """
     collect the logs from the given devices, skip if not connected.
+    see tb_collect_logs_from_device for since and compress
     """
     cos = list()
     for device in devices:
         if device.type in exclude_devices:
             continue
-        if not await device.is_connected():
+        if not await device.check_reachable():
             continue
-        cos.append(tb_collect_logs_from_device(device))
+        cos.append(tb_collect_logs_from_device(device, since=since, compress=compress))
     results = await asyncio.gather(*cos, return_exceptions=True)
     check_asyncio_results(results, 'tb_collect_logs_from_devices')
 
@@ -30,7 +30,7 @@ async def tgen_utils_get_dent_devices_with_tgen(testbed, device_types, min_links
                 if (
                     dut not in testbed.devices_dict
                     or testbed.devices_dict[dut].os != 'dentos'
-                    or not await testbed.devices_dict[dut].is_connected()
+                    or not await testbed.devices_dict[dut].check_reachable()
                 ):
                     continue
                 if device_types and not testbed.devices_dict[dut].type in device_types:
@@ -39,10 +39,11 @@ async def tgen_utils_get_dent_devices_with_tgen(testbed, device_types, min_links
     return tgen_dev, dent_devices
 
 
-async def _get_iface_addr_info(dd, iface, info):
+async def _get_iface_addr_info(dd, iface, info, cache=False):
     # get the n/w ip address
     out = await IpAddress.show(
         input_data=[{dd.host_name: [{'dev': iface, 'cmd_options': '-j'}]}],
+        cache=cache,
     )
     dd.applog.info(out)
     if out[0][dd.host_name]['rc'] != 0:
@@ -61,10 +62,12 @@ async def _get_iface_addr_info(dd, iface, info):
     return False
 
 
-async def tgen_utils_get_swp_info(dent_dev, swp, swp_info):
+async def tgen_utils_get_swp_info(dent_dev, swp, swp_info, cache=False):
     """
     - get the ipaddress, mac if there is a PVLAN on this interface else get it from
       the physical interface
+    - cache=True reuses the recent show results of the device, only pass it when the
+      vlans and addresses are known not to have changed since
     """
     dent = dent_dev.host_name
     # if there is a vlan configured on this port then we need use that
@@ -78,7 +81,8 @@ async def tgen_utils_get_swp_info(dent_dev, swp, swp_info):
                     }
                 ]
             }
-        ]
+        ],
+        cache=cache,
     )
     dent_dev.applog.info(f'{out}')
     vlans = json.loads(out[0][dent]['result'])
@@ -88,10 +92,10 @@ async def tgen_utils_get_swp_info(dent_dev, swp, swp_info):
             if 'flags' not in vlan or 'PVID' not in vlan['flags']:
                 continue
             # get the IP address for it
-            if await _get_iface_addr_info(dent_dev, 'vlan{}'.format(vlan['vlan']), swp_info):
+            if await _get_iface_addr_info(dent_dev, 'vlan{}'.format(vlan['vlan']), swp_info, cache):
                 return
     # get it from the interface
-    await _get_iface_addr_info(dent_dev, swp, swp_info)
+    await _get_iface_addr_info(dent_dev, swp, swp_info, cache)
 
 
 def tgen_utils_dev_groups_from_config(config):
@@ -576,6 +580,40 @@ async def tgen_utils_get_egress_stats(device, stats_row, num_of_rows=None, do_lo
     return stats
 
 
+async def tgen_utils_get_traffic_stats_columns(device, stats_type='Flow Statistics'):
+    """
+    Returns the whole stats view as columns instead of rows:
+    {column caption: [value of row 0, value of row 1, ...]}
+
+    The view is read a page per request, so this is the one to use for views
+    with many flows. Use the tgen_utils_*_column helpers on the result, e.g.
+      stats = await tgen_utils_get_traffic_stats_columns(tgen_dev)
+      failed = tgen_utils_get_failed_flows(stats, max_loss=0.5)
+    """
+    device.applog.info(f'Getting Traffic Stats Columns {stats_type}')
+    out = await TrafficGen.get_stats(input_data=[{device.host_name: [{'stats_type': stats_type, 'columnar': True}]}])
+    assert out[0][device.host_name]['rc'] == 0, f'Failed to get stats\n{out[0][device.host_name]}'
+    columns = out[0][device.host_name]['result']
+    device.applog.info('Got {} rows of {}'.format(tgen_utils_get_stats_rows(columns), stats_type))
+    return columns
+
+
+async def tgen_utils_get_egress_stats_columns(device, stats_row, num_of_rows=None):
+    """
+    Same as tgen_utils_get_egress_stats, but returns the egress stats as columns
+    (see tgen_utils_get_traffic_stats_columns). The first row is the traffic item
+    summary, the rest are keyed by the 'Egress Tracking' columns.
+    """
+    out = await TrafficGen.get_drilldown_stats(input_data=[{device.host_name: [
+        {'group_by': 'Show All Egress',
+         'row': stats_row,
+         'num_of_rows': num_of_rows,
+         'columnar': True}
+    ]}])
+    assert out[0][device.host_name]['rc'] == 0, f'Failed to get egress stats\n{out[0][device.host_name]}'
+    return out[0][device.host_name]['result']
+
+
 async def tgen_utils_clear_traffic_stats(device):
     device.applog.info('Clearing Traffic Stats')
     out = await TrafficGen.clear_stats(input_data=[{device.host_name: [{}]}])
@@ -595,7 +633,7 @@ async def tgen_utils_stop_protocols(device):
     out = await TrafficGen.stop_protocols(input_data=[{device.host_name: [{}]}])
     # assert out[0][device.host_name]["rc"] == 0
     device.applog.info(out)
-    time.sleep(10)
+    await asyncio.sleep(10)
     device.applog.info('Removing Session')
     out = await TrafficGen.disconnect(input_data=[{device.host_name: [{}]}])
     # assert out[0][device.host_name]["rc"] == 0
@@ -610,7 +648,7 @@ async def tgen_util_flap_bgp_peer(device, ixp, skip_down=False, skip_up=False):
         )
         device.applog.info(out)
         assert out[0][device.host_name]['rc'] == 0
-        time.sleep(5)
+        await asyncio.sleep(5)
     if not skip_up:
         device.applog.info(f'flapping bgp protocol peer {ixp} UP')
         out = await TrafficGen.set_protocol(
@@ -694,6 +732,61 @@ def tgen_utils_get_loss(row):
     return float(loss)
 
 
+def tgen_utils_get_stats_rows(columns):
+    """
+    Number of rows in columnar stats
+    """
+    return len(next(iter(columns.values()), []))
+
+
+def tgen_utils_get_float_column(columns, column, default=0.0):
+    """
+    Convert a column of columnar stats to floats, empty cells become default
+    """
+    return [float(value) if value != '' else default for value in columns[column]]
+
+
+def tgen_utils_get_loss_column(columns):
+    """
+    Loss % of every row of columnar stats, same as tgen_utils_get_loss per row
+    """
+    return tgen_utils_get_float_column(columns, 'Loss %')
+
+
+def tgen_utils_get_rate_column(columns, column='Rx Frame Rate'):
+    """
+    Frame/bit rate column of columnar stats, e.g. 'Tx Frame Rate', 'Rx Rate (Mbps)'
+    """
+    return tgen_utils_get_float_column(columns, column)
+
+
+def tgen_utils_index_stats_columns(columns, *keys):
+    """
+    Map the rows of columnar stats by the value of the key columns:
+    {key value: row index} for a single key (e.g. 'Traffic Item', 'Flow Group'),
+    {(key 1 value, key 2 value, ...): row index} for several (e.g. egress tracking)
+    """
+    if not keys:
+        keys = ('Traffic Item',)
+    values = zip(*[columns[key] for key in keys])
+    return {value[0] if len(keys) == 1 else value: idx for idx, value in enumerate(values)}
+
+
+def tgen_utils_get_failed_flows(columns, max_loss=0.0, min_rate=None, rate_column='Rx Frame Rate', key='Traffic Item'):
+    """
+    Per flow pass/fail over columnar stats - returns {flow key: row index} of the
+    rows with Loss % above max_loss, or rate below min_rate if it is set.
+    For Flow Statistics the flows are keyed by the Traffic Item by default; pass
+    a list of columns as key to tell the flows of the same traffic item apart.
+    """
+    keys = key if isinstance(key, (list, tuple)) else [key]
+    failed = [loss > max_loss for loss in tgen_utils_get_loss_column(columns)]
+    if min_rate is not None:
+        failed = [f or rate < min_rate for f, rate in zip(failed, tgen_utils_get_rate_column(columns, rate_column))]
+    flows = zip(*[columns[k] for k in keys])
+    return {flow[0] if len(keys) == 1 else flow: idx for idx, flow in enumerate(flows) if failed[idx]}
+
+
 async def tgen_utils_send_ping(device, config):
     """
     - Sends ping from TG ports to DUT
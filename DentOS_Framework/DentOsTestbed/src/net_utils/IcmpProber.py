@@ -0,0 +1,205 @@
+"""Utility module for probing the reachability of many targets from a single socket.
+"""
+
+import asyncio
+import os
+import socket
+import struct
+import time
+
+
+class IcmpProber(object):
+    """In-process ICMP echo prober. A single ICMP socket per event loop is shared by all
+    the probes, the replies are matched to the requests by source address and sequence
+    number. When ICMP sockets are not permitted (no root and no ping_group_range) the
+    probes fall back to a TCP connect to TCP_FALLBACK_PORT. The APIs of the class are
+    async and the calling application needs to have a running event loop to call them.
+    """
+
+    ICMP_ECHO_REPLY = 0
+    ICMP_ECHO_REQUEST = 8
+    PAYLOAD = b'dent-os-testbed'.ljust(56, b'\0')
+    TCP_FALLBACK_PORT = 22
+    # room for the replies of thousands of concurrent probes arriving in a burst
+    RCVBUF = 4 * 1024 * 1024
+    _PROBERS = {}
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.ident = os.getpid() & 0xFFFF
+        self.sock, self.raw = IcmpProber._open_socket()
+        self._seq = 0
+        self._pending = {}
+        if self.sock:
+            loop.add_reader(self.sock.fileno(), self._on_readable)
+
+    @classmethod
+    def get(cls):
+        """Get the prober of the running event loop"""
+        loop = asyncio.get_running_loop()
+        for other in [other for other in cls._PROBERS if other.is_closed()]:
+            cls._PROBERS.pop(other).close()
+        if loop not in cls._PROBERS:
+            cls._PROBERS[loop] = cls(loop)
+        return cls._PROBERS[loop]
+
+    @staticmethod
+    def _open_socket():
+        # unprivileged ping socket first, then raw socket
+        for kind, raw in [(socket.SOCK_DGRAM, False), (socket.SOCK_RAW, True)]:
+            try:
+                sock = socket.socket(socket.AF_INET, kind, socket.IPPROTO_ICMP)
+            except OSError:
+                continue
+            sock.setblocking(False)
+            # SO_RCVBUFFORCE goes past net.core.rmem_max but needs CAP_NET_ADMIN
+            for opt in [getattr(socket, 'SO_RCVBUFFORCE', None), socket.SO_RCVBUF]:
+                try:
+                    sock.setsockopt(socket.SOL_SOCKET, opt, IcmpProber.RCVBUF)
+                    break
+                except (OSError, TypeError):
+                    continue
+            return sock, raw
+        return None, False
+
+    @staticmethod
+    def _checksum(data):
+        if len(data) % 2:
+            data += b'\0'
+        total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+        total = (total >> 16) + (total & 0xFFFF)
+        total += total >> 16
+        return ~total & 0xFFFF
+
+    def _packet(self, seq):
+        header = struct.pack('!BBHHH', IcmpProber.ICMP_ECHO_REQUEST, 0, 0, self.ident, seq)
+        checksum = IcmpProber._checksum(header + IcmpProber.PAYLOAD)
+        header = struct.pack('!BBHHH', IcmpProber.ICMP_ECHO_REQUEST, 0, checksum, self.ident, seq)
+        return header + IcmpProber.PAYLOAD
+
+    def _on_readable(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                continue
+            if self.raw:
+                # raw sockets get the IP header as well
+                data = data[(data[0] & 0x0F) * 4:]
+            if len(data) < 8:
+                continue
+            kind, _, _, ident, seq = struct.unpack('!BBHHH', data[:8])
+            # the kernel sets the id of ping sockets and only hands them their own replies
+            if kind != IcmpProber.ICMP_ECHO_REPLY or (self.raw and ident != self.ident):
+                continue
+            fut = self._pending.pop((addr[0], seq), None)
+            if fut and not fut.done():
+                fut.set_result(time.monotonic())
+
+    async def _echo(self, addr, timeout):
+        self._seq = (self._seq + 1) & 0xFFFF
+        key = (addr, self._seq)
+        fut = self.loop.create_future()
+        self._pending[key] = fut
+        start = time.monotonic()
+        try:
+            self.sock.sendto(self._packet(self._seq), (addr, 0))
+            return (await asyncio.wait_for(fut, timeout) - start) * 1000
+        except (OSError, asyncio.TimeoutError):
+            return None
+        finally:
+            self._pending.pop(key, None)
+
+    async def _connect(self, addr, timeout):
+        start = time.monotonic()
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(addr, IcmpProber.TCP_FALLBACK_PORT), timeout
+            )
+            writer.close()
+        except ConnectionRefusedError:
+            # the host answered with a reset
+            pass
+        except (OSError, asyncio.TimeoutError):
+            return None
+        return (time.monotonic() - start) * 1000
+
+    async def _resolve(self, target):
+        infos = await self.loop.getaddrinfo(target, None, family=socket.AF_INET)
+        return infos[0][4][0]
+
+    async def probe(self, target, count=10, successes=None, interval=0.2, timeout=1):
+        """Probe a target, requests are sent every interval seconds and stop early once
+        successes replies came back.
+
+        Args:
+            str target: IP address (or) domain name of the target.
+            int count: Max number of requests to send
+            int successes: Number of replies after which the probe stops (count when None)
+            float interval: Seconds between the requests
+            float timeout: Seconds to wait for the reply of a request
+
+        Returns:
+            dict with target, sent, received, loss (%) and rtt_min, rtt_avg, rtt_max (ms,
+            None without replies).
+
+        """
+        successes = successes or count
+        try:
+            addr = await self._resolve(target)
+        except OSError:
+            addr = None
+        rtts = []
+        sent = 0
+        pending = set()
+        echo = self._echo if self.sock else self._connect
+        while addr and sent < count and len(rtts) < successes:
+            pending.add(asyncio.ensure_future(echo(addr, timeout)))
+            sent += 1
+            next_send = self.loop.time() + interval
+            # collect the replies coming in until the next request is due
+            while len(rtts) < successes:
+                remaining = next_send - self.loop.time()
+                if remaining <= 0:
+                    break
+                if not pending:
+                    await asyncio.sleep(remaining)
+                    break
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                rtts.extend(rtt for rtt in (task.result() for task in done) if rtt is not None)
+        if pending and len(rtts) < successes:
+            done, pending = await asyncio.wait(pending)
+            rtts.extend(rtt for rtt in (task.result() for task in done) if rtt is not None)
+        # the requests still in flight after the early exit are not counted
+        for task in pending:
+            task.cancel()
+        sent -= len(pending)
+        return {
+            'target': target,
+            'sent': sent,
+            'received': len(rtts),
+            'loss': round(100.0 * (sent - len(rtts)) / sent, 1) if sent else 100.0,
+            'rtt_min': round(min(rtts), 3) if rtts else None,
+            'rtt_avg': round(sum(rtts) / len(rtts), 3) if rtts else None,
+            'rtt_max': round(max(rtts), 3) if rtts else None,
+        }
+
+    async def probe_many(self, targets, **kwargs):
+        """Probe the targets concurrently, see probe for the arguments
+
+        Returns:
+            dict of target -> probe result
+        """
+        results = await asyncio.gather(*[self.probe(target, **kwargs) for target in targets])
+        return {result['target']: result for result in results}
+
+    def close(self):
+        if self.sock:
+            if not self.loop.is_closed():
+                self.loop.remove_reader(self.sock.fileno())
+            self.sock.close()
+            self.sock = None
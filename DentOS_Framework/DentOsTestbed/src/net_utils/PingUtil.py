@@ -1,7 +1,9 @@
 """Utility module for doing a ping to a specific target.
 """
 
-import asyncio
+import math
+
+from net_utils.IcmpProber import IcmpProber
 
 
 class PingUtil(object):
@@ -11,37 +13,41 @@ class PingUtil(object):
     """
 
     @staticmethod
-    async def verify_ping(target, pkt_loss_treshold, dump=False):
-        """Check if target is reachable by doing an ICMP ping.
+    async def verify_ping(target, pkt_loss_treshold, dump=False, count=10, interval=0.2):
+        """Check if target is reachable by doing an ICMP ping. The ping stops as soon as
+        enough replies came back for the packet loss to stay below the treshold.
 
         Args:
             str target: IP address (or) domain name of the target.
             int pkt_loss_treshold: Treshold of packet loss. If packet loss is below the treshold,
             the ping is considered failure
+            int count: Number of echo requests to send
+            float interval: Seconds between the echo requests
 
         Returns:
             True if ping is successful, False otherwise.
 
         """
-        proc = await asyncio.create_subprocess_exec(
-            'ping', '-c', '10', target, stdout=asyncio.subprocess.PIPE
-        )
-        pkt_stats = ''
-        while True:
-            line = await proc.stdout.readline()
-            if line == b'':
-                return False
-            line = line.decode('utf8').rstrip()
-            if dump:
-                print(line)
-            if 'transmitted' in line:
-                pkt_stats = line
-        pkt_loss = next(
-            (pkt_stat for pkt_stat in pkt_stats.split(',') if 'packet loss' in pkt_stat), None
-        )
-        if pkt_loss:
-            pkt_loss_percent = pkt_loss.strip().split(' ')[0].split('.')[0]
-            pkt_loss_percent = int(pkt_loss_percent[: pkt_loss_percent.find('%')])
-        else:
-            pkt_loss_percent = -1
-        return True if pkt_loss_percent <= pkt_loss_treshold else False
+        successes = max(1, math.ceil(count * (100 - pkt_loss_treshold) / 100.0))
+        stats = await IcmpProber.get().probe(target, count=count, successes=successes, interval=interval)
+        if dump:
+            print(
+                '{target}: {sent} packets transmitted, {received} received, {loss}% packet loss, '
+                'rtt min/avg/max {rtt_min}/{rtt_avg}/{rtt_max} ms'.format(**stats)
+            )
+        return stats['received'] > 0 and stats['loss'] <= pkt_loss_treshold
+
+    @staticmethod
+    async def ping_once(target, timeout=1):
+        """Send a single ICMP echo request, a cheap probe for polling loops.
+
+        Args:
+            str target: IP address (or) domain name of the target.
+            int timeout: Seconds to wait for the reply
+
+        Returns:
+            True if the target replied, False otherwise.
+
+        """
+        stats = await IcmpProber.get().probe(target, count=1, timeout=timeout)
+        return stats['received'] == 1
@@ -0,0 +1,140 @@
+import asyncio
+import io
+import json
+import threading
+
+import pytest
+
+from dent_os_testbed.utils.ConnectionHandlers import dent_agent
+from dent_os_testbed.utils.ConnectionHandlers.DeviceAgent import DeviceAgent, DeviceAgentError, DeviceAgentStartError
+
+from .utils import LocalConnection, LocalProcess, make_connection_params, make_logger, run
+
+
+def test_that_agent_batch_head(capfd):
+    assert dent_agent._batch_head('ip link set swp1 up') == (['ip'], 'link set swp1 up')
+    assert dent_agent._batch_head('ip -4 -n ns1 route add 1.1.1.0/24 dev swp1') == (
+        ['ip', '-4', '-n', 'ns1'], 'route add 1.1.1.0/24 dev swp1'
+    )
+    assert dent_agent._batch_head('tc -j qdisc show') == (['tc', '-j'], 'qdisc show')
+    assert dent_agent._batch_head('bridge fdb show') == (['bridge'], 'fdb show')
+    # the commands needing a shell or a batch of their own
+    for cmd in ['ip link show | grep swp1', 'ip -batch /tmp/x', 'ip -b -', 'echo ip', 'ls $HOME', '']:
+        assert dent_agent._batch_head(cmd) == (None, None)
+
+
+def test_that_agent_run_exec(monkeypatch, capfd):
+    runs = []
+
+    def fake_run(args, input=None, shell=False):
+        runs.append((args, input, shell))
+        return 0, ''
+
+    monkeypatch.setattr(dent_agent, '_run', fake_run)
+    dent_agent.run_exec('ip link set swp1 up')
+    dent_agent.run_exec('tc -j qdisc add dev swp1 ingress&& tc -j filter add dev swp1 ingress matchall')
+    # different tools or options, input and shell syntax go through the shell
+    dent_agent.run_exec('ip link set swp1 up && tc qdisc show')
+    dent_agent.run_exec('ip -4 route show && ip route show')
+    dent_agent.run_exec('ip -batch -', input='link show\n')
+    assert runs == [
+        (['ip', 'link', 'set', 'swp1', 'up'], None, False),
+        (['tc', '-j', '-batch', '-'], 'qdisc add dev swp1 ingress\nfilter add dev swp1 ingress matchall\n', False),
+        ('ip link set swp1 up && tc qdisc show', None, True),
+        ('ip -4 route show && ip route show', None, True),
+        ('ip -batch -', 'link show\n', True),
+    ]
+
+
+def test_that_agent_run_exec_local(capfd):
+    assert dent_agent.run_exec('echo out; echo err >&2; exit 2') == (2, 'out\nerr\n')
+    assert dent_agent.run_exec('tr a-z A-Z', input='abc\n') == (0, 'ABC\n')
+    # a batch stops at the first failure like the chain
+    rc, output = dent_agent.run_exec('ip link show lo && ip link show nonexistent0 && ip link show lo')
+    assert rc != 0 and output.count('lo:') == 1
+
+
+def test_that_agent_handle(capfd):
+    assert 'pid' in dent_agent.handle('ping', {})
+    assert dent_agent.handle('exec', {'cmd': 'echo hi'}) == {'rc': 0, 'output': 'hi\n'}
+    calls = [{'method': 'exec', 'params': {'cmd': 'exit 1'}}, {'method': 'nope'}]
+    assert dent_agent.handle('batch', {'calls': calls}) == [
+        {'result': {'rc': 1, 'output': ''}},
+        {'error': 'ValueError: Unknown method nope'},
+    ]
+    with pytest.raises(ValueError):
+        dent_agent.handle('nope', {})
+    out = io.StringIO()
+    dent_agent.serve({'id': 7, 'method': 'nope'}, out, threading.Lock())
+    dent_agent.serve({'id': 8, 'method': 'exec', 'params': {'cmd': 'echo hi'}}, out, threading.Lock())
+    assert [json.loads(line) for line in out.getvalue().splitlines()] == [
+        {'id': 7, 'error': 'ValueError: Unknown method nope'},
+        {'id': 8, 'result': {'rc': 0, 'output': 'hi\n'}},
+    ]
+
+
+def make_agent(conn=None):
+    loop = asyncio.new_event_loop()
+    agent = DeviceAgent(make_logger(), loop, conn or LocalConnection(), make_connection_params())
+    loop.close()
+    return agent
+
+
+def test_that_device_agent_run_cmd(capfd):
+    agent = make_agent()
+    size = LocalProcess.WINDOW + 1024 * 1024
+
+    async def test():
+        assert await agent.run_cmd('echo out; echo err >&2') == (0, 'out\nerr\n')
+        assert await agent.run_cmd('cat', input='abc') == (0, 'abc')
+        # responses larger than the receive window
+        rc, output = await agent.run_cmd(f'head -c {size} /dev/zero | tr "\\\\0" a')
+        assert rc == 0 and len(output) == size
+        # the requests are handled concurrently and matched by id
+        out = await asyncio.gather(*[agent.run_cmd(f'sleep 0.{5 - i}; echo {i}') for i in range(5)])
+        assert out == [(0, f'{i}\n') for i in range(5)]
+        assert len(agent.ssh_connection.processes) == 1
+        await agent.close()
+        await agent.ssh_connection.wait_closed()
+
+    run(test())
+
+
+def test_that_device_agent_lost(capfd):
+    agent = make_agent()
+
+    async def test():
+        assert await agent.run_cmd('echo 1') == (0, '1\n')
+        pending = asyncio.ensure_future(agent.run_cmd('sleep 5'))
+        await asyncio.sleep(0.2)
+        agent.ssh_connection.processes[0].close()
+        with pytest.raises(DeviceAgentError):
+            await pending
+        # started again on the next call
+        assert await agent.run_cmd('echo 2') == (0, '2\n')
+        assert len(agent.ssh_connection.processes) == 2
+        await agent.close()
+        await agent.ssh_connection.wait_closed()
+
+    run(test())
+
+
+class NoPythonConnection(LocalConnection):
+    async def create_process(self, cmd):
+        return await super(NoPythonConnection, self).create_process(cmd.replace('python3', 'nonexistent_python3', 1))
+
+
+def test_that_device_agent_unavailable(capfd):
+    agent = make_agent(NoPythonConnection())
+
+    async def test():
+        with pytest.raises(DeviceAgentStartError):
+            await agent.run_cmd('echo 1')
+        assert not agent.available
+        with pytest.raises(DeviceAgentStartError):
+            await agent.run_cmd('echo 1')
+        # not tried again
+        assert len(agent.ssh_connection.processes) == 1
+        await agent.ssh_connection.wait_closed()
+
+    run(test())
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import subprocess
+
+import pytest
+
+from dent_os_testbed.utils.test_utils import cleanup_utils
+from dent_os_testbed.utils.test_utils.cleanup_utils import DeviceSnapshot
+
+LINKS = [
+    {'ifname': 'lo'},
+    {'ifname': 'swp1'},
+    {'ifname': 'swp2', 'master': 'br0'},
+    {'ifname': 'br0', 'linkinfo': {'info_kind': 'bridge'}},
+]
+ADDRESSES = [
+    {'ifname': 'swp1', 'addr_info': [
+        {'local': '10.0.0.1', 'prefixlen': 24, 'scope': 'global'},
+        {'local': 'fe80::1', 'prefixlen': 64, 'scope': 'link'},
+    ]},
+]
+ROUTES = [
+    {'dst': 'default', 'gateway': '10.0.0.254', 'dev': 'swp1'},
+    {'dst': '10.0.0.0/24', 'dev': 'swp1', 'protocol': 'kernel', 'scope': 'link'},
+    {'dst': '127.0.0.1', 'dev': 'lo', 'table': 'local', 'type': 'local'},
+]
+QDISCS = [
+    {'kind': 'noqueue', 'dev': 'br0'},
+    {'kind': 'mq', 'dev': 'swp1', 'root': True},
+]
+SYSCTLS = 'net.ipv4.ip_forward = 0\nnet.ipv4.conf.all.rp_filter = 1\n'
+
+
+def snapshot(links=LINKS, addresses=ADDRESSES, routes=ROUTES, qdiscs=QDISCS, sysctls=SYSCTLS):
+    return DeviceSnapshot('dut1', {
+        'links': json.dumps(links),
+        'addresses': json.dumps(addresses),
+        'routes': json.dumps(routes),
+        'qdiscs': json.dumps(qdiscs),
+        'sysctls': sysctls,
+    })
+
+
+def test_that_snapshot_revert_nothing_changed(capfd):
+    # the flags of the routes and the link local addresses do not count as changes
+    routes = [dict(route, flags=['offload']) for route in ROUTES]
+    addresses = [{'ifname': 'swp1', 'addr_info': ADDRESSES[0]['addr_info'][:1]}]
+    assert snapshot().revert_script(snapshot(routes=routes, addresses=addresses)) == []
+
+
+def test_that_snapshot_revert_qdiscs(capfd):
+    qdiscs = QDISCS + [
+        {'kind': 'ingress', 'dev': 'swp1', 'parent': 'ffff:fff1'},
+        {'kind': 'prio', 'dev': 'swp2', 'root': True},
+        {'kind': 'noqueue', 'dev': 'swp3'},
+    ]
+    assert snapshot().revert_script(snapshot(qdiscs=qdiscs)) == [
+        'tc qdisc del dev swp1 ingress',
+        'tc qdisc del dev swp2 root',
+    ]
+
+
+def test_that_snapshot_revert_routes(capfd):
+    routes = ROUTES + [
+        {'dst': '20.0.0.0/24', 'gateway': '10.0.0.2', 'dev': 'swp1', 'metric': 10},
+        {'dst': '30.0.0.0/24', 'type': 'blackhole'},
+        {'dst': '40.0.0.0/24', 'dev': 'swp1', 'table': '100'},
+        {'dst': '50.0.0.0/24', 'dev': 'swp1', 'table': '100'},
+    ]
+    assert snapshot().revert_script(snapshot(routes=routes)) == [
+        'ip route flush table 100',
+        'ip route del 20.0.0.0/24 table main dev swp1 via 10.0.0.2 metric 10',
+        'ip route del blackhole 30.0.0.0/24 table main',
+    ]
+
+
+def test_that_snapshot_revert_addresses(capfd):
+    addresses = ADDRESSES + [
+        {'ifname': 'swp2', 'addr_info': [{'local': '2001:db8::1', 'prefixlen': 64, 'scope': 'global'}]},
+    ]
+    assert snapshot().revert_script(snapshot(addresses=addresses)) == ['ip address del 2001:db8::1/64 dev swp2']
+    # the removed addresses are not restored
+    assert snapshot().revert_script(snapshot(addresses=[])) == []
+
+
+def test_that_snapshot_revert_links(capfd):
+    links = [
+        {'ifname': 'lo'},
+        {'ifname': 'swp1', 'master': 'bond1'},
+        {'ifname': 'swp2'},
+        {'ifname': 'br0', 'linkinfo': {'info_kind': 'bridge'}},
+        {'ifname': 'bond1', 'linkinfo': {'info_kind': 'bond'}},
+        {'ifname': 'swp3.10', 'linkinfo': {'info_kind': 'vlan'}},
+    ]
+    addresses = ADDRESSES + [
+        {'ifname': 'bond1', 'addr_info': [{'local': '10.1.0.1', 'prefixlen': 24, 'scope': 'global'}]},
+    ]
+    routes = ROUTES + [{'dst': '10.1.0.0/24', 'dev': 'bond1', 'protocol': 'kernel', 'scope': 'link'}]
+    qdiscs = QDISCS + [{'kind': 'ingress', 'dev': 'bond1', 'parent': 'ffff:fff1'}]
+    # the state of the deleted links goes away with them
+    assert snapshot().revert_script(snapshot(links=links, addresses=addresses, routes=routes, qdiscs=qdiscs)) == [
+        'ip link set dev swp1 nomaster',
+        'ip link set dev swp2 master br0',
+        'ip link del dev bond1',
+        'ip link del dev swp3.10',
+    ]
+    # the removed links are not restored, a port is not enslaved to a removed master
+    links = [{'ifname': 'lo'}, {'ifname': 'swp1'}, {'ifname': 'swp2'}]
+    assert snapshot().revert_script(snapshot(links=links)) == []
+
+
+def test_that_snapshot_revert_sysctls(capfd):
+    sysctls = 'net.ipv4.ip_forward = 1\nnet.ipv4.conf.all.rp_filter = 1\nnet.ipv4.conf.bond1.rp_filter = 1\n'
+    assert snapshot().revert_script(snapshot(sysctls=sysctls)) == ['sysctl -q -w net.ipv4.ip_forward="0"']
+
+
+class ShellDevice:
+    # runs the scripts locally
+    class Params:
+        pssh = False
+
+    host_name = 'dut1'
+    ssh_conn_params = Params()
+
+    async def run_cmd(self, cmd, input=None):
+        proc = subprocess.run(cmd, shell=True, input=input, capture_output=True, text=True)
+        return proc.returncode, proc.stdout + proc.stderr
+
+
+def test_that_snapshot_checks_every_family(monkeypatch, capfd):
+    monkeypatch.setitem(cleanup_utils.SNAPSHOT_FAMILIES, 'links', f"printf '%s' '{json.dumps(LINKS)}'")
+    monkeypatch.setitem(cleanup_utils.SNAPSHOT_FAMILIES, 'sysctls', f"printf '{SYSCTLS}'")
+    loop = asyncio.new_event_loop()
+    snap = loop.run_until_complete(cleanup_utils.get_device_snapshot(ShellDevice(), families=['links', 'sysctls']))
+    assert set(snap.links) == {link['ifname'] for link in LINKS}
+    assert snap.sysctls == {'net.ipv4.ip_forward': '0', 'net.ipv4.conf.all.rp_filter': '1'}
+    # a family failing before the last one is not hidden by the exit status of the script
+    monkeypatch.setitem(cleanup_utils.SNAPSHOT_FAMILIES, 'links', 'false')
+    with pytest.raises(AssertionError, match='links'):
+        loop.run_until_complete(cleanup_utils.get_device_snapshot(ShellDevice(), families=['links', 'sysctls']))
+    loop.close()
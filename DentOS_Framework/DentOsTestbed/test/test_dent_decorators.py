@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from dent_os_testbed.utils import decorators
+
+from .utils import make_logger, run
+
+
+class FakePerfUtil:
+    def __init__(self):
+        self.calls = []
+
+    def start_monitoring(self):
+        self.calls.append('start')
+
+    def resume(self):
+        self.calls.append('resume')
+
+    def pause(self):
+        self.calls.append('pause')
+
+    def analyze(self, thresholds, since):
+        self.calls.append('analyze')
+
+
+class FakeTestBed:
+    def __init__(self):
+        self.applog = make_logger()
+        self.perf_util = FakePerfUtil()
+
+
+@pytest.fixture
+def testbed(monkeypatch):
+    testbed = FakeTestBed()
+    monkeypatch.setattr(pytest, 'testbed', testbed, raising=False)
+    return testbed
+
+
+def make_test_cases(calls):
+    setup = decorators.TestCaseSetup(
+        setup=lambda: calls.append('setup'),
+        teardown=lambda: calls.append('teardown'),
+        perf_thresholds={'CPU': {'idle': (50.0, 100.0)}},
+    )
+
+    @setup
+    def sync_case(fail):
+        if fail:
+            raise AssertionError('failed')
+        return 'passed'
+
+    @setup
+    async def async_case(fail):
+        await asyncio.sleep(0)
+        if fail:
+            raise AssertionError('failed')
+        return 'passed'
+
+    return sync_case, async_case
+
+
+def test_that_test_case_setup_passed(testbed, capfd):
+    calls = testbed.perf_util.calls
+    sync_case, async_case = make_test_cases(calls)
+    assert sync_case(False) == 'passed'
+    assert run(async_case(False)) == 'passed'
+    assert calls == ['start', 'resume', 'setup', 'pause', 'teardown', 'analyze'] * 2
+
+
+def test_that_test_case_setup_failed(testbed, capfd):
+    calls = testbed.perf_util.calls
+    sync_case, async_case = make_test_cases(calls)
+    # the perf is paused and the teardown runs, the thresholds are not checked
+    with pytest.raises(AssertionError):
+        sync_case(True)
+    with pytest.raises(AssertionError):
+        run(async_case(True))
+    assert calls == ['start', 'resume', 'setup', 'pause', 'teardown'] * 2
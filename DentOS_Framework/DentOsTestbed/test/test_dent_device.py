@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+from dent_os_testbed.Device import Device
+from dent_os_testbed.logger.Logger import AppLogger
+from dent_os_testbed.utils.perf_util import PerfUtil
+
+from .utils import LocalSSHServer
+
+
+def make_device(monkeypatch, tmp_path, loop, password=LocalSSHServer.PASSWORD):
+    # the device keeps its logs under the working directory
+    monkeypatch.chdir(tmp_path)
+    params = {
+        'friendlyName': 'test dut',
+        'os': 'dentos',
+        'hostName': 'test_dut',
+        'ip': '127.0.0.1',
+        'login': {'userName': LocalSSHServer.USER, 'password': password},
+        'serialDev': '/dev/null',
+        'baudrate': 115200,
+    }
+    return Device(AppLogger('test_dent_device'), loop, params)
+
+
+def test_that_device_open_ssh_connection(monkeypatch, tmp_path, capfd):
+    loop = asyncio.new_event_loop()
+    device = make_device(monkeypatch, tmp_path, loop)
+    with LocalSSHServer(monkeypatch):
+        conn = device.open_ssh_connection(loop)
+        assert loop.run_until_complete(conn.run_cmd('echo hello')) == (0, 'hello\n')
+        loop.run_until_complete(conn.disconnect())
+    loop.close()
+
+
+def test_that_device_perf_sampler_thread(monkeypatch, tmp_path, capfd):
+    loop = asyncio.new_event_loop()
+    device = make_device(monkeypatch, tmp_path, loop)
+    with LocalSSHServer(monkeypatch) as server:
+        util = PerfUtil(devices=[device], frequency=0.1, max_records=10)
+        util.start_thread()
+        deadline = time.monotonic() + 10
+        while len(util.get_samples(device)) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        util.stop_thread()
+        # sampled over a connection of the sampler thread, the device has none
+        assert len(server.commands) == 1
+        samples = util.get_samples(device)
+        assert len(samples) >= 2
+        assert 'MemTotal' in samples[-1]['Memory']
+        assert 'CPU' in samples[-1]
+    loop.close()
+
+
+def test_that_device_check_reachable(monkeypatch, tmp_path, capfd):
+    loop = asyncio.new_event_loop()
+    device = make_device(monkeypatch, tmp_path, loop)
+    # never probed, not known to be reachable
+    assert not device.is_reachable
+    with LocalSSHServer(monkeypatch) as server:
+        assert loop.run_until_complete(device.check_reachable())
+        assert device.is_reachable
+        commands = len(server.commands)
+        # the cached one from now on
+        assert loop.run_until_complete(device.check_reachable())
+        assert len(server.commands) == commands
+        loop.run_until_complete(device.conn_mgr.close_connections())
+    loop.close()
+
+
+def test_that_device_check_unreachable(monkeypatch, tmp_path, capfd):
+    loop = asyncio.new_event_loop()
+    device = make_device(monkeypatch, tmp_path, loop, password='wrong')
+    with LocalSSHServer(monkeypatch):
+        assert not loop.run_until_complete(device.check_reachable())
+        assert not device.is_reachable
+    loop.close()
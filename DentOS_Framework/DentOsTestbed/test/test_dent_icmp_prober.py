@@ -0,0 +1,83 @@
+import asyncio
+import socket
+
+import pytest
+
+from net_utils.IcmpProber import IcmpProber
+
+
+class FakeProber(IcmpProber):
+    # replies after the delays of the target, None for a lost request
+    def __init__(self, loop, delays):
+        self.loop = loop
+        self.sock = True
+        self.raw = False
+        self.delays = delays
+        self.sent = {}
+
+    async def _resolve(self, target):
+        if target not in self.delays:
+            raise socket.gaierror('unknown target')
+        return target
+
+    async def _echo(self, addr, timeout):
+        delays = self.delays[addr]
+        delay = delays[self.sent.get(addr, 0) % len(delays)]
+        self.sent[addr] = self.sent.get(addr, 0) + 1
+        if delay is None or delay > timeout:
+            await asyncio.sleep(timeout)
+            return None
+        await asyncio.sleep(delay)
+        return delay * 1000
+
+
+def test_that_icmp_prober_probe(capfd):
+    loop = asyncio.new_event_loop()
+    prober = FakeProber(loop, {'a': [0.01, None], 'b': [None], 'c': [0.01]})
+    out = loop.run_until_complete(prober.probe('a', count=4, interval=0.01, timeout=0.05))
+    assert out['sent'] == 4 and out['received'] == 2 and out['loss'] == 50.0
+    assert out['rtt_min'] == out['rtt_avg'] == out['rtt_max'] == 10.0
+    out = loop.run_until_complete(prober.probe('b', count=3, interval=0.01, timeout=0.05))
+    assert out['sent'] == 3 and out['received'] == 0 and out['loss'] == 100.0
+    assert out['rtt_min'] is None and out['rtt_avg'] is None and out['rtt_max'] is None
+    # unresolvable target, nothing is sent
+    out = loop.run_until_complete(prober.probe('unknown', count=3))
+    assert out['sent'] == 0 and out['received'] == 0 and out['loss'] == 100.0
+    # the probe stops once enough replies came back
+    out = loop.run_until_complete(prober.probe('c', count=50, successes=2, interval=0.02, timeout=1))
+    assert out['received'] == 2 and out['sent'] == 2 and out['loss'] == 0.0
+    assert prober.sent['c'] < 50
+    loop.close()
+
+
+def test_that_icmp_prober_probe_many(capfd):
+    loop = asyncio.new_event_loop()
+    delays = {f't{i}': [0.01] if i % 2 else [None] for i in range(20)}
+    prober = FakeProber(loop, delays)
+    out = loop.run_until_complete(prober.probe_many(list(delays) + ['unknown'], count=2, interval=0.01, timeout=0.05))
+    assert set(out) == set(delays) | {'unknown'}
+    for i in range(20):
+        assert out[f't{i}']['sent'] == 2
+        assert out[f't{i}']['received'] == (2 if i % 2 else 0)
+    assert out['unknown']['sent'] == 0
+    loop.close()
+
+
+def test_that_icmp_prober_loopback(capfd):
+    loop = asyncio.new_event_loop()
+    prober = IcmpProber(loop)
+    if not prober.sock:
+        prober.close()
+        loop.close()
+        pytest.skip('ICMP sockets are not permitted')
+    # the receive buffer holds the replies of many concurrent probes
+    with open('/proc/sys/net/core/rmem_max') as f:
+        rmem_max = int(f.read())
+    # the kernel doubles the size, which is capped by rmem_max without CAP_NET_ADMIN
+    assert prober.sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) >= 2 * min(IcmpProber.RCVBUF, rmem_max)
+    targets = [f'127.0.0.{i}' for i in range(1, 51)]
+    out = loop.run_until_complete(prober.probe_many(targets, count=3, interval=0.01, timeout=1))
+    for target in targets:
+        assert out[target]['received'] == 3 and out[target]['loss'] == 0.0
+    prober.close()
+    loop.close()
@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import os
+import shutil
+
+import pytest
+
+# the installers download the images with aiohttp
+pytest.importorskip('aiohttp')
+
+from dent_os_testbed.installers import OsImageCache as image_cache  # noqa: E402
+from dent_os_testbed.installers.OsImageCache import OsImageCache  # noqa: E402
+from dent_os_testbed.installers.OsInstallerOnieSelect import OsInstallerOnieSelect  # noqa: E402
+
+from .utils import make_logger, run  # noqa: E402
+
+URL = 'http://images/dentos-latest.bin'
+
+
+class Server:
+    # the content and the validators of the URLs
+    def __init__(self, monkeypatch):
+        self.content = {}
+        self.headers = {}
+        self.downloads = 0
+        self.fail = False
+        monkeypatch.setattr(image_cache, 'download_file', self.download_file)
+        monkeypatch.setattr(image_cache, 'get_url_validators', self.get_url_validators)
+
+    def publish(self, url, content, **headers):
+        self.content[url] = content
+        self.headers[url] = headers
+
+    async def download_file(self, url, out_file):
+        self.downloads += 1
+        with open(out_file, 'ab') as f:
+            f.write(self.content[url][:4])
+            if self.fail:
+                raise ConnectionError('connection reset')
+            f.write(self.content[url][4:])
+        return dict(self.headers[url])
+
+    async def get_url_validators(self, url):
+        if self.fail:
+            raise ConnectionError('connection reset')
+        return dict(self.headers[url])
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_that_image_cache_fetch(monkeypatch, tmp_path, capfd):
+    server = Server(monkeypatch)
+    cache = OsImageCache(make_logger(), cache_dir=str(tmp_path))
+    server.publish(URL, b'image-1', ETag='"1"')
+
+    async def test():
+        path, digest = await cache.fetch(URL)
+        assert open(path, 'rb').read() == b'image-1' and digest == sha256(b'image-1')
+        # concurrent fetches of the same image share the download
+        await asyncio.gather(*[cache.fetch(URL) for _ in range(4)])
+        assert server.downloads == 1
+        # the URL now points to a new image
+        server.publish(URL, b'image-2', ETag='"2"')
+        path, digest = await cache.fetch(URL)
+        assert open(path, 'rb').read() == b'image-2' and server.downloads == 2
+        # a hash matching the cached image needs no revalidation
+        server.publish(URL, b'image-3', ETag='"3"')
+        assert await cache.fetch(URL, sha256(b'image-2')) == (path, sha256(b'image-2'))
+        assert server.downloads == 2
+        # a hash that does not match downloads it again
+        assert await cache.fetch(URL, sha256(b'image-3')) == (path, sha256(b'image-3'))
+        with pytest.raises(ValueError):
+            await cache.fetch(URL, sha256(b'other'))
+        assert not os.path.exists(path + '.part')
+
+    run(test())
+
+
+def test_that_image_cache_fetch_without_validators(monkeypatch, tmp_path, capfd):
+    server = Server(monkeypatch)
+    cache = OsImageCache(make_logger(), cache_dir=str(tmp_path))
+    server.publish(URL, b'image-1')
+
+    async def test():
+        await cache.fetch(URL)
+        # nothing tells whether the URL changed, it is downloaded again
+        await cache.fetch(URL)
+        assert server.downloads == 2
+        # a failed download is never cached
+        server.publish(URL, b'image-2', ETag='"2"')
+        server.fail = True
+        with pytest.raises(ConnectionError):
+            await cache.fetch(URL)
+        server.fail = False
+        path, _ = await cache.fetch(URL)
+        assert open(path, 'rb').read() == b'image-2'
+        assert not os.path.exists(path + '.part')
+
+    run(test())
+
+
+class Device:
+    def __init__(self, name, root):
+        self.host_name = self.friendly_name = name
+        self.root = root
+        self.copies = 0
+
+    async def run_cmd(self, cmd, sudo=False):
+        path = os.path.join(self.root, cmd.split()[-1].lstrip('/'))
+        if not os.path.exists(path):
+            return 1, 'No such file or directory'
+        with open(path, 'rb') as f:
+            return 0, f'{sha256(f.read())}  {cmd.split()[-1]}\n'
+
+    async def scp(self, src, dst, sudo=False):
+        self.copies += 1
+        path = os.path.join(self.root, dst.lstrip('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copy(src, path)
+
+
+def test_that_image_cache_push(monkeypatch, tmp_path, capfd):
+    server = Server(monkeypatch)
+    server.publish(URL, b'image-1', ETag='"1"')
+    cache = OsImageCache(make_logger(), cache_dir=str(tmp_path / 'cache'), fanout=2)
+    devices = [Device(f'dut{i}', str(tmp_path / f'dut{i}')) for i in range(4)]
+
+    async def test():
+        await asyncio.gather(*[cache.push(dev, URL, '/tmp/image.bin') for dev in devices])
+        assert server.downloads == 1
+        assert [dev.copies for dev in devices] == [1, 1, 1, 1]
+        # the devices having the image are skipped
+        await asyncio.gather(*[cache.push(dev, URL, '/tmp/image.bin') for dev in devices])
+        assert [dev.copies for dev in devices] == [1, 1, 1, 1]
+
+    run(test())
+
+
+class RebootingDevice:
+    def __init__(self, states):
+        self.host_name = self.friendly_name = 'dut1'
+        self.states = states
+
+    async def is_connected(self):
+        return self.states.pop(0) if len(self.states) > 1 else self.states[0]
+
+
+def test_that_onie_select_waits_for_the_device(monkeypatch, capfd):
+    monkeypatch.setattr(OsInstallerOnieSelect, 'POLL_INTERVAL_SECS', 0.01)
+    monkeypatch.setattr(OsInstallerOnieSelect, 'DEVICE_DOWN_WAIT_TIME_SECS', 0.2)
+    monkeypatch.setattr(OsInstallerOnieSelect, 'INSTALL_WAIT_TIME_SECS', 0.5)
+
+    async def test():
+        installer = OsInstallerOnieSelect(make_logger(), asyncio.get_running_loop())
+        await installer._wait_for_device(RebootingDevice([True, True, False, False, True]))
+        # never went down, the install did not happen
+        with pytest.raises(TimeoutError, match='did not go down'):
+            await installer._wait_for_device(RebootingDevice([True]))
+        # never came back
+        with pytest.raises(TimeoutError, match='is not up'):
+            await installer._wait_for_device(RebootingDevice([True, False]))
+
+    run(test())
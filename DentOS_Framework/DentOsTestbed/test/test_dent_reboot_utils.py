@@ -0,0 +1,150 @@
+import asyncio
+import json
+import types
+
+import pytest
+
+# reboot_utils imports the testbed utils, which download with aiohttp
+pytest.importorskip('aiohttp')
+
+from net_utils.PingUtil import PingUtil  # noqa: E402
+
+from dent_os_testbed.utils.test_utils import reboot_utils  # noqa: E402
+
+from .utils import make_logger, run  # noqa: E402
+
+_sleep = asyncio.sleep
+
+
+class Clock:
+    # the sleeps of the polls move the clock forward instead of waiting
+    def __init__(self, monkeypatch):
+        self.now = 1000.0
+        self.sleeps = []
+        monkeypatch.setattr(reboot_utils, 'time', types.SimpleNamespace(time=self.time))
+        monkeypatch.setattr(asyncio, 'sleep', self.sleep)
+
+    def time(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+        await _sleep(0)
+
+
+class RebootingDevice:
+    """
+    Goes down at down_at seconds after the reboot, answers ping at up_at, ssh at ssh_at
+    and completes the boot at ready_at, None for a phase it never gets to
+    """
+
+    def __init__(self, clock, monkeypatch, down_at=5, up_at=30, ssh_at=40, ready_at=60, ports=('swp1', 'swp2')):
+        self.host_name = 'dut1'
+        self.ip = '10.0.0.1'
+        self.applog = make_logger()
+        self.clock = clock
+        self.times = {'down': down_at, 'up': up_at, 'ssh': ssh_at, 'ready': ready_at}
+        self.ports = ports
+        self.rebooted = None
+        monkeypatch.setattr(PingUtil, 'ping_once', staticmethod(self.ping_once))
+        monkeypatch.setattr(reboot_utils, 'reboot_probe_ssh_banner', self.ssh_banner)
+
+    def reached(self, state):
+        at = self.times[state]
+        return self.rebooted is not None and at is not None and self.clock.now >= self.rebooted + at
+
+    def is_up(self):
+        return self.rebooted is None or not self.reached('down') or self.reached('up')
+
+    async def reboot(self):
+        self.rebooted = self.clock.now
+        # the connection goes away under the command
+        raise ConnectionResetError('connection lost')
+
+    async def ping_once(self, target, timeout=1):
+        assert target == self.ip
+        return self.is_up()
+
+    async def ssh_banner(self, device):
+        return self.is_up() and (self.rebooted is None or self.reached('ssh'))
+
+    async def is_connected(self):
+        return await self.ssh_banner(self)
+
+    async def run_cmd(self, cmd):
+        if not await self.ssh_banner(self):
+            raise ConnectionError('not connected')
+        if cmd == 'systemctl is-system-running':
+            return 0, 'running\n' if self.rebooted is None or self.reached('ready') else 'starting\n'
+        assert cmd == 'ip -j link show'
+        up = self.ports if self.rebooted is None or self.reached('ready') else []
+        links = [{'ifname': 'eth0', 'operstate': 'UP'}]
+        links += [{'ifname': port, 'operstate': 'UP' if port in up else 'DOWN'} for port in self.ports]
+        return 0, json.dumps(links)
+
+
+def test_that_reboot_poll(monkeypatch, capfd):
+    clock = Clock(monkeypatch)
+    results = [Exception('no route'), False, False, False, True]
+
+    async def probe():
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    assert run(reboot_utils.reboot_poll(probe, 60, interval=1, max_interval=3, backoff=2))
+    assert clock.sleeps == [1, 2, 3, 3]
+
+    async def never():
+        return False
+
+    clock.sleeps = []
+    start = clock.now
+    assert not run(reboot_utils.reboot_poll(never, 20, interval=1, max_interval=8, backoff=2))
+    # the last sleep ends at the deadline
+    assert clock.sleeps == [1, 2, 4, 8, 5] and clock.now == start + 20
+
+
+def test_that_reboot_device_and_wait(monkeypatch, capfd):
+    clock = Clock(monkeypatch)
+    device = RebootingDevice(clock, monkeypatch)
+    timings = run(reboot_utils.reboot_device_and_wait(device))
+    assert list(timings) == reboot_utils.REBOOT_PHASES + ['total']
+    assert timings['down'] == 5 and timings['total'] >= 60
+    # the polls back off, no phase is seen more than the max interval late
+    assert all(sleep <= reboot_utils.REBOOT_MAX_POLL_INTERVAL for sleep in clock.sleeps)
+    assert timings['total'] <= 60 + reboot_utils.REBOOT_MAX_POLL_INTERVAL
+
+
+def test_that_reboot_device_never_went_down(monkeypatch, capfd):
+    clock = Clock(monkeypatch)
+    device = RebootingDevice(clock, monkeypatch, down_at=None)
+    start = clock.now
+    with pytest.raises(TimeoutError, match='dut1 did not get to the down phase'):
+        run(reboot_utils.reboot_device_and_wait(device))
+    assert clock.now - start == reboot_utils.REBOOT_DOWN_TIMEOUT
+
+
+def test_that_reboot_device_never_came_back(monkeypatch, capfd):
+    clock = Clock(monkeypatch)
+    device = RebootingDevice(clock, monkeypatch, up_at=None)
+    start = clock.now
+    with pytest.raises(TimeoutError, match='dut1 did not get to the ping phase'):
+        run(reboot_utils.reboot_device_and_wait(device, timeout=300))
+    assert clock.now - start == 300
+
+    # back on ssh, but the boot never completes
+    clock = Clock(monkeypatch)
+    device = RebootingDevice(clock, monkeypatch, ready_at=None)
+    with pytest.raises(TimeoutError, match='dut1 did not get to the systemd phase'):
+        run(reboot_utils.reboot_device_and_wait(device, timeout=300))
+
+
+def test_that_reboot_devices_and_wait(monkeypatch, capfd):
+    clock = Clock(monkeypatch)
+    device = RebootingDevice(clock, monkeypatch, up_at=None)
+    with pytest.raises(Exception, match='reboot_devices_and_wait') as e:
+        run(reboot_utils.reboot_devices_and_wait([device], timeout=300))
+    assert e.value.extra_info == ['dut1']
@@ -0,0 +1,103 @@
+import asyncio
+
+from dent_os_testbed.utils.ConnectionHandlers.RootShell import RootShell
+
+from .utils import LocalConnection, LocalProcess, make_connection_params, make_logger, run
+
+
+def make_shell(max_shells=RootShell._MAX_SHELLS):
+    loop = asyncio.new_event_loop()
+    shell = RootShell(make_logger(), loop, LocalConnection(), make_connection_params(), max_shells=max_shells)
+    loop.close()
+    return shell
+
+
+def test_that_root_shell_run_cmd(capfd):
+    shell = make_shell(max_shells=1)
+
+    async def test():
+        assert await shell.run_cmd('echo out; echo err >&2') == (0, 'out\nerr\n')
+        assert await shell.run_cmd('exit 3') == (3, '')
+        # the commands can neither read the following ones nor change the shell
+        assert await shell.run_cmd('cat; cd /; X=1') == (0, '')
+        assert await shell.run_cmd('echo "$X"') == (0, '\n')
+        assert await shell.run_cmd('tr a-z A-Z', input='abc\ndef\n') == (0, 'ABC\nDEF\n')
+        # a syntax error does not swallow the sentinels
+        rc, _ = await shell.run_cmd('if then')
+        assert rc != 0
+        # no trailing newline
+        assert await shell.run_cmd('printf x; printf y >&2') == (0, 'xy')
+        await shell.close()
+        await shell.ssh_connection.wait_closed()
+
+    run(test())
+
+
+def test_that_root_shell_large_outputs(capfd):
+    shell = make_shell(max_shells=1)
+    size = LocalProcess.WINDOW + 1024 * 1024
+
+    async def test():
+        # larger than the receive window, on stdout and on stderr
+        rc, output = await shell.run_cmd(f'head -c {size} /dev/zero | tr "\\\\0" a')
+        assert rc == 0 and len(output) == size and set(output) == {'a'}
+        rc, output = await shell.run_cmd(f'head -c {size} /dev/zero | tr "\\\\0" b >&2; echo done')
+        assert rc == 0 and output == 'done\n' + 'b' * size
+        # the shell is still in sync
+        assert await shell.run_cmd('echo ok') == (0, 'ok\n')
+        assert len(shell.ssh_connection.processes) == 1
+        await shell.close()
+        await shell.ssh_connection.wait_closed()
+
+    run(test())
+
+
+def test_that_root_shell_concurrent(capfd):
+    shell = make_shell(max_shells=2)
+
+    async def test():
+        cmds = [f'sleep 0.{i % 3}; echo {i}' for i in range(8)]
+        out = await asyncio.gather(*[shell.run_cmd(cmd) for cmd in cmds])
+        assert out == [(0, f'{i}\n') for i in range(8)]
+        assert len(shell.ssh_connection.processes) == 2
+        await shell.close()
+        await shell.ssh_connection.wait_closed()
+
+    run(test())
+
+
+def test_that_root_shell_lost(capfd):
+    shell = make_shell(max_shells=1)
+
+    async def test():
+        assert await shell.run_cmd('echo ok') == (0, 'ok\n')
+        # the commands in flight fail, the next one gets a new shell
+        shell.ssh_connection.processes[0].close()
+        try:
+            await shell.run_cmd('sleep 1')
+            assert False, 'the command should have failed'
+        except ConnectionError:
+            pass
+        assert await shell.run_cmd('echo ok') == (0, 'ok\n')
+        assert len(shell.ssh_connection.processes) == 2
+        await shell.close()
+        await shell.ssh_connection.wait_closed()
+
+    run(test())
+
+
+def test_that_root_shell_loop_changed(capfd):
+    shell = make_shell(max_shells=1)
+    loop = asyncio.new_event_loop()
+    assert loop.run_until_complete(shell.run_cmd('echo 1')) == (0, '1\n')
+
+    async def test():
+        # the shell of the previous loop is started again
+        assert await shell.run_cmd('echo 2') == (0, '2\n')
+        assert len(shell.ssh_connection.processes) == 2
+        await shell.close()
+        await shell.ssh_connection.processes[1].proc.wait()
+
+    run(test())
+    # the shell of the previous loop was killed when the loop changed
+    run(shell.ssh_connection.processes[0].proc.wait(), loop=loop)
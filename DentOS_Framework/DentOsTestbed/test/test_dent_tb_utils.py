@@ -0,0 +1,138 @@
+import gzip
+import io
+import os
+import tarfile
+
+import pytest
+
+# tb_utils imports the testbed utils and the network diagram
+for module in ['aiohttp', 'pyvis']:
+    pytest.importorskip(module)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from dent_os_testbed.utils.test_utils import tb_utils  # noqa: E402
+
+from .utils import run  # noqa: E402
+
+BACKTRACE = '------------[ cut here ]------------'
+
+
+class Log:
+    def __init__(self):
+        self.errors = []
+
+    def info(self, *args):
+        pass
+
+    def debug(self, *args):
+        pass
+
+    def error(self, msg):
+        self.errors.append(msg)
+
+
+class Device:
+    # streams the archive back in chunks like an SSH channel would
+    def __init__(self, logs_dir, archive):
+        self.host_name = 'dut1'
+        self.serial_logs_base_dir = logs_dir
+        self.files_to_collect = ['/var/log/extra.log']
+        self.applog = Log()
+        self.archive = archive
+        self.commands = []
+
+    async def stream_bytes(self, cmd, sudo=False):
+        self.commands.append(cmd)
+        for idx in range(0, len(self.archive), 1000):
+            yield self.archive[idx:idx + 1000]
+
+
+def make_archive(files, compress='gz'):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode='w') as tar:
+        for name, data in files:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    if compress == 'zstd':
+        return zstandard.ZstdCompressor(write_checksum=True).compress(buf.getvalue())
+    return gzip.compress(buf.getvalue())
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_that_tb_collect_logs_from_device(tmp_path, capfd):
+    messages = os.urandom(300000)
+    boot = ''.join(f'line {idx}\n' for idx in range(10000)).encode()
+    archive = make_archive([
+        ('var/log/messages', messages),
+        ('var/tmp/boot-0.log', boot),
+        ('var/log/extra.log', b'extra\n'),
+    ])
+    device = Device(str(tmp_path), archive)
+    run(tb_utils.tb_collect_logs_from_device(device, since=1700000000))
+    assert 'journalctl -b 0 --since @1700000000' in device.commands[0]
+    assert '/var/log/extra.log' in device.commands[0]
+    assert read(tmp_path / 'messages') == messages
+    assert read(tmp_path / 'boot-0.log') == boot
+    assert read(tmp_path / 'extra.log') == b'extra\n'
+    assert read(tmp_path / 'logs.tar.gz') == archive
+    assert device.applog.errors == []
+
+
+def test_that_tb_collect_logs_analyzes_the_console_log(tmp_path, capfd):
+    # the analyzer stops at the back trace, the whole log is kept anyway
+    boot = ('booting\n' + BACKTRACE + '\n' + 'after\n' * 10000).encode()
+    device = Device(str(tmp_path), make_archive([('var/tmp/boot-0.log', boot)]))
+    run(tb_utils.tb_collect_logs_from_device(device))
+    assert read(tmp_path / 'boot-0.log') == boot
+    assert device.applog.errors == ['Found Errors in boot-0.log on dut1']
+
+
+def test_that_tb_collect_logs_corrupt_archive(tmp_path, capfd):
+    dmesg = b'dmesg\n' * 1000
+    archive = make_archive([('var/tmp/dmesg', dmesg), ('var/log/syslog', os.urandom(300000))])
+    # the stream broke off in the middle of the second member
+    device = Device(str(tmp_path), archive[:len(archive) // 2])
+    run(tb_utils.tb_collect_logs_from_device(device))
+    assert read(tmp_path / 'dmesg') == dmesg
+    # the part of the member received is kept
+    assert os.path.exists(tmp_path / 'syslog')
+    assert device.applog.errors[-1].startswith('Failed to unpack')
+
+    # the member data was corrupted on the way, the checksum of the stream does not match
+    archive = bytearray(archive)
+    archive[len(archive) // 2:len(archive) // 2 + 1000] = bytes(b ^ 0xFF for b in archive[len(archive) // 2:len(archive) // 2 + 1000])
+    device = Device(str(tmp_path), bytes(archive))
+    run(tb_utils.tb_collect_logs_from_device(device))
+    assert read(tmp_path / 'dmesg') == dmesg
+    assert device.applog.errors[-1].startswith('Failed to unpack')
+
+    # not an archive at all
+    device = Device(str(tmp_path), b'sh: tar: not found\n')
+    run(tb_utils.tb_collect_logs_from_device(device))
+    assert device.applog.errors[0].startswith('Failed to unpack')
+
+
+@pytest.mark.skipif(zstandard is None, reason='needs zstandard')
+def test_that_tb_collect_logs_zstd(tmp_path, capfd):
+    messages = os.urandom(300000)
+    archive = make_archive([('var/log/messages', messages)], compress='zstd')
+    device = Device(str(tmp_path), archive)
+    run(tb_utils.tb_collect_logs_from_device(device, compress='zstd'))
+    assert 'zstd -c -T0' in device.commands[0]
+    assert read(tmp_path / 'messages') == messages
+    assert device.applog.errors == []
+
+    archive = bytearray(archive)
+    archive[-1000:-500] = bytes(b ^ 0xFF for b in archive[-1000:-500])
+    device = Device(str(tmp_path), bytes(archive))
+    run(tb_utils.tb_collect_logs_from_device(device, compress='zstd'))
+    assert device.applog.errors[-1].startswith('Failed to unpack')
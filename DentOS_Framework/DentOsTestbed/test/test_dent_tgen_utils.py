@@ -0,0 +1,53 @@
+import pytest
+
+# tgen_utils imports the traffic generator clients and the testbed utils
+for module in ['ixnetwork_restpy', 'aiohttp', 'pyvis']:
+    pytest.importorskip(module)
+
+from dent_os_testbed.utils.test_utils import tgen_utils  # noqa: E402
+
+FLOW_STATS = {
+    'Traffic Item': ['ti1', 'ti1', 'ti2', 'ti3'],
+    'Rx Port': ['port1', 'port2', 'port1', 'port2'],
+    'Loss %': ['0.000', '0.500', '', '100.000'],
+    'Rx Frame Rate': ['1000.000', '900.000', '0.000', '0.000'],
+}
+
+
+def test_that_tgen_utils_get_float_column(capfd):
+    assert tgen_utils.tgen_utils_get_stats_rows(FLOW_STATS) == 4
+    assert tgen_utils.tgen_utils_get_stats_rows({}) == 0
+    assert tgen_utils.tgen_utils_get_float_column(FLOW_STATS, 'Loss %') == [0.0, 0.5, 0.0, 100.0]
+    assert tgen_utils.tgen_utils_get_float_column(FLOW_STATS, 'Loss %', default=None) == [0.0, 0.5, None, 100.0]
+    assert tgen_utils.tgen_utils_get_loss_column(FLOW_STATS) == [0.0, 0.5, 0.0, 100.0]
+    assert tgen_utils.tgen_utils_get_rate_column(FLOW_STATS) == [1000.0, 900.0, 0.0, 0.0]
+    with pytest.raises(KeyError):
+        tgen_utils.tgen_utils_get_float_column(FLOW_STATS, 'Tx Frame Rate')
+
+
+def test_that_tgen_utils_index_stats_columns(capfd):
+    # the last row of a repeated key wins
+    assert tgen_utils.tgen_utils_index_stats_columns(FLOW_STATS) == {'ti1': 1, 'ti2': 2, 'ti3': 3}
+    assert tgen_utils.tgen_utils_index_stats_columns(FLOW_STATS, 'Traffic Item', 'Rx Port') == {
+        ('ti1', 'port1'): 0,
+        ('ti1', 'port2'): 1,
+        ('ti2', 'port1'): 2,
+        ('ti3', 'port2'): 3,
+    }
+    assert tgen_utils.tgen_utils_index_stats_columns({'Traffic Item': []}) == {}
+
+
+def test_that_tgen_utils_get_failed_flows(capfd):
+    assert tgen_utils.tgen_utils_get_failed_flows(FLOW_STATS) == {'ti1': 1, 'ti3': 3}
+    assert tgen_utils.tgen_utils_get_failed_flows(FLOW_STATS, max_loss=1.0) == {'ti3': 3}
+    # ti2 lost nothing but received nothing either, the rows of ti1 both fail and the last one is kept
+    assert tgen_utils.tgen_utils_get_failed_flows(FLOW_STATS, max_loss=1.0, min_rate=950.0) == {
+        'ti1': 1,
+        'ti2': 2,
+        'ti3': 3,
+    }
+    assert tgen_utils.tgen_utils_get_failed_flows(FLOW_STATS, key=['Traffic Item', 'Rx Port']) == {
+        ('ti1', 'port2'): 1,
+        ('ti3', 'port2'): 3,
+    }
+    assert tgen_utils.tgen_utils_get_failed_flows(FLOW_STATS, max_loss=100.0) == {}
@@ -0,0 +1,217 @@
+import asyncio
+import codecs
+import functools
+import logging
+import os
+import signal
+import threading
+
+import asyncssh
+
+from dent_os_testbed.logger.Logger import AppLogger, DeviceLogger
+from dent_os_testbed.utils.ConnectionHandlers import ConnectionParams
+
+
+class _Server(asyncssh.SSHServer):
+    def begin_auth(self, username):
+        return True
+
+    def password_auth_supported(self):
+        return True
+
+    def validate_password(self, username, password):
+        return password == LocalSSHServer.PASSWORD
+
+
+class LocalSSHServer:
+    """
+    SSH server on 127.0.0.1 running the commands in a local shell, on a loop of its own
+    in a background thread. While it runs, the SSH connections of the testbed are
+    redirected to its port.
+    """
+
+    USER = 'root'
+    PASSWORD = 'test'
+
+    def __init__(self, monkeypatch):
+        self.monkeypatch = monkeypatch
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.server = None
+        self.commands = []
+
+    @staticmethod
+    async def _pipe(reader, writer, eof):
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+        eof()
+
+    async def _handle(self, process):
+        self.commands.append(process.command)
+        proc = await asyncio.create_subprocess_shell(
+            process.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        feed = asyncio.ensure_future(self._pipe(process.stdin, proc.stdin, proc.stdin.close))
+        try:
+            await asyncio.gather(
+                self._pipe(proc.stdout, process.stdout, lambda: None),
+                self._pipe(proc.stderr, process.stderr, lambda: None),
+            )
+            process.exit(await proc.wait())
+        except Exception:
+            process.exit(255)
+        finally:
+            feed.cancel()
+            if proc.returncode is None:
+                proc.kill()
+
+    async def _start(self):
+        key = asyncssh.generate_private_key('ssh-ed25519')
+        self.server = await asyncssh.create_server(
+            _Server, '127.0.0.1', 0, server_host_keys=[key], process_factory=self._handle, encoding=None
+        )
+        return self.server.sockets[0].getsockname()[1]
+
+    async def _stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def __enter__(self):
+        self.thread.start()
+        port = asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+        self.monkeypatch.setattr(asyncssh, 'create_connection', functools.partial(asyncssh.create_connection, port=port))
+        return self
+
+    def __exit__(self, *args):
+        asyncio.run_coroutine_threadsafe(self._stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+class _TextReader:
+    # the str API of asyncssh.SSHReader over a subprocess pipe
+    def __init__(self, reader):
+        self.reader = reader
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+
+    async def read(self, n=-1):
+        data = await self.reader.read(n)
+        return self.decoder.decode(data, final=not data)
+
+    async def readline(self):
+        return self.decoder.decode(await self.reader.readline())
+
+    async def readuntil(self, separator):
+        return self.decoder.decode(await self.reader.readuntil(separator.encode()))
+
+
+class _TextWriter:
+    def __init__(self, writer):
+        self.writer = writer
+
+    def write(self, data):
+        self.writer.write(data.encode())
+
+    def write_eof(self):
+        self.writer.write_eof()
+
+
+class _Result:
+    def __init__(self, exit_status, stderr):
+        self.exit_status = exit_status
+        self.stderr = stderr
+
+
+class LocalProcess:
+    """
+    A command running in a local shell with the API of asyncssh.SSHClientProcess, the
+    pipes are limited to the 2 MiB receive window of an SSH channel
+    """
+
+    WINDOW = 2 * 1024 * 1024
+
+    def __init__(self, proc):
+        self.proc = proc
+        self.stdin = _TextWriter(proc.stdin)
+        self.stdout = _TextReader(proc.stdout)
+        self.stderr = _TextReader(proc.stderr)
+
+    async def wait(self, timeout=None):
+        exit_status = await asyncio.wait_for(self.proc.wait(), timeout)
+        return _Result(exit_status, await self.stderr.read())
+
+    def close(self):
+        # the whole session goes away with the channel
+        if self.proc.returncode is None:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+
+
+class LocalConnection:
+    """
+    Starts the processes of create_process in a local shell instead of over SSH
+    """
+
+    def __init__(self):
+        self.processes = []
+
+    async def create_process(self, cmd):
+        proc = await asyncio.create_subprocess_shell(
+            cmd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=LocalProcess.WINDOW,
+            start_new_session=True,
+        )
+        process = LocalProcess(proc)
+        self.processes.append(process)
+        return process
+
+    async def wait_closed(self):
+        for process in self.processes:
+            process.close()
+            await process.proc.wait()
+
+
+def run(coro, loop=None, timeout=60):
+    """
+    Run the coroutine on a new event loop (or the one given), the tasks left behind are
+    cancelled and the loop closed
+    """
+    loop = loop or asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(asyncio.wait_for(coro, timeout))
+    finally:
+        loop.run_until_complete(_cancel_tasks())
+        loop.close()
+
+
+async def _cancel_tasks():
+    tasks = asyncio.all_tasks() - {asyncio.current_task()}
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def make_connection_params(username='root', password='test'):
+    return (
+        ConnectionParams.Builder()
+        .username(username)
+        .password(password)
+        .ip('127.0.0.1')
+        .hostname('test_dut')
+        .logger(DeviceLogger(logger=logging.getLogger('test_dut')))
+        .build()
+    )
+
+
+def make_logger():
+    return AppLogger('test_dent')
@@ -11,16 +11,39 @@ import time
 import tempfile
 import io
 import json
+import sqlite3
 
 from dent_os_testbed.discovery.constants import (
     REPORTS_DIR,
     REPORTS_HORIZON,
     REPORTS_SAVE_MIN,
-    REPORTS_SAVE_MAX)
+    REPORTS_SAVE_MAX,
+    REPORTS_INDEX)
 
 from dent_os_testbed.discovery.Report import Report
 
 
+class IndexedReport(object):
+    """Index entry for a report in the local repository.
+
+    The report itself is only parsed when it is first accessed.
+    """
+
+    def __init__(self, path, ts, topology, operator, reportFromPath, report=None):
+        self.path = path
+        self.ts = ts
+        self.topology = topology
+        self.operator = operator
+        self.reportFromPath = reportFromPath
+        self._report = report
+
+    @property
+    def report(self):
+        if self._report is None:
+            self._report = self.reportFromPath(self.path)
+        return self._report
+
+
 class LocalRepository(object):
 
     def __init__(self,
@@ -32,7 +55,7 @@ class LocalRepository(object):
         self.log = log or logging.getLogger(self.__class__.__name__)
 
         self.reportsDir = reportsDir or self.getReportsDir()
-        if not os.path.isdir(reportsDir):
+        if not os.path.isdir(self.reportsDir):
             self.log.debug('+ /bin/mkdir -p %s', self.reportsDir)
             os.makedirs(self.reportsDir)
             # Whee, moved from 'shutil' to 'os' in PY3
@@ -51,20 +74,24 @@ class LocalRepository(object):
 
         self.reportFromPath = reportFromPath
 
-        # dumb index for a directory-backed collection
-        # of test reports, could use e.g. sqlite for this
+        # sqlite index of (name, mtime, topology, operator)
+        # for the directory-backed collection of test reports,
+        # the reports themselves are parsed lazily
+
+        self.indexPath = os.path.join(self.reportsDir, REPORTS_INDEX)
+        self.db = self.openIndex()
 
         self.reports = []
-        # (path, report) for all reports
+        # IndexedReport for all reports, sorted by time
 
         self.reportsPerTopology = {}
-        # (path, report) for reports keyed by topo
+        # IndexedReport for reports keyed by topo
 
         self.reportsPerOperator = {}
-        # (path, report) for reports keyed by oper
+        # IndexedReport for reports keyed by oper
 
         self.reportsPerTopologyOperator = {}
-        # (path, report) for reports keyed by (topo, oper)
+        # IndexedReport for reports keyed by (topo, oper)
 
         self.collectReports()
         # collect reports on the spot,
@@ -84,25 +111,53 @@ class LocalRepository(object):
         dataDir = os.environ.get('XDG_DATA_HOME', dataDir)
         return os.path.join(dataDir, 'com.amazon.netprod/testbed/reports')
 
+    def openIndex(self):
+        """Open the persistent index, re-creating it if it is unusable."""
+
+        for attempt in range(2):
+            try:
+                db = sqlite3.connect(self.indexPath)
+                db.execute('CREATE TABLE IF NOT EXISTS reports'
+                           ' (name TEXT PRIMARY KEY, ts REAL, topology TEXT, operator TEXT)')
+                db.commit()
+                return db
+            except sqlite3.DatabaseError as ex:
+                if attempt:
+                    raise
+                self.log.warning('invalid report index %s: %s, rebuilding',
+                                 self.indexPath, str(ex))
+                os.unlink(self.indexPath)
+
     def collectReports(self):
         """Gather all of the reports in the local store.
 
-        Sort all of the reports on each scan.
-        - could use a DB for this
-        - could use e.g. heapq to speed up scan a bit
+        Only the reports that are new or changed since the last scan
+        are parsed, everything else comes from the index.
         """
 
-        perAll = []
-        perTopo = {}
-        perOper = {}
-        perTopoOper = {}
+        indexed = {}
+        for name, ts, topo, oper in self.db.execute('SELECT name, ts, topology, operator FROM reports'):
+            indexed[name] = (ts, topo, oper,)
 
+        entries = []
         for el in os.listdir(self.reportsDir):
+            if el.startswith(REPORTS_INDEX):
+                continue
+            # the index and its journal
+
             p = os.path.join(self.reportsDir, el)
             if not p.endswith('.json'):
                 self.log.warning('unrecognized file %s', el)
                 continue
 
+            ts = os.path.getmtime(p)
+            # on the local testbed, JSON mtime == report generation time
+
+            if el in indexed and indexed[el][0] == ts:
+                _, topo, oper = indexed.pop(el)
+                entries.append(IndexedReport(p, ts, topo, oper, self.reportFromPath))
+                continue
+
             try:
                 rpt = self.reportFromPath(p)
             except ValueError as ex:
@@ -110,37 +165,47 @@ class LocalRepository(object):
                                  p, str(ex))
                 continue
 
-            ts = os.path.getmtime(p)
-            # on the local testbed, JSON mtime == report generation time
-
-            oper = rpt.operator
-            topo = rpt.topology
+            indexed.pop(el, None)
+            self.db.execute('INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?)',
+                            (el, ts, rpt.topology, rpt.operator,))
+            entries.append(IndexedReport(p, ts, rpt.topology, rpt.operator, self.reportFromPath, rpt))
 
-            perAll.append((ts, p, rpt,))
-            if topo is not None:
-                perTopo.setdefault(topo, [])
-                perTopo[topo].append((ts, p, rpt,))
-            if oper is not None:
-                perOper.setdefault(oper, [])
-                perOper[oper].append((ts, p, rpt,))
-            if topo is not None and oper is not None:
-                k = (topo, oper,)
-                perTopoOper.setdefault(k, [])
-                perTopoOper[k].append((ts, p, rpt,))
+        # drop the reports that went away out of band
+        self.db.executemany('DELETE FROM reports WHERE name = ?', [(name,) for name in indexed])
+        self.db.commit()
 
-        self.log.info('collected %d reports', len(perAll))
+        self.log.info('collected %d reports', len(entries))
 
         # collate the reports
-        self.reports = [x[1:3] for x in sorted(perAll)]
+        self.reports = []
         self.reportsPerTopology = {}
-        for topo, coll in perTopo.items():
-            self.reportsPerTopology[topo] = [x[1:3] for x in sorted(coll)]
         self.reportsPerOperator = {}
-        for oper, coll in perOper.items():
-            self.reportsPerOperator[oper] = [x[1:3] for x in sorted(coll)]
         self.reportsPerTopologyOperator = {}
-        for topoOper, coll in perTopoOper.items():
-            self.reportsPerTopologyOperator[topoOper] = [x[1:3] for x in sorted(coll)]
+        for ent in sorted(entries, key=lambda x: (x.ts, x.path,)):
+            self._addEntry(ent)
+
+    def _collections(self, ent):
+        colls = [self.reports]
+        if ent.topology is not None:
+            colls.append(self.reportsPerTopology.setdefault(ent.topology, []))
+        if ent.operator is not None:
+            colls.append(self.reportsPerOperator.setdefault(ent.operator, []))
+        if ent.topology is not None and ent.operator is not None:
+            k = (ent.topology, ent.operator,)
+            colls.append(self.reportsPerTopologyOperator.setdefault(k, []))
+        return colls
+
+    def _addEntry(self, ent):
+        for coll in self._collections(ent):
+            coll.append(ent)
+            if len(coll) > 1 and (coll[-2].ts, coll[-2].path,) > (ent.ts, ent.path,):
+                coll.sort(key=lambda x: (x.ts, x.path,))
+
+    def _dropEntry(self, ent):
+        for coll in self._collections(ent):
+            if ent in coll:
+                coll.remove(ent)
+        self.db.execute('DELETE FROM reports WHERE name = ?', (os.path.basename(ent.path),))
 
     def getReports(self,
                    topology=None, operator=None,
@@ -162,17 +227,15 @@ class LocalRepository(object):
             coll = list(self.reports)
 
         reports = []
+        missing = []
         while True:
             if not coll:
                 break
             if len(reports) >= maxReports:
                 break
 
-            p, rpt = coll.pop(-1)
-            if not os.path.exists(p):
-                self.log.warning('missing report %s', p)
-                continue
-            ts = os.path.getmtime(p)
+            ent = coll.pop(-1)
+            ts = ent.ts
 
             if after is not None and ts <= after:
                 break
@@ -184,8 +247,20 @@ class LocalRepository(object):
                 continue
             # still looking for a report before this
 
+            try:
+                rpt = ent.report
+            except (OSError, ValueError,) as ex:
+                self.log.warning('missing report %s: %s', ent.path, str(ex))
+                missing.append(ent)
+                continue
+
             reports.insert(0, (rpt, ts,))
 
+        if missing:
+            for ent in missing:
+                self._dropEntry(ent)
+            self.db.commit()
+
         if not reports:
             self.log.warning('no reports available for the query'
                              ' topology=%s'
@@ -220,43 +295,43 @@ class LocalRepository(object):
             - drop items beyond minSave that are too old
             - drop items beyond maxSave regardless of age
             """
+            coll = list(coll)
             while True:
                 if len(coll) <= self.minSave:
                     break
-                p, rpt = coll[0]
-
-                if not os.path.exists(p):
+                ent = coll[0]
+
+                if ent.ts < past or len(coll) > self.maxSave:
+                    self.log.debug('+ /bin/rm %s', ent.path)
+                    try:
+                        os.unlink(ent.path)
+                    except FileNotFoundError:
+                        pass
+                    # maybe we deleted this one out of band
                     coll.pop(0)
-                    continue
-                # maybe we deleted this one out of band
-
-                ts = os.path.getmtime(p)
-                if ts < past or len(coll) > self.maxSave:
-                    self.log.debug('+ /bin/rm %s', p)
-                    os.unlink(p)
+                    self._dropEntry(ent)
                 else:
                     break
 
-        for k, coll in self.reportsPerTopologyOperator.items():
+        for k, coll in list(self.reportsPerTopologyOperator.items()):
             _trim(coll)
 
-        for topo, coll in self.reportsPerTopology.items():
-            coll = [x for x in coll if x[1].operator is None]
+        for topo, coll in list(self.reportsPerTopology.items()):
+            coll = [x for x in coll if x.operator is None]
             _trim(coll)
         # trim per-topology, but only if the operator is unset
 
-        for oper, coll in self.reportsPerOperator.items():
-            coll = [x for x in coll if x[1].topology is None]
+        for oper, coll in list(self.reportsPerOperator.items()):
+            coll = [x for x in coll if x.topology is None]
             _trim(coll)
         # trim per-operator, but only if the topology is unset
 
-        coll = [x for x in self.reports if x[1].operator is None and x[1].topology is None]
+        coll = [x for x in self.reports if x.operator is None and x.topology is None]
         _trim(coll)
         # trim reports with no topology, no operator
 
-        # re-generate the collections since we deleted them willy-nilly
-        # and didn't keep the collections in sync
-        self.collectReports()
+        # the collections and the index were updated in place
+        self.db.commit()
 
     def saveReport(self, rpt):
         """Save a report object into the local repository.
@@ -281,4 +356,11 @@ class LocalRepository(object):
             json.dump(rpt.asDict(), fd)
         os.utime(path, (ts, ts,))
 
+        # index the new report, the saved copy is parsed on first use
+        ts = os.path.getmtime(path)
+        self.db.execute('INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?)',
+                        (base, ts, rpt.topology, rpt.operator,))
+        self.db.commit()
+        self._addEntry(IndexedReport(path, ts, rpt.topology, rpt.operator, self.reportFromPath))
+
         return path
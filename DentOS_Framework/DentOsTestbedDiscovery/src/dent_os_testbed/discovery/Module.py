@@ -10,6 +10,7 @@ import copy
 import importlib
 import importlib.util
 import asyncio
+import itertools
 
 from dent_os_testbed.discovery.Report import Report
 
@@ -28,10 +29,12 @@ class Module(object):
 
     PRIORITY = 100
 
-    def __init__(self, ctx, report, log=None):
+    def __init__(self, ctx, report, log=None, connected=None):
         self.ctx = ctx
         self.report = report
         self.log = log or logging.getLogger(self.__class__.__name__)
+        # device connectivity checks shared by all the modules of a run
+        self.connected = {} if connected is None else connected
 
     async def discover(self):
         """Base class for discovery modules.
@@ -41,6 +44,15 @@ class Module(object):
         """
         raise NotImplementedError('this is a base class')
 
+    async def is_connected(self, dev):
+        """Check the connectivity of a device once per discovery run.
+
+        Concurrent callers for the same device wait on the same check.
+        """
+        if dev.host_name not in self.connected:
+            self.connected[dev.host_name] = asyncio.ensure_future(dev.is_connected())
+        return await self.connected[dev.host_name]
+
     async def do_discovery(self):
 
         rpt, self.report = self.report, self.report.clone(copy.deepcopy(self.report.asDict()))
@@ -106,19 +118,28 @@ class DiscoveryRunner(object):
             k, dc = item
             return dc.PRIORITY
 
-        for k, dc in sorted(dcl, key=_fn):
-            dinst = dc(self.ctx, report, log=self.log.getChild(k))
-            try:
-                await dinst.do_discovery()
-            except Exception:
+        # modules of the same PRIORITY do not depend on each other, run them
+        # concurrently on a shared copy of the report; the priorities run in order
+        connected = {}
+        for prio, group in itertools.groupby(sorted(dcl, key=_fn), key=_fn):
+            rpt = report.clone(copy.deepcopy(report.asDict()))
+            dinsts = []
+            for k, dc in group:
+                dinst = dc(self.ctx, report, log=self.log.getChild(k), connected=connected)
+                dinst.report = rpt
+                dinsts.append(dinst)
+            results = await asyncio.gather(*[d.discover() for d in dinsts], return_exceptions=True)
+            for e in results:
+                if not isinstance(e, Exception):
+                    continue
                 if force:
                     msg = 'discovery failed for %s' % self.__class__.__name__
                     raise DiscoveryFailed(msg,
-                                          sys.exc_info(),
+                                          (type(e), e, e.__traceback__),
                                           report)
                 else:
-                    raise
-            report = dinst.report
+                    raise e
+            report = rpt
 
         return report
 
@@ -5,6 +5,9 @@ Module init for dent_os_testbed.discovery
 
 REPORTS_DIR = '/var/lib/testbed/discovery'
 
+REPORTS_INDEX = '.index.db'
+# sqlite index of the reports, kept in REPORTS_DIR
+
 REPORTS_SAVE_MIN = 3
 # save at least three of each report
 
@@ -3,10 +3,14 @@
 Code generation module to read yaml models and feed it to dynamic plugins
 """
 
+import argparse
+import concurrent.futures
 import fnmatch
+import hashlib
 import imp
 import inspect
 import os
+import pickle
 
 import yaml
 from pykwalify.core import Core
@@ -15,12 +19,21 @@ from pykwalify.errors import PyKwalifyException
 from gen.lib.database import Package
 from gen.lib.sample_plugin import SamplePlugin
 
+# incremental runs keep the validated model and the digests of the model files and
+# of the plugins in this file of the output directory
+CACHE_FILE = '.codegen_cache'
+CACHE_VERSION = 1
 
-def load_yaml(yaml_dir):
+
+def load_yaml(yaml_dir, validated=None):
     """
     1. recursively walk the directories looking for yaml files.
     2. top level directory represents package
     3. Keep constructing pkg->module->classes,types,commands etc
+
+    validated is a dict of file -> (digest, ydata) of the files validated by a previous
+    run, the files that did not change are not parsed and validated again; it is
+    updated with the files loaded.
     """
     content = dict()
     schema_file = os.path.join(yaml_dir, 'schema.yaml')
@@ -29,14 +42,20 @@ def load_yaml(yaml_dir):
             if filename == 'schema.yaml':
                 continue
             fname = os.path.join(root, filename)
-            with open(fname, 'r', encoding='utf-8') as fp:
-                ydata = yaml.safe_load(fp)
+            digest = file_digest(fname)
+            if validated is not None and validated.get(fname, (None,))[0] == digest:
+                ydata = validated[fname][1]
+            else:
+                with open(fname, 'r', encoding='utf-8') as fp:
+                    ydata = yaml.safe_load(fp)
 
-            try:
-                c = Core(source_data=ydata, schema_files=[schema_file])
-                c.validate(raise_exception=True)
-            except PyKwalifyException as e:
-                raise e
+                try:
+                    c = Core(source_data=ydata, schema_files=[schema_file])
+                    c.validate(raise_exception=True)
+                except PyKwalifyException as e:
+                    raise e
+                if validated is not None:
+                    validated[fname] = (digest, ydata)
 
             pname = root[len(yaml_dir):].split('/')[0]
             print(fname)
@@ -54,6 +73,98 @@ def load_yaml(yaml_dir):
     return content
 
 
+def file_digest(*fnames):
+    """
+    sha256 of the content of the files
+    """
+    h = hashlib.sha256()
+    for fname in fnames:
+        with open(fname, 'rb') as fp:
+            h.update(fp.read())
+    return h.hexdigest()
+
+
+def model_files(yaml_dir):
+    """
+    yaml model files under yaml_dir
+    """
+    return [
+        os.path.join(root, filename)
+        for root, dirnames, filenames in os.walk(yaml_dir)
+        for filename in fnmatch.filter(filenames, '*.yaml')
+        if filename != 'schema.yaml'
+    ]
+
+
+def source_digest(*dirs):
+    """
+    sha256 of the python sources under the directories
+    """
+    fnames = []
+    for d in dirs:
+        for root, dirnames, filenames in os.walk(d):
+            fnames += [os.path.join(root, f) for f in fnmatch.filter(filenames, '*.py')]
+    return file_digest(*sorted(fnames))
+
+
+def model_dependencies(dbs):
+    """
+    1. walk the classes, types and tests of all the packages
+    2. collect the files of the classes they implement or are implemented by, of
+       the classes of their members and of the types they use
+
+    Returns:
+        dict of file -> set of files its generated code is read from
+    """
+    deps = dict()
+
+    def add(fname, obj):
+        if hasattr(obj, '_yfile') and obj._yfile != fname:
+            deps.setdefault(fname, set()).add(obj._yfile)
+
+    def walk_class(c):
+        add(c._yfile, c.implements)
+        for impl in c.implemented_by:
+            add(c._yfile, impl)
+        for m in c.members:
+            add(c._yfile, m.type)
+            add(c._yfile, m.cls)
+        for s in c.classes:
+            walk_class(s)
+
+    for pkg in dbs.values():
+        for m in pkg.modules.values():
+            for c in m.classes:
+                walk_class(c)
+            for t in m.types:
+                add(t._yfile, t.type)
+                for tm in t.members:
+                    add(t._yfile, tm.type)
+            for t in m.tests:
+                for tc in t.test_cases:
+                    add(t._yfile, tc.cls)
+    return deps
+
+
+def changed_with_dependents(dbs, changed):
+    """
+    Extend the changed files with the files that depend on them, directly or through
+    other files
+    """
+    dependents = dict()
+    for fname, files in model_dependencies(dbs).items():
+        for f in files:
+            dependents.setdefault(f, set()).add(fname)
+    result = set(changed)
+    queue = list(changed)
+    while queue:
+        for f in dependents.get(queue.pop(), ()):
+            if f not in result:
+                result.add(f)
+                queue.append(f)
+    return result
+
+
 def load_plugins(plugin_dir):
     """
     1. Look for plugin.py under plugin_dir
@@ -74,25 +185,104 @@ def load_plugins(plugin_dir):
                 ):
                     print('Loading Plugin ' + name)
                     content[name] = cls(name)
+                    content[name].fname = fname
     return content
 
 
+def run_plugin(fname, name, changed, dbs, odir):
+    """
+    Load the plugin again and generate its code, for the plugins run in a process pool
+    """
+    module = imp.load_source('plugin', fname)
+    p = getattr(module, name)(name)
+    p.changed = changed
+    p.generate_code(dbs, odir)
+
+
+def load_cache(fname):
+    try:
+        with open(fname, 'rb') as fp:
+            cache = pickle.load(fp)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return {}
+    return cache if cache.get('version') == CACHE_VERSION else {}
+
+
+def save_cache(fname, cache):
+    cache['version'] = CACHE_VERSION
+    with open(fname + '.tmp', 'wb') as fp:
+        pickle.dump(cache, fp)
+    os.replace(fname + '.tmp', fname)
+
+
 def main(
     plugin_dir='./plugins/',
     yaml_dir='./model/',
     yang_dir='./model/',
     output_dir='/tmp/codegen/',
+    incremental=False,
+    jobs=1,
 ):
     """
     1. Load the plugins.
     2. Load the model from yaml fils
     3. Invoke the plugin to generate the repective code.
+
+    incremental keeps the validated model in output_dir/.codegen_cache and regenerates
+    only the code of the model files that changed since the last run (and of the files
+    depending on them); a plugin whose code changed regenerates everything.
+    jobs > 1 runs the plugins in a process pool.
     """
     plugins = load_plugins(plugin_dir)
-    dbs = load_yaml(yaml_dir)
-    for _, p in plugins.items():
-        p.generate_code(dbs, output_dir)
+    lib_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lib')
+    changed = {name: None for name in plugins}
+    if incremental:
+        cache_file = os.path.join(output_dir, CACHE_FILE)
+        cache = load_cache(cache_file)
+        schema = file_digest(os.path.join(yaml_dir, 'schema.yaml'))
+        if cache.get('schema') != schema:
+            cache = {'schema': schema, 'files': {}, 'plugins': {}}
+        previous = {f: digest for f, (digest, _) in cache['files'].items()}
+        current = {f: file_digest(f) for f in model_files(yaml_dir)}
+        model_changed = {f for f in set(previous) | set(current) if previous.get(f) != current.get(f)}
+        if model_changed or 'db' not in cache:
+            cache['files'] = {f: v for f, v in cache['files'].items() if f in current}
+            cache['db'] = load_yaml(yaml_dir, cache['files'])
+        dbs = cache['db']
+        model_changed = changed_with_dependents(dbs, model_changed)
+        for name, p in plugins.items():
+            digest = source_digest(os.path.dirname(p.fname), lib_dir)
+            if cache['plugins'].get(name) == digest:
+                changed[name] = model_changed
+            cache['plugins'][name] = digest
+    else:
+        dbs = load_yaml(yaml_dir)
+    if jobs > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(run_plugin, p.fname, name, changed[name], dbs, output_dir) for name, p in plugins.items()]
+            for f in futures:
+                f.result()
+    else:
+        for name, p in plugins.items():
+            p.changed = changed[name]
+            p.generate_code(dbs, output_dir)
+    if incremental:
+        # only a complete run is recorded, a failed one is retried as a whole
+        save_cache(cache_file, cache)
 
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Generate the code from the yaml models')
+    parser.add_argument('--plugin-dir', default='./plugins/')
+    parser.add_argument('--yaml-dir', default='./model/')
+    parser.add_argument('--output-dir', default='/tmp/codegen/')
+    parser.add_argument('--incremental', action='store_true', help='regenerate only the code of the changed models')
+    parser.add_argument('--jobs', type=int, default=1, help='run the plugins in a pool of this many processes')
+    args = parser.parse_args()
+    main(
+        plugin_dir=args.plugin_dir,
+        yaml_dir=args.yaml_dir,
+        output_dir=args.output_dir,
+        incremental=args.incremental,
+        jobs=args.jobs,
+    )
@@ -171,6 +171,7 @@ class ClassCommand(object):
         self.apis = ydata['apis']
         self.cmd = ydata['cmd'][0] if 'cmd' in ydata else ''
         self.desc = ydata['desc'] if 'desc' in ydata else ''
+        self.format = ydata['format'] if 'format' in ydata else None
 
     def to_dict(self):
         return {
@@ -178,8 +179,17 @@ class ClassCommand(object):
             'cmd_apis': self.apis,
             'cmd': self.cmd,
             'cmd_desc': self.desc,
+            'cmd_upper': self.name.upper(),
+            'format_prefix': self.format['prefix'] if self.format else '',
+            'format_fields': self.format_fields(),
         }
 
+    def format_fields(self):
+        fields = self.format.get('fields', []) if self.format else []
+        if not fields:
+            return '[]'
+        return '[\n' + ''.join('        %r,\n' % f for f in fields) + '    ]'
+
     def validate(self):
         pass
 
@@ -327,9 +337,11 @@ class Package(object):
         self._ydata = ydata
         self._db = db
         self.name = name
+        self.files = [fname]
         self.modules = {mdata['module']: Module(self, mdata['module'], mdata, fname) for mdata in ydata}
 
     def append_to_pkg(self, ydata, fname):
+        self.files.append(fname)
         for mdata in ydata:
             mod = mdata['module']
             if mod not in self.modules:
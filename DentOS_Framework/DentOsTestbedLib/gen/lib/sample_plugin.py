@@ -5,4 +5,12 @@ Base class of the code generation plugin
 
 
 class SamplePlugin(object):
-    pass
+    # model files changed since the last incremental run, with the files depending on
+    # them, None when all the code has to be generated
+    changed = None
+
+    def needs_update(self, *fnames):
+        """
+        Check if the code generated from the model files has to be generated again
+        """
+        return self.changed is None or any(f in self.changed for f in fnames)
@@ -164,6 +164,7 @@ class DiscoveryModulePyObject(object):
         return methods
 
     def generate_code(self):
+        self._imports.append(PyImport('asyncio'))
         self._imports.append(PyImport('Module', _from='dent_os_testbed.discovery.Module '))
         self._imports.append(
             PyImport(
@@ -215,9 +216,10 @@ class DiscoveryPlugin(SamplePlugin):
             f.close()
         fname = os.path.join(tdir, 'ReportSchema.py')
         # gd.write("ReportSchema.py\n")
-        o = ReportPyObject(dbs['dent'], fname)
-        o.generate_code()
-        o.write_file()
+        if self.needs_update(*dbs['dent'].files):
+            o = ReportPyObject(dbs['dent'], fname)
+            o.generate_code()
+            o.write_file()
 
         tdir = os.path.join(odir, 'src/dent_os_testbed/discovery/modules')
         if not os.path.exists(tdir):
@@ -229,20 +231,24 @@ class DiscoveryPlugin(SamplePlugin):
         # BFS from base class and create discovery for each class that has implemented by
         visited = {}
         # queue=[(dbs["dent"].modules['base'].classes_dct['duts'],'data["duts"][i]')]
-        queue = [(dbs['dent'].modules['base'].classes_dct['duts'], 'self.report.duts[i]')]
+        duts = dbs['dent'].modules['base'].classes_dct['duts']
+        # the model files of the path to the class are kept for the incremental runs
+        queue = [(duts, 'self.report.duts[i]', [duts._yfile])]
         while queue:
-            (node, parent) = queue.pop(0)
+            (node, parent, files) = queue.pop(0)
             if node in visited:
                 continue
             visited[node] = True
             for m in node.members:
                 if not m.cls:
                     continue
-                queue.append((m.cls, parent+'.'+m.name))
+                queue.append((m.cls, parent+'.'+m.name, files + [m.cls._yfile]))
             if not node.implemented_by:
                 continue
             if 'show' not in node.apis:
                 continue
+            if not self.needs_update(*files):
+                continue
             # now need to create discovery module
             fname = os.path.join(tdir, 'mod_' + node.name + '.py')
             # gd.write(f"modules/mod_{node.name}.py\n")
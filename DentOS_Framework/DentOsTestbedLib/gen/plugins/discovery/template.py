@@ -29,14 +29,11 @@ for i,%(cls_name)s in enumerate(%(src)s):
 discover_py_code_set_attr = """    if '%(mbr)s' in %(cls_name)s: %(dst)s.%(mbr)s = %(cls_name)s.get('%(mbr)s')
 """
 
-discover_py_code_template = """# need to get device instance to get the data from
-#
-for i, dut in enumerate(self.report.duts):
-    if not dut.device_id: continue
+discover_py_code_template = """async def discover_dut(i, dut):
     dev = self.ctx.devices_dict[dut.device_id]
-    if dev.os == "ixnetwork" or not await dev.is_connected():
+    if dev.os == "ixnetwork" or not await self.is_connected(dev):
         print("Device not connected skipping %(cls_name)s discovery")
-        continue
+        return
     print("Running %(cls_name)s Discovery on " + dev.host_name)
     out = await %(cname_cc)s.show(
         input_data=[{dev.host_name: [{'dut_discovery':True}]}],
@@ -46,11 +43,15 @@ for i, dut in enumerate(self.report.duts):
     if out[0][dev.host_name]["rc"] != 0:
         print(out)
         print("Failed to get %(cls_name)s")
-        continue
+        return
     if 'parsed_output' not in out[0][dev.host_name]:
         print("Failed to get parsed_output %(cls_name)s")
         print (out)
-        continue
+        return
     self.set_%(cls_name)s(out[0][dev.host_name]["parsed_output"], %(parent)s)
     print("Finished %(cls_name)s Discovery on {} with {} entries".format(dev.host_name, len(%(parent)s)))
+
+# need to get device instance to get the data from
+# all the duts are discovered concurrently
+await asyncio.gather(*[discover_dut(i, dut) for i, dut in enumerate(self.report.duts) if dut.device_id])
 """
@@ -137,19 +137,22 @@ class DocPlugin(SamplePlugin):
         gi = os.path.join(tdir, '.gitignore')
         gd = open(gi, 'w')
         gd.write('sdk.md\n')
-        fname = os.path.join(tdir, 'sdk.md')
-        o = DocsMdObject(dbs['dent'], fname)
-        o.generate_code()
-        o.write_file()
+        if self.needs_update(*dbs['dent'].files):
+            fname = os.path.join(tdir, 'sdk.md')
+            o = DocsMdObject(dbs['dent'], fname)
+            o.generate_code()
+            o.write_file()
         for mname, m in dbs['dent'].modules.items():
             for c in m.classes:
                 # don't bother generating the py file if there is not event single platform this
                 # class is implemented in
                 if not c.implemented_by:
                     continue
+                gd.write(f'{c.name}.md\n')
+                if not self.needs_update(c._yfile):
+                    continue
                 fname = os.path.join(tdir, c.name + '.md')
                 o = DocMdObject(c, fname)
                 o.generate_code()
                 o.write_file()
-                gd.write(f'{c.name}.md\n')
         gd.close()
@@ -28,6 +28,9 @@ from gen.plugins.test.template import (
     py_class_common_format_cmd_case,
     py_class_common_format_cmds,
     py_class_common_format_cmd,
+    py_class_common_compiled_format_cmd,
+    py_class_common_formatter,
+    py_class_common_formatters,
     py_class_common_run_cmd_case,
     py_class_common_run_cmds,
     py_class_common_run_cmd,
@@ -76,6 +79,7 @@ class TestPyObject(object):
     def generate_code(self):
         args = self._cls.to_dict()
         args['cname_cc'] = camelcase(self._cls.name)
+        self._imports.append(PyImport('asyncio'))
         self._imports.append(PyImport('pytest'))
         self._imports.append(PyImport('TestLibObject', _from='dent_os_testbed.lib.test_lib_object '))
         for impl in self._cls.implemented_by:
@@ -110,9 +114,9 @@ class TestPyObject(object):
             impl_form_cmd += py_class_common_impl_form_command % iargs
         args['impl_form_cmd'] = impl_form_cmd
         if self._cls.local:
-            args['invoke_command'] = 'rc, output = impl_obj.run_command(device_obj, command=api, params=device[device_name])'
+            args['invoke_command'] = 'rc, output = await impl_obj.run_command_async(device_obj, command=api, params=device[device_name])'
         else:
-            args['invoke_command'] = 'rc, output = await device_obj.run_cmd(("sudo " if device_obj.ssh_conn_params.pssh else "") + commands)'
+            args['invoke_command'] = 'rc, output = await device_obj.run_cmd(("sudo " if device_obj.ssh_conn_params.pssh else "") + commands, input=batch_input)'
         args['local'] = 'impl' if self._cls.local else 'device'
         run_body = tokenize(py_class_common_run % args),
         methods.append(PyMethod('_run_command',
@@ -170,15 +174,23 @@ class TestCmdPyObject(object):
         args = self._cls.to_dict()
         args['cname_cc'] = camelcase(self._cls.name)
         methods = []
+        static = []
         # add format_cmd method
         format_entries = ''
+        formatter_entries = []
         run_entries = ''
         parse_entries = ''
         need_run = False
         for cmd in self._cls.commands:
             # add the methods to handle the generation
             cargs = cmd.to_dict()
-            format_cmd_body = tokenize(py_class_common_format_cmd % cargs)
+            if cmd.format:
+                # table driven formatter compiled once from the model
+                static.append(PyLines(lines=tokenize(py_class_common_formatter % cargs, indent=4)))
+                formatter_entries += ["    '%s': FORMAT_%s," % (api, cargs['cmd_upper']) for api in cmd.apis]
+                format_cmd_body = tokenize(py_class_common_compiled_format_cmd % cargs)
+            else:
+                format_cmd_body = tokenize(py_class_common_format_cmd % cargs)
             methods.append(
                 PyMethod(
                     'format_%s' % cmd.name, 'self, command, *argv, **kwarg', format_cmd_body, indent=4,
@@ -210,6 +222,10 @@ class TestCmdPyObject(object):
         methods.append(
             PyMethod('format_command', 'self, command, *argv, **kwarg', format_cmd_body, indent=4)
         )
+        if formatter_entries:
+            self._imports.append(PyImport('CommandFormatter', _from='dent_os_testbed.lib.command_formatter '))
+            args['formatter_entries'] = '\n'.join(formatter_entries)
+            static.append(PyLines(lines=tokenize(py_class_common_formatters % args, indent=4)))
         if need_run:
             run_cmd_body = tokenize(py_class_common_run_cmds % args)
             methods.append(
@@ -224,6 +240,7 @@ class TestCmdPyObject(object):
             PyClass(camelcase(self._cls.name),
                     desc=[PyLines(lines=tokenize(self._cls.desc, indent=8))],
                     parent='TestLibObject',
+                    static=static,
                     methods=methods)
         )
 
@@ -321,6 +338,8 @@ class TestPlugin(SamplePlugin):
                 # class is implemented in
                 if not c.implemented_by:
                     continue
+                if not self.needs_update(c._yfile):
+                    continue
                 if not os.path.exists(mdir):
                     os.mkdir(mdir)
                     fname = os.path.join(mdir, '__init__.py')
@@ -340,6 +359,8 @@ class TestPlugin(SamplePlugin):
                 f = open(fname, 'w')
                 f.close()
             for c in m.classes:
+                if not self.needs_update(c._yfile):
+                    continue
                 fname = os.path.join(mdir, c.name + '.py')
                 o = TestCmdPyObject(c, fname)
                 o.generate_code()
@@ -361,6 +382,8 @@ class TestPlugin(SamplePlugin):
                 f = open(fname, 'w')
                 f.close()
             for c in m.classes:
+                if not self.needs_update(c._yfile):
+                    continue
                 fname = os.path.join(mdir, c.name + '.py')
                 o = TestCmdPyObject(c, fname)
                 o.generate_code()
@@ -382,6 +405,8 @@ class TestPlugin(SamplePlugin):
                 f = open(fname, 'w')
                 f.close()
             for c in m.classes:
+                if not self.needs_update(c._yfile):
+                    continue
                 fname = os.path.join(mdir, c.name + '.py')
                 o = TestCmdPyObject(c, fname)
                 o.generate_code()
@@ -6,13 +6,39 @@ py_header = """# Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights R
 """
 py_class_common_impl_form_command = """        if device_obj.os in %(platforms)s:
             impl_obj = %(cname_cc)sImpl()
-            for command in device[device_name]:
-                commands += impl_obj.format_command(command=api, params=command)
-                commands += '&& '
-            commands = commands[:-3]
-"""
-py_class_common_run = """devices = kwarg['input_data']
+            batch = impl_obj.format_batch(command=api, params=device[device_name]) if kwarg.get('batch', False) else None
+            if batch:
+                commands, batch_input = batch
+            else:
+                batch_input = None
+                commands = '&& '.join(impl_obj.format_many(command=api, params_list=device[device_name]))
+"""
+py_class_common_run = """async def run_device(device, device_name, device_obj, impl_obj, commands, batch_input, device_result):
+    async with semaphore:
+        try:
+            cached = impl_obj.cache_get(device_name, api, commands, kwarg)
+            if cached:
+                rc, output = cached
+            else:
+                %(invoke_command)s
+                impl_obj.cache_update(device_name, api, commands, rc, output, kwarg)
+            device_result[device_name]['rc'] = rc
+            device_result[device_name]['result'] = output
+            if batch_input is not None:
+                # map the failed batch lines back to the input entries
+                device_result[device_name]['batch_errors'] = impl_obj.parse_batch_errors(output)
+            if 'parse_output' in kwarg:
+                parse_output = impl_obj.parse_output(command=api, output=output, commands=commands,
+                                                     fields=kwarg.get('parse_fields'), lazy=kwarg.get('parse_lazy', False))
+                device_result[device_name]['parsed_output'] = parse_output
+        except Exception as e:
+            device_result[device_name]['rc'] = -1
+            device_result[device_name]['result'] = str(e)
+
+devices = kwarg['input_data']
+semaphore = asyncio.Semaphore(kwarg.get('max_concurrency', TestLibObject.MAX_CONCURRENCY))
 result = list()
+jobs = list()
 for device in devices:
     for device_name in device:
         device_result = {
@@ -25,6 +51,7 @@ for device in devices:
             if device_name not in pytest.testbed.devices_dict:
                 device_result[device_name] =  "No matching device "+ device_name
                 result.append(device_result)
+                await asyncio.gather(*jobs)
                 return result
             device_obj = pytest.testbed.devices_dict[device_name]
         commands = ""
@@ -33,19 +60,13 @@ for device in devices:
             device_result[device_name]['rc'] = -1
             device_result[device_name]['result'] = "No matching device OS "+ device_obj.os
             result.append(device_result)
+            await asyncio.gather(*jobs)
             return result
         device_result[device_name]['command'] = commands
-        try:
-            %(invoke_command)s
-            device_result[device_name]['rc'] = rc
-            device_result[device_name]['result'] = output
-            if 'parse_output' in kwarg:
-                parse_output = impl_obj.parse_output(command=api, output=output, commands=commands)
-                device_result[device_name]['parsed_output'] = parse_output
-        except Exception as e:
-            device_result[device_name]['rc'] = -1
-            device_result[device_name]['result'] = str(e)
         result.append(device_result)
+        jobs.append(run_device(device, device_name, device_obj, impl_obj, commands, batch_input, device_result))
+# run the devices concurrently, the results keep the input_data order
+await asyncio.gather(*jobs)
 return result
 """
 
@@ -78,6 +99,20 @@ raise NameError("Cannot find command "+command)
 py_class_common_format_cmd = """raise NotImplementedError
 """
 
+py_class_common_compiled_format_cmd = """return self.FORMAT_%(cmd_upper)s.format(command, kwarg['params'])
+"""
+
+py_class_common_formatter = """FORMAT_%(cmd_upper)s = CommandFormatter(
+    %(format_prefix)r,
+    %(format_fields)s,
+)
+"""
+
+py_class_common_formatters = """FORMATTERS = {
+%(formatter_entries)s
+}
+"""
+
 py_class_common_run_cmd_case = """if command in %(cmds)s:
     return self.run_%(cmd)s(device_obj, command, *argv, **kwarg)
 
@@ -119,6 +119,8 @@ class TestSuitePlugin(SamplePlugin):
             f.close()
         for mname, m in dbs['test'].modules.items():
             for t in m.tests:
+                if not self.needs_update(t._yfile):
+                    continue
                 fname = os.path.join(tdir, 'test_' + t.name + '.py')
                 o = TestSuitePyObject(t, fname)
                 o.generate_code()
@@ -4,6 +4,7 @@
 #
 # DONOT EDIT - generated by diligent bots
 
+import asyncio
 from dent_os_testbed.discovery.Module import Module
 from dent_os_testbed.lib.os.disk_free import DiskFree
 
@@ -29,15 +30,11 @@ class DiskFreeMod(Module):
                 dst[i].mounted_on = disk_free.get('mounted_on')
 
     async def discover(self):
-        # need to get device instance to get the data from
-        #
-        for i, dut in enumerate(self.report.duts):
-            if not dut.device_id:
-                continue
+        async def discover_dut(i, dut):
             dev = self.ctx.devices_dict[dut.device_id]
-            if dev.os == 'ixnetwork' or not await dev.is_connected():
+            if dev.os == 'ixnetwork' or not await self.is_connected(dev):
                 print('Device not connected skipping disk_free discovery')
-                continue
+                return
             print('Running disk_free Discovery on ' + dev.host_name)
             out = await DiskFree.show(
                 input_data=[{dev.host_name: [{'dut_discovery': True}]}],
@@ -47,10 +44,14 @@ class DiskFreeMod(Module):
             if out[0][dev.host_name]['rc'] != 0:
                 print(out)
                 print('Failed to get disk_free')
-                continue
+                return
             if 'parsed_output' not in out[0][dev.host_name]:
                 print('Failed to get parsed_output disk_free')
                 print(out)
-                continue
+                return
             self.set_disk_free(out[0][dev.host_name]['parsed_output'], self.report.duts[i].system.os.disk)
             print('Finished disk_free Discovery on {} with {} entries'.format(dev.host_name, len(self.report.duts[i].system.os.disk)))
+
+        # need to get device instance to get the data from
+        # all the duts are discovered concurrently
+        await asyncio.gather(*[discover_dut(i, dut) for i, dut in enumerate(self.report.duts) if dut.device_id])
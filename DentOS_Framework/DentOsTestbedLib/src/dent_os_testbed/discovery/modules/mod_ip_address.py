@@ -4,6 +4,7 @@
 #
 # DONOT EDIT - generated by diligent bots
 
+import asyncio
 from dent_os_testbed.discovery.Module import Module
 from dent_os_testbed.lib.ip.ip_address import IpAddress
 
@@ -84,15 +85,11 @@ class IpAddressMod(Module):
                 dst[i].options = ip_address.get('options')
 
     async def discover(self):
-        # need to get device instance to get the data from
-        #
-        for i, dut in enumerate(self.report.duts):
-            if not dut.device_id:
-                continue
+        async def discover_dut(i, dut):
             dev = self.ctx.devices_dict[dut.device_id]
-            if dev.os == 'ixnetwork' or not await dev.is_connected():
+            if dev.os == 'ixnetwork' or not await self.is_connected(dev):
                 print('Device not connected skipping ip_address discovery')
-                continue
+                return
             print('Running ip_address Discovery on ' + dev.host_name)
             out = await IpAddress.show(
                 input_data=[{dev.host_name: [{'dut_discovery': True}]}],
@@ -102,10 +99,14 @@ class IpAddressMod(Module):
             if out[0][dev.host_name]['rc'] != 0:
                 print(out)
                 print('Failed to get ip_address')
-                continue
+                return
             if 'parsed_output' not in out[0][dev.host_name]:
                 print('Failed to get parsed_output ip_address')
                 print(out)
-                continue
+                return
             self.set_ip_address(out[0][dev.host_name]['parsed_output'], self.report.duts[i].network.layer3.addresses)
             print('Finished ip_address Discovery on {} with {} entries'.format(dev.host_name, len(self.report.duts[i].network.layer3.addresses)))
+
+        # need to get device instance to get the data from
+        # all the duts are discovered concurrently
+        await asyncio.gather(*[discover_dut(i, dut) for i, dut in enumerate(self.report.duts) if dut.device_id])
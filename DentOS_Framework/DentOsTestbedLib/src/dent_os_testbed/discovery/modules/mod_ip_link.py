@@ -4,6 +4,7 @@
 #
 # DONOT EDIT - generated by diligent bots
 
+import asyncio
 from dent_os_testbed.discovery.Module import Module
 from dent_os_testbed.lib.ip.ip_link import IpLink
 
@@ -93,15 +94,11 @@ class IpLinkMod(Module):
                 dst[i].options = ip_link.get('options')
 
     async def discover(self):
-        # need to get device instance to get the data from
-        #
-        for i, dut in enumerate(self.report.duts):
-            if not dut.device_id:
-                continue
+        async def discover_dut(i, dut):
             dev = self.ctx.devices_dict[dut.device_id]
-            if dev.os == 'ixnetwork' or not await dev.is_connected():
+            if dev.os == 'ixnetwork' or not await self.is_connected(dev):
                 print('Device not connected skipping ip_link discovery')
-                continue
+                return
             print('Running ip_link Discovery on ' + dev.host_name)
             out = await IpLink.show(
                 input_data=[{dev.host_name: [{'dut_discovery': True}]}],
@@ -111,10 +108,14 @@ class IpLinkMod(Module):
             if out[0][dev.host_name]['rc'] != 0:
                 print(out)
                 print('Failed to get ip_link')
-                continue
+                return
             if 'parsed_output' not in out[0][dev.host_name]:
                 print('Failed to get parsed_output ip_link')
                 print(out)
-                continue
+                return
             self.set_ip_link(out[0][dev.host_name]['parsed_output'], self.report.duts[i].network.layer1.links)
             print('Finished ip_link Discovery on {} with {} entries'.format(dev.host_name, len(self.report.duts[i].network.layer1.links)))
+
+        # need to get device instance to get the data from
+        # all the duts are discovered concurrently
+        await asyncio.gather(*[discover_dut(i, dut) for i, dut in enumerate(self.report.duts) if dut.device_id])
@@ -4,6 +4,7 @@
 #
 # DONOT EDIT - generated by diligent bots
 
+import asyncio
 from dent_os_testbed.discovery.Module import Module
 from dent_os_testbed.lib.ip.ip_route import IpRoute
 
@@ -80,15 +81,11 @@ class IpRouteMod(Module):
                 dst[i].options = ip_route.get('options')
 
     async def discover(self):
-        # need to get device instance to get the data from
-        #
-        for i, dut in enumerate(self.report.duts):
-            if not dut.device_id:
-                continue
+        async def discover_dut(i, dut):
             dev = self.ctx.devices_dict[dut.device_id]
-            if dev.os == 'ixnetwork' or not await dev.is_connected():
+            if dev.os == 'ixnetwork' or not await self.is_connected(dev):
                 print('Device not connected skipping ip_route discovery')
-                continue
+                return
             print('Running ip_route Discovery on ' + dev.host_name)
             out = await IpRoute.show(
                 input_data=[{dev.host_name: [{'dut_discovery': True}]}],
@@ -98,10 +95,14 @@ class IpRouteMod(Module):
             if out[0][dev.host_name]['rc'] != 0:
                 print(out)
                 print('Failed to get ip_route')
-                continue
+                return
             if 'parsed_output' not in out[0][dev.host_name]:
                 print('Failed to get parsed_output ip_route')
                 print(out)
-                continue
+                return
             self.set_ip_route(out[0][dev.host_name]['parsed_output'], self.report.duts[i].network.layer3.routes)
             print('Finished ip_route Discovery on {} with {} entries'.format(dev.host_name, len(self.report.duts[i].network.layer3.routes)))
+
+        # need to get device instance to get the data from
+        # all the duts are discovered concurrently
+        await asyncio.gather(*[discover_dut(i, dut) for i, dut in enumerate(self.report.duts) if dut.device_id])
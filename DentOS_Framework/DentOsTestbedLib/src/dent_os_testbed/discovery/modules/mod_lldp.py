@@ -4,6 +4,7 @@
 #
 # DONOT EDIT - generated by diligent bots
 
+import asyncio
 from dent_os_testbed.discovery.Module import Module
 from dent_os_testbed.lib.lldp.lldp import Lldp
 
@@ -25,15 +26,11 @@ class LldpMod(Module):
                 dst[i].remote_interface = lldp.get('remote_interface')
 
     async def discover(self):
-        # need to get device instance to get the data from
-        #
-        for i, dut in enumerate(self.report.duts):
-            if not dut.device_id:
-                continue
+        async def discover_dut(i, dut):
             dev = self.ctx.devices_dict[dut.device_id]
-            if dev.os == 'ixnetwork' or not await dev.is_connected():
+            if dev.os == 'ixnetwork' or not await self.is_connected(dev):
                 print('Device not connected skipping lldp discovery')
-                continue
+                return
             print('Running lldp Discovery on ' + dev.host_name)
             out = await Lldp.show(
                 input_data=[{dev.host_name: [{'dut_discovery': True}]}],
@@ -43,10 +40,14 @@ class LldpMod(Module):
             if out[0][dev.host_name]['rc'] != 0:
                 print(out)
                 print('Failed to get lldp')
-                continue
+                return
             if 'parsed_output' not in out[0][dev.host_name]:
                 print('Failed to get parsed_output lldp')
                 print(out)
-                continue
+                return
             self.set_lldp(out[0][dev.host_name]['parsed_output'], self.report.duts[i].platform.lldp.interfaces)
             print('Finished lldp Discovery on {} with {} entries'.format(dev.host_name, len(self.report.duts[i].platform.lldp.interfaces)))
+
+        # need to get device instance to get the data from
+        # all the duts are discovered concurrently
+        await asyncio.gather(*[discover_dut(i, dut) for i, dut in enumerate(self.report.duts) if dut.device_id])
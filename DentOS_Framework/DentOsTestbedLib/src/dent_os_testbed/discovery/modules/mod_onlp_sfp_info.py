@@ -4,6 +4,7 @@
 #
 # DONOT EDIT - generated by diligent bots
 
+import asyncio
 from dent_os_testbed.discovery.Module import Module
 from dent_os_testbed.lib.onlp.onlp_sfp_info import OnlpSfpInfo
 
@@ -33,15 +34,11 @@ class OnlpSfpInfoMod(Module):
                 dst[i].serial_number = onlp_sfp_info.get('serial_number')
 
     async def discover(self):
-        # need to get device instance to get the data from
-        #
-        for i, dut in enumerate(self.report.duts):
-            if not dut.device_id:
-                continue
+        async def discover_dut(i, dut):
             dev = self.ctx.devices_dict[dut.device_id]
-            if dev.os == 'ixnetwork' or not await dev.is_connected():
+            if dev.os == 'ixnetwork' or not await self.is_connected(dev):
                 print('Device not connected skipping onlp_sfp_info discovery')
-                continue
+                return
             print('Running onlp_sfp_info Discovery on ' + dev.host_name)
             out = await OnlpSfpInfo.show(
                 input_data=[{dev.host_name: [{'dut_discovery': True}]}],
@@ -51,10 +48,14 @@ class OnlpSfpInfoMod(Module):
             if out[0][dev.host_name]['rc'] != 0:
                 print(out)
                 print('Failed to get onlp_sfp_info')
-                continue
+                return
             if 'parsed_output' not in out[0][dev.host_name]:
                 print('Failed to get parsed_output onlp_sfp_info')
                 print(out)
-                continue
+                return
             self.set_onlp_sfp_info(out[0][dev.host_name]['parsed_output'], self.report.duts[i].platform.onlp.sfps)
             print('Finished onlp_sfp_info Discovery on {} with {} entries'.format(dev.host_name, len(self.report.duts[i].platform.onlp.sfps)))
+
+        # need to get device instance to get the data from
+        # all the duts are discovered concurrently
+        await asyncio.gather(*[discover_dut(i, dut) for i, dut in enumerate(self.report.duts) if dut.device_id])
@@ -4,6 +4,7 @@
 #
 # DONOT EDIT - generated by diligent bots
 
+import asyncio
 from dent_os_testbed.discovery.Module import Module
 from dent_os_testbed.lib.os.process import Process
 
@@ -39,15 +40,11 @@ class ProcessMod(Module):
                 dst[i].memory_utilization = process.get('memory_utilization')
 
     async def discover(self):
-        # need to get device instance to get the data from
-        #
-        for i, dut in enumerate(self.report.duts):
-            if not dut.device_id:
-                continue
+        async def discover_dut(i, dut):
             dev = self.ctx.devices_dict[dut.device_id]
-            if dev.os == 'ixnetwork' or not await dev.is_connected():
+            if dev.os == 'ixnetwork' or not await self.is_connected(dev):
                 print('Device not connected skipping process discovery')
-                continue
+                return
             print('Running process Discovery on ' + dev.host_name)
             out = await Process.show(
                 input_data=[{dev.host_name: [{'dut_discovery': True}]}],
@@ -57,10 +54,14 @@ class ProcessMod(Module):
             if out[0][dev.host_name]['rc'] != 0:
                 print(out)
                 print('Failed to get process')
-                continue
+                return
             if 'parsed_output' not in out[0][dev.host_name]:
                 print('Failed to get parsed_output process')
                 print(out)
-                continue
+                return
             self.set_process(out[0][dev.host_name]['parsed_output'], self.report.duts[i].system.os.processes)
             print('Finished process Discovery on {} with {} entries'.format(dev.host_name, len(self.report.duts[i].system.os.processes)))
+
+        # need to get device instance to get the data from
+        # all the duts are discovered concurrently
+        await asyncio.gather(*[discover_dut(i, dut) for i, dut in enumerate(self.report.duts) if dut.device_id])
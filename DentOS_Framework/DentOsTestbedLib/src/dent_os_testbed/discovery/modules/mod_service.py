@@ -4,6 +4,7 @@
 #
 # DONOT EDIT - generated by diligent bots
 
+import asyncio
 from dent_os_testbed.discovery.Module import Module
 from dent_os_testbed.lib.os.service import Service
 
@@ -27,15 +28,11 @@ class ServiceMod(Module):
                 dst[i].description = service.get('description')
 
     async def discover(self):
-        # need to get device instance to get the data from
-        #
-        for i, dut in enumerate(self.report.duts):
-            if not dut.device_id:
-                continue
+        async def discover_dut(i, dut):
             dev = self.ctx.devices_dict[dut.device_id]
-            if dev.os == 'ixnetwork' or not await dev.is_connected():
+            if dev.os == 'ixnetwork' or not await self.is_connected(dev):
                 print('Device not connected skipping service discovery')
-                continue
+                return
             print('Running service Discovery on ' + dev.host_name)
             out = await Service.show(
                 input_data=[{dev.host_name: [{'dut_discovery': True}]}],
@@ -45,10 +42,14 @@ class ServiceMod(Module):
             if out[0][dev.host_name]['rc'] != 0:
                 print(out)
                 print('Failed to get service')
-                continue
+                return
             if 'parsed_output' not in out[0][dev.host_name]:
                 print('Failed to get parsed_output service')
                 print(out)
-                continue
+                return
             self.set_service(out[0][dev.host_name]['parsed_output'], self.report.duts[i].system.os.services)
             print('Finished service Discovery on {} with {} entries'.format(dev.host_name, len(self.report.duts[i].system.os.services)))
+
+        # need to get device instance to get the data from
+        # all the duts are discovered concurrently
+        await asyncio.gather(*[discover_dut(i, dut) for i, dut in enumerate(self.report.duts) if dut.device_id])
@@ -4,6 +4,7 @@
 #
 # DONOT EDIT - generated by diligent bots
 
+import asyncio
 import pytest
 from dent_os_testbed.lib.test_lib_object import TestLibObject
 from dent_os_testbed.lib.bridge.linux.linux_bridge_link_impl import LinuxBridgeLinkImpl
@@ -16,8 +17,32 @@ class BridgeLink(TestLibObject):
 
     """
     async def _run_command(api, *argv, **kwarg):
+        async def run_device(device, device_name, device_obj, impl_obj, commands, batch_input, device_result):
+            async with semaphore:
+                try:
+                    cached = impl_obj.cache_get(device_name, api, commands, kwarg)
+                    if cached:
+                        rc, output = cached
+                    else:
+                        rc, output = await device_obj.run_cmd(('sudo ' if device_obj.ssh_conn_params.pssh else '') + commands, input=batch_input)
+                        impl_obj.cache_update(device_name, api, commands, rc, output, kwarg)
+                    device_result[device_name]['rc'] = rc
+                    device_result[device_name]['result'] = output
+                    if batch_input is not None:
+                        # map the failed batch lines back to the input entries
+                        device_result[device_name]['batch_errors'] = impl_obj.parse_batch_errors(output)
+                    if 'parse_output' in kwarg:
+                        parse_output = impl_obj.parse_output(command=api, output=output, commands=commands,
+                                                             fields=kwarg.get('parse_fields'), lazy=kwarg.get('parse_lazy', False))
+                        device_result[device_name]['parsed_output'] = parse_output
+                except Exception as e:
+                    device_result[device_name]['rc'] = -1
+                    device_result[device_name]['result'] = str(e)
+
         devices = kwarg['input_data']
+        semaphore = asyncio.Semaphore(kwarg.get('max_concurrency', TestLibObject.MAX_CONCURRENCY))
         result = list()
+        jobs = list()
         for device in devices:
             for device_name in device:
                 device_result = {
@@ -30,33 +55,30 @@ class BridgeLink(TestLibObject):
                     if device_name not in pytest.testbed.devices_dict:
                         device_result[device_name] = 'No matching device ' + device_name
                         result.append(device_result)
+                        await asyncio.gather(*jobs)
                         return result
                     device_obj = pytest.testbed.devices_dict[device_name]
                 commands = ''
                 if device_obj.os in ['dentos', 'cumulus']:
                     impl_obj = LinuxBridgeLinkImpl()
-                    for command in device[device_name]:
-                        commands += impl_obj.format_command(command=api, params=command)
-                        commands += '&& '
-                    commands = commands[:-3]
+                    batch = impl_obj.format_batch(command=api, params=device[device_name]) if kwarg.get('batch', False) else None
+                    if batch:
+                        commands, batch_input = batch
+                    else:
+                        batch_input = None
+                        commands = '&& '.join(impl_obj.format_many(command=api, params_list=device[device_name]))
 
                 else:
                     device_result[device_name]['rc'] = -1
                     device_result[device_name]['result'] = 'No matching device OS ' + device_obj.os
                     result.append(device_result)
+                    await asyncio.gather(*jobs)
                     return result
                 device_result[device_name]['command'] = commands
-                try:
-                    rc, output = await device_obj.run_cmd(('sudo ' if device_obj.ssh_conn_params.pssh else '') + commands)
-                    device_result[device_name]['rc'] = rc
-                    device_result[device_name]['result'] = output
-                    if 'parse_output' in kwarg:
-                        parse_output = impl_obj.parse_output(command=api, output=output, commands=commands)
-                        device_result[device_name]['parsed_output'] = parse_output
-                except Exception as e:
-                    device_result[device_name]['rc'] = -1
-                    device_result[device_name]['result'] = str(e)
                 result.append(device_result)
+                jobs.append(run_device(device, device_name, device_obj, impl_obj, commands, batch_input, device_result))
+        # run the devices concurrently, the results keep the input_data order
+        await asyncio.gather(*jobs)
         return result
 
     async def set(*argv, **kwarg):
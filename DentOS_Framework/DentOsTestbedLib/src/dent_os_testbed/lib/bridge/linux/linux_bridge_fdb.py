@@ -25,6 +25,12 @@ class LinuxBridgeFdb(TestLibObject):
     def parse_show(self, command, output, *argv, **kwarg):
         raise NotImplementedError
 
+    def format_query(self, command, *argv, **kwarg):
+        raise NotImplementedError
+
+    def parse_query(self, command, output, *argv, **kwarg):
+        raise NotImplementedError
+
     def format_command(self, command, *argv, **kwarg):
         if command in ['add', 'append', 'delete', 'replace']:
             return self.format_update(command, *argv, **kwarg)
@@ -32,6 +38,9 @@ class LinuxBridgeFdb(TestLibObject):
         if command in ['show']:
             return self.format_show(command, *argv, **kwarg)
 
+        if command in ['count', 'select']:
+            return self.format_query(command, *argv, **kwarg)
+
         raise NameError('Cannot find command '+command)
 
     def parse_output(self, command, output, *argv, **kwarg):
@@ -41,4 +50,7 @@ class LinuxBridgeFdb(TestLibObject):
         if command in ['show']:
             return self.parse_show(command, output, *argv, **kwarg)
 
+        if command in ['count', 'select']:
+            return self.parse_query(command, output, *argv, **kwarg)
+
         raise NameError('Cannot find command '+command)
@@ -1,5 +1,5 @@
-import json
 from dent_os_testbed.lib.bridge.linux.linux_bridge_fdb import LinuxBridgeFdb
+from dent_os_testbed.lib.table_query import TableQuery
 
 
 class LinuxBridgeFdbImpl(LinuxBridgeFdb):
@@ -8,6 +8,8 @@ class LinuxBridgeFdbImpl(LinuxBridgeFdb):
 
     """
 
+    QUERY = TableQuery('mac')
+
     def format_update(self, command, *argv, **kwarg):
         """
         bridge fdb { add | append | del | replace } LLADDR dev DEV { local | static | dynamic } [ self ]
@@ -62,7 +64,24 @@ class LinuxBridgeFdbImpl(LinuxBridgeFdb):
         # TODO: Implement me
         if 'device' in params:
             cmd += 'dev {} '.format(params.get('device', ''))
+        for selector in ['br', 'brport', 'vlan', 'state']:
+            if selector in params:
+                cmd += '{} {} '.format(selector, params[selector])
         return cmd
 
     def parse_show(self, command, output, *argv, **kwarg):
-        return json.loads(output)
+        return self.parse_json(output, *argv, **kwarg)
+
+    def format_query(self, command, *argv, **kwarg):
+        """
+        Count/Select the fdb entries of bridge fdb show matching where on the device
+        bridge fdb [ show ] [ dev DEV ] [ br BRDEV ] [ brport DEV ] [ vlan VID ] [ state STATE ] | awk QUERY
+
+        """
+        params = kwarg['params']
+        show = {k: v for k, v in params.items() if k not in ('where', 'fields')}
+        cmd = self.format_show('show', params=show)
+        return self.QUERY.pipeline(cmd, command == 'count', params.get('where'), params.get('fields'))
+
+    def parse_query(self, command, output, *argv, **kwarg):
+        return self.QUERY.parse(output)
@@ -1,5 +1,3 @@
-import json
-
 from dent_os_testbed.lib.bridge.linux.linux_bridge_link import LinuxBridgeLink
 
 
@@ -60,4 +58,4 @@ class LinuxBridgeLinkImpl(LinuxBridgeLink):
         return cmd
 
     def parse_show(self, command, output, *argv, **kwarg):
-        return json.loads(output)
+        return self.parse_json(output, *argv, **kwarg)
@@ -1,5 +1,3 @@
-import json
-
 from dent_os_testbed.lib.bridge.linux.linux_bridge_mdb import LinuxBridgeMdb
 
 
@@ -41,4 +39,4 @@ class LinuxBridgeMdbImpl(LinuxBridgeMdb):
         return cmd
 
     def parse_show(self, command, output, *argv, **kwarg):
-        return json.loads(output)
+        return self.parse_json(output, *argv, **kwarg)
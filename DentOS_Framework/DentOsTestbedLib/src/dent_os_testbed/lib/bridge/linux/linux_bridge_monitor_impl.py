@@ -1,4 +1,5 @@
 from dent_os_testbed.lib.bridge.linux.linux_bridge_monitor import LinuxBridgeMonitor
+from dent_os_testbed.utils.netlink_monitor import NetlinkParser
 
 
 class LinuxBridgeMonitorImpl(LinuxBridgeMonitor):
@@ -8,8 +9,15 @@ class LinuxBridgeMonitorImpl(LinuxBridgeMonitor):
         """
         bridge monitor [ all | neigh | link | mdb ]
 
+        The monitor never exits, pass e.g. 'options': 'fdb & sleep 5; kill $!' to bound it,
+        use dent_os_testbed.utils.netlink_monitor.NetlinkMonitor to follow the events.
         """
-        cmd = 'bridge monitor {} '.format(command)
-        # TODO: Implement me
-
+        params = kwarg['params']
+        cmd = 'bridge {} '.format(command)
+        # custom code here
+        cmd += '{} '.format(params.get('options', 'all'))
         return cmd
+
+    def parse_monitor(self, command, output, *argv, **kwarg):
+        parser = NetlinkParser('bridge')
+        return [event for event in map(parser.parse, output.splitlines()) if event]
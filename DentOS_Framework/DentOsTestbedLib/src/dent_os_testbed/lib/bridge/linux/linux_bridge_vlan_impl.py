@@ -1,5 +1,3 @@
-import json
-
 from dent_os_testbed.lib.bridge.linux.linux_bridge_vlan import LinuxBridgeVlan
 
 
@@ -46,4 +44,4 @@ class LinuxBridgeVlanImpl(LinuxBridgeVlan):
         return cmd
 
     def parse_show(self, command, output, *argv, **kwarg):
-        return json.loads(output)
+        return self.parse_json(output, *argv, **kwarg)
@@ -0,0 +1,107 @@
+import string
+
+
+class CommandFormatter(object):
+    """
+    Table driven formatter of a command, the generated classes compile one per
+    command from the format table of the command in the yaml model, e.g.
+
+      format:
+        prefix: 'ip {cmd_options} route {command}'
+        fields: ['dst={}', 'protocol=proto {}', 'metric', 'nexthop[via,dev,weight]=nexthop']
+
+    the prefix takes the command and any param ({name}, empty when missing), the
+    fields are rendered in order for the params that are present:
+      name                      -> 'name <value>'
+      name=template             -> template.format(value), e.g. 'proto {}' or '{}'
+      name[sub,...]=template    -> for each entry of a list of dicts, template followed
+                                   by 'sub <value>' for the sub keys present
+      name{}=template           -> template followed by '<key> <value>' for each
+                                   item of a dict
+      name{key,...}=template    -> for each of the keys in the value (dict or list),
+                                   template followed by the key and by '<k> <v>' for
+                                   each item when the key maps to a dict
+    """
+
+    def __init__(self, prefix, fields):
+        self.prefix = prefix
+        self.fields = list(fields)
+        # the table is compiled to a straight line function, one membership test
+        # per field and a single join, instead of interpreting it for every entry
+        lines = ['def format(command, params):', '    parts = []', '    append = parts.append']
+        for literal, name, _, _ in string.Formatter().parse(prefix):
+            for token in literal.split():
+                lines.append('    append({!r})'.format(token))
+            if name == 'command':
+                lines.append('    append(command)')
+            elif name is not None:
+                lines.append('    if params.get({!r}, \'\'):'.format(name))
+                lines.append('        append(str(params[{!r}]))'.format(name))
+        namespace = {}
+        for idx, field in enumerate(self.fields):
+            name, render = CommandFormatter._compile(field)
+            lines.append('    if {!r} in params:'.format(name))
+            if isinstance(render, str):
+                lines.append('        append({!r} % (params[{!r}],))'.format(render, name))
+            else:
+                namespace[f'render{idx}'] = render
+                lines.append('        append(render{}(params[{!r}]))'.format(idx, name))
+        lines.append("    return ' '.join([part for part in parts if part] + [''])")
+        exec('\n'.join(lines), namespace)
+        self.format = namespace['format']
+
+    @staticmethod
+    def _compile(field):
+        spec, _, template = field.partition('=')
+        if spec.endswith(']'):
+            name, subs = spec[:-1].split('[')
+            subs = [(sub, sub + ' {}') for sub in subs.split(',')]
+            template = template or name
+
+            def render(value):
+                parts = []
+                for entry in value:
+                    parts.append(template)
+                    parts.extend(fmt.format(entry[sub]) for sub, fmt in subs if sub in entry)
+                return ' '.join(parts)
+
+        elif spec.endswith('{}'):
+            name = spec[:-2]
+            template = template or name
+
+            def render(value):
+                if not isinstance(value, dict):
+                    return ''
+                return ' '.join([template] + ['{} {}'.format(k, v) for k, v in value.items()])
+
+        elif spec.endswith('}'):
+            name, keys = spec[:-1].split('{')
+            keys = keys.split(',')
+            template = template or name
+
+            def render(value):
+                parts = []
+                for key in keys:
+                    if key not in value:
+                        continue
+                    parts.append('{} {}'.format(template, key))
+                    sub = value[key] if isinstance(value, dict) else None
+                    if isinstance(sub, dict):
+                        parts.extend('{} {}'.format(k, v) for k, v in sub.items())
+                return ' '.join(parts)
+
+        else:
+            # a %-template inlined in the compiled function
+            name = spec
+            render = (template or name + ' {}').replace('%', '%%').replace('{}', '%s')
+        return name, render
+
+    def format_many(self, command, params_list):
+        """
+        Format the command for each params of params_list
+
+        Returns:
+            list of the commands
+        """
+        fmt = self.format
+        return [fmt(command, params) for params in params_list]
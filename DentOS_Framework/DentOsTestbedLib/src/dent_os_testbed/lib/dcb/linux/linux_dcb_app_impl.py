@@ -1,4 +1,3 @@
-import json
 from dent_os_testbed.lib.dcb.linux.linux_dcb_app import LinuxDcbApp
 
 
@@ -64,4 +63,4 @@ class LinuxDcbAppImpl(LinuxDcbApp):
                 port-prio ] [ dscp-prio ]
 
         """
-        return json.loads(output)
+        return self.parse_json(output, *argv, **kwarg)
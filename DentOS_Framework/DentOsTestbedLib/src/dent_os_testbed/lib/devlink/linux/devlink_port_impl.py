@@ -1,5 +1,3 @@
-import json
-
 from dent_os_testbed.lib.devlink.linux.devlink_port import DevlinkPort
 
 
@@ -58,4 +56,4 @@ class DevlinkPortImpl(DevlinkPort):
         """
         devlink port param show [ DEV/PORT_INDEX name PARAMETER ]
         """
-        return json.loads(output)
+        return self.parse_json(output, *argv, **kwarg)
@@ -1,5 +1,3 @@
-import json
-
 from dent_os_testbed.lib.ip.linux.linux_ip_address import LinuxIpAddress
 
 
@@ -159,4 +157,4 @@ class LinuxIpAddressImpl(LinuxIpAddress):
         return cmd
 
     def parse_show(self, command, output, *argv, **kwarg):
-        return json.loads(output)
+        return self.parse_json(output, *argv, **kwarg)
@@ -1,5 +1,3 @@
-import json
-
 from dent_os_testbed.lib.ip.linux.linux_ip_link import LinuxIpLink
 
 
@@ -185,4 +183,4 @@ class LinuxIpLinkImpl(LinuxIpLink):
         return cmd
 
     def parse_show(self, command, output, *argv, **kwarg):
-        return json.loads(output)
+        return self.parse_json(output, *argv, **kwarg)
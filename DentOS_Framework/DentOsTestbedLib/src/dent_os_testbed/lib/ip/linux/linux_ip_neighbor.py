@@ -4,6 +4,7 @@
 #
 # DONOT EDIT - generated by diligent bots
 
+from dent_os_testbed.lib.command_formatter import CommandFormatter
 from dent_os_testbed.lib.test_lib_object import TestLibObject
 
 
@@ -16,18 +17,54 @@ class LinuxIpNeighbor(TestLibObject):
 
     """
 
+    FORMAT_MODIFY = CommandFormatter(
+        'ip neigh {command}',
+        [
+            'address={}',
+            'lladdr',
+            'nud',
+            'proxy',
+            'dev',
+        ],
+    )
+
+    FORMAT_SHOW = CommandFormatter(
+        'ip {cmd_options} neigh {command}',
+        [
+            'proxy={}',
+            'address=to {}',
+            'device=dev {}',
+            'nud',
+        ],
+    )
+
+    FORMATTERS = {
+        'add': FORMAT_MODIFY,
+        'delete': FORMAT_MODIFY,
+        'change': FORMAT_MODIFY,
+        'replace': FORMAT_MODIFY,
+        'show': FORMAT_SHOW,
+        'flush': FORMAT_SHOW,
+    }
+
     def format_modify(self, command, *argv, **kwarg):
-        raise NotImplementedError
+        return self.FORMAT_MODIFY.format(command, kwarg['params'])
 
     def parse_modify(self, command, output, *argv, **kwarg):
         raise NotImplementedError
 
     def format_show(self, command, *argv, **kwarg):
-        raise NotImplementedError
+        return self.FORMAT_SHOW.format(command, kwarg['params'])
 
     def parse_show(self, command, output, *argv, **kwarg):
         raise NotImplementedError
 
+    def format_query(self, command, *argv, **kwarg):
+        raise NotImplementedError
+
+    def parse_query(self, command, output, *argv, **kwarg):
+        raise NotImplementedError
+
     def format_command(self, command, *argv, **kwarg):
         if command in ['add', 'delete', 'change', 'replace']:
             return self.format_modify(command, *argv, **kwarg)
@@ -35,6 +72,9 @@ class LinuxIpNeighbor(TestLibObject):
         if command in ['show', 'flush']:
             return self.format_show(command, *argv, **kwarg)
 
+        if command in ['count', 'select']:
+            return self.format_query(command, *argv, **kwarg)
+
         raise NameError('Cannot find command '+command)
 
     def parse_output(self, command, output, *argv, **kwarg):
@@ -44,4 +84,7 @@ class LinuxIpNeighbor(TestLibObject):
         if command in ['show', 'flush']:
             return self.parse_show(command, output, *argv, **kwarg)
 
+        if command in ['count', 'select']:
+            return self.parse_query(command, output, *argv, **kwarg)
+
         raise NameError('Cannot find command '+command)
@@ -1,49 +1,24 @@
-import json
-
 from dent_os_testbed.lib.ip.linux.linux_ip_neighbor import LinuxIpNeighbor
+from dent_os_testbed.lib.table_query import TableQuery
 
 
 class LinuxIpNeighborImpl(LinuxIpNeighbor):
-    def format_modify(self, command, *argv, **kwarg):
-        """
-        ip neigh { add | del | change | replace } { ADDR [ lladdr LLADDR ]
-                 [ nud { permanent | noarp | stale | reachable } ] | proxy ADDR } [ dev DEV ]
-
-        """
-        params = kwarg['params']
-        cmd = 'ip neigh {} '.format(command)
-        # custom code here
-        if 'address' in params:
-            cmd += '{} '.format(params['address'])
-        if 'lladdr' in params:
-            cmd += 'lladdr {} '.format(params['lladdr'])
-        if 'nud' in params:
-            cmd += 'nud {} '.format(params['nud'])
-        if 'proxy' in params:
-            cmd += 'proxy {} '.format(params['proxy'])
-        if 'dev' in params:
-            cmd += 'dev {} '.format(params['dev'])
+    # the neighbors end with their state, e.g. REACHABLE
+    QUERY = TableQuery('dst', trailing='state')
 
-        return cmd
+    def parse_show(self, command, output, *argv, **kwarg):
+        return self.parse_json(output, *argv, **kwarg)
 
-    def format_show(self, command, *argv, **kwarg):
+    def format_query(self, command, *argv, **kwarg):
         """
-        ip neigh { show | flush } [ proxy ] [ to PREFIX ] [ dev DEV ] [ nud STATE ]
+        Count/Select the neighbors of ip neigh show matching where on the device
+        ip neigh show [ proxy ] [ to PREFIX ] [ dev DEV ] [ nud STATE ] | awk QUERY
 
         """
         params = kwarg['params']
-        cmd = 'ip {} neigh {} '.format(params.get('cmd_options', ''), command)
-        # custom code here
-        if 'proxy' in params:
-            cmd += '{} '.format(params['proxy'])
-        if 'address' in params:
-            cmd += 'to {} '.format(params['address'])
-        if 'device' in params:
-            cmd += 'dev {} '.format(params['device'])
-        if 'nud' in params:
-            cmd += 'nud {} '.format(params['nud'])
+        show = {k: v for k, v in params.items() if k not in ('where', 'fields')}
+        cmd = self.format_show('show', params=show)
+        return self.QUERY.pipeline(cmd, command == 'count', params.get('where'), params.get('fields'))
 
-        return cmd
-
-    def parse_show(self, command, output, *argv, **kwarg):
-        return json.loads(output)
+    def parse_query(self, command, output, *argv, **kwarg):
+        return self.QUERY.parse(output)
@@ -4,6 +4,7 @@
 #
 # DONOT EDIT - generated by diligent bots
 
+from dent_os_testbed.lib.command_formatter import CommandFormatter
 from dent_os_testbed.lib.test_lib_object import TestLibObject
 
 
@@ -45,26 +46,105 @@ class LinuxIpRoute(TestLibObject):
 
     """
 
+    FORMAT_UPDATE = CommandFormatter(
+        'ip {cmd_options} route {command}',
+        [
+            'table',
+            'vrf',
+            'type={}',
+            'dst={}',
+            'tos',
+            'protocol=proto {}',
+            'scope',
+            'metric',
+            'nexthop[via,dev,weight]=nexthop',
+            'via',
+            'dev',
+            'weight',
+            'nhflags={}',
+            'mtu',
+            'advmss',
+            'rtt',
+            'rttvar',
+            'reordering',
+            'window',
+            'cwnd',
+            'ssthresh',
+            'realms',
+            'rto_min',
+            'initcwnd',
+            'initrwnd',
+            'quickack',
+            'congctl',
+            'features',
+            'src',
+            'hoplimit',
+            'pref',
+            'expires',
+            'table_id={}',
+        ],
+    )
+
+    FORMAT_GET = CommandFormatter(
+        'ip route {command}',
+        [
+            'dst={}',
+            'from',
+            'iif',
+            'oif',
+            'tos',
+        ],
+    )
+
+    FORMAT_RESTORE = CommandFormatter(
+        'ip {cmd_options} route {command}',
+        [],
+    )
+
+    FORMAT_SAVE = CommandFormatter(
+        'ip {cmd_options} route {command}',
+        [
+            'root',
+            'match',
+            'exact',
+            'table',
+            'proto',
+            'type',
+            'scope',
+        ],
+    )
+
+    FORMATTERS = {
+        'add': FORMAT_UPDATE,
+        'delete': FORMAT_UPDATE,
+        'change': FORMAT_UPDATE,
+        'append': FORMAT_UPDATE,
+        'replace': FORMAT_UPDATE,
+        'get': FORMAT_GET,
+        'restore': FORMAT_RESTORE,
+        'save': FORMAT_SAVE,
+    }
+
     def format_update(self, command, *argv, **kwarg):
-        raise NotImplementedError
+        return self.FORMAT_UPDATE.format(command, kwarg['params'])
 
     def parse_update(self, command, output, *argv, **kwarg):
         raise NotImplementedError
 
     def format_get(self, command, *argv, **kwarg):
-        raise NotImplementedError
+        return self.FORMAT_GET.format(command, kwarg['params'])
 
     def parse_get(self, command, output, *argv, **kwarg):
         raise NotImplementedError
 
     def format_restore(self, command, *argv, **kwarg):
-        raise NotImplementedError
+        return self.FORMAT_RESTORE.format(command, kwarg['params'])
 
     def parse_restore(self, command, output, *argv, **kwarg):
         raise NotImplementedError
 
     def format_save(self, command, *argv, **kwarg):
-        raise NotImplementedError
+        return self.FORMAT_SAVE.format(command, kwarg['params'])
 
     def parse_save(self, command, output, *argv, **kwarg):
         raise NotImplementedError
@@ -75,6 +155,12 @@ class LinuxIpRoute(TestLibObject):
     def parse_show(self, command, output, *argv, **kwarg):
         raise NotImplementedError
 
+    def format_query(self, command, *argv, **kwarg):
+        raise NotImplementedError
+
+    def parse_query(self, command, output, *argv, **kwarg):
+        raise NotImplementedError
+
     def format_command(self, command, *argv, **kwarg):
         if command in ['add', 'delete', 'change', 'append', 'replace']:
             return self.format_update(command, *argv, **kwarg)
@@ -91,6 +177,9 @@ class LinuxIpRoute(TestLibObject):
         if command in ['show', 'flush']:
             return self.format_show(command, *argv, **kwarg)
 
+        if command in ['count', 'select']:
+            return self.format_query(command, *argv, **kwarg)
+
         raise NameError('Cannot find command '+command)
 
     def parse_output(self, command, output, *argv, **kwarg):
@@ -109,4 +198,7 @@ class LinuxIpRoute(TestLibObject):
         if command in ['show', 'flush']:
             return self.parse_show(command, output, *argv, **kwarg)
 
+        if command in ['count', 'select']:
+            return self.parse_query(command, output, *argv, **kwarg)
+
         raise NameError('Cannot find command '+command)
@@ -0,0 +1,94 @@
+import json
+
+# the fastest decoder installed, orjson and pysimdjson are optional
+try:
+    import orjson
+
+    def json_loads(text):
+        return orjson.loads(text)
+
+    JSON_DECODER = 'orjson'
+except ImportError:
+    try:
+        import simdjson
+
+        def json_loads(text):
+            return simdjson.loads(text)
+
+        JSON_DECODER = 'simdjson'
+    except ImportError:
+        json_loads = json.loads
+        JSON_DECODER = 'json'
+
+_WHITESPACE = ' \t\n\r'
+
+
+def json_project(entry, fields):
+    """
+    Keep the given fields of a decoded entry, the missing ones are left out
+    """
+    if not isinstance(entry, dict):
+        return entry
+    return {field: entry[field] for field in fields if field in entry}
+
+
+def json_iter(text, fields=None):
+    """
+    Decode the entries of a top level JSON array one at a time, e.g. the output of
+    'ip -j route show', so only the entry being decoded is held besides the text.
+
+    Args:
+        text (str): JSON array
+        fields (list): Keep only these fields of the entries
+
+    Yields:
+        the entries of the array
+
+    Raises:
+        ValueError: If the text is not a JSON array
+    """
+    decoder = json.JSONDecoder()
+    end = len(text)
+    idx = _skip(text, 0)
+    if idx >= end or text[idx] != '[':
+        raise ValueError('Expecting a JSON array')
+    idx = _skip(text, idx + 1)
+    if idx < end and text[idx] == ']':
+        return
+    while True:
+        entry, idx = decoder.raw_decode(text, idx)
+        yield json_project(entry, fields) if fields else entry
+        idx = _skip(text, idx)
+        if idx < end and text[idx] == ',':
+            idx = _skip(text, idx + 1)
+        elif idx < end and text[idx] == ']':
+            return
+        else:
+            raise ValueError(f'Expecting , or ] at {idx}')
+
+
+def _skip(text, idx):
+    while idx < len(text) and text[idx] in _WHITESPACE:
+        idx += 1
+    return idx
+
+
+def json_parse(text, fields=None, lazy=False):
+    """
+    Decode the JSON output of a command
+
+    Args:
+        text (str): JSON document
+        fields (list): Keep only these fields of the entries of a top level array
+        lazy (bool): Return a generator over the entries of a top level array
+
+    Returns:
+        the decoded document, the projected list or the generator of the entries
+    """
+    if lazy:
+        return json_iter(text, fields)
+    if fields and text.startswith('[', _skip(text, 0)):
+        # only the projected entries are kept, the full ones are dropped one by one,
+        # which also beats a full decode with the fast decoders on large tables
+        return list(json_iter(text, fields))
+    return json_loads(text)
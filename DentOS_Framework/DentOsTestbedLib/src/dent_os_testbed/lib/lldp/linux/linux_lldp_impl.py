@@ -136,4 +136,4 @@ class LinuxLldpImpl(LinuxLldp):
         -f format   Choose output format (plain, keyvalue, json, json0, xml).
         see manual page lldpcli(8) for more information
         """
-        return json.loads(output)
+        return self.parse_json(output, *argv, **kwarg)
@@ -1,5 +1,4 @@
 from dent_os_testbed.lib.mstpctl.linux.linux_mstpctl import LinuxMstpctl
-import json
 
 
 class LinuxMstpctlImpl(LinuxMstpctl):
@@ -39,7 +38,7 @@ class LinuxMstpctlImpl(LinuxMstpctl):
         return cmd
 
     def parse_show(self, command, output, *argv, **kwarg):
-        return json.loads(output)
+        return self.parse_json(output, *argv, **kwarg)
 
     def format_remove(self, command, *argv, **kwarg):
         """
@@ -47,7 +47,7 @@ class LinuxPoectlImpl(LinuxPoectl):
         return cmd + ' 2> /dev/null'
 
     def parse_modify(self, command, output, *argv, **kwarg):
-        return json.loads(output)
+        return self.parse_json(output, *argv, **kwarg)
 
     def format_persist(self, command, *argv, **kwarg):
         """
@@ -62,4 +62,4 @@ class LinuxPoectlImpl(LinuxPoectl):
         return cmd
 
     def parse_persist(self, command, output, *argv, **kwarg):
-        return json.loads(output)
+        return self.parse_json(output, *argv, **kwarg)
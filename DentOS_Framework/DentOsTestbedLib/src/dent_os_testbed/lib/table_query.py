@@ -0,0 +1,168 @@
+import re
+import shlex
+
+# the awk helpers shared by the programs, t[1..n] are the words of the entry and
+# t[s] its key, the (key, value) pairs and the flags follow the key
+_HELPERS = '''\
+function get(k,   i) { for (i = s + 1; i < n; i++) if (t[i] == k) return t[i + 1]; return "" }
+function has(k, v,   i) { for (i = s + 1; i < n; i++) if (t[i] == k && t[i + 1] == v) return 1; return 0 }
+function like(k, r,   i) { for (i = s + 1; i < n; i++) if (t[i] == k && t[i + 1] ~ r) return 1; return 0 }
+function flag(k,   i) { for (i = s + 1; i <= n; i++) if (t[i] == k) return 1; return 0 }
+'''
+
+
+def _awk_str(value):
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+class TableQuery(object):
+    """
+    Compiles a count or a select over the text output of a show command (ip route,
+    ip neigh, bridge fdb) to an awk program run on the device right after the
+    command, so only the count or the selected fields of the matching entries are
+    sent back instead of the whole table.
+
+    An entry is a line of the output and its indented continuation lines (e.g. the
+    nexthops of a multipath route), its first word is the key field and the words
+    that follow are '<name> <value>' pairs and flags, e.g. for the key 'mac':
+
+      00:11:22:33:44:55 dev swp1 vlan 10 master br0 extern_learn offload
+
+    so the fields are named after the words of the text output (e.g. proto for the
+    routes, not protocol).
+    where is a dict of field -> condition, all of them have to match:
+      'value' or 10          -> the field has this value
+      re.compile('ERE')      -> the value of the field matches the POSIX extended regex
+      True / False           -> the flag (or the field) is present / absent
+      ['value', ...]         -> the field has any of these values
+    """
+
+    def __init__(self, key, leading=None, trailing=None):
+        """
+        Args:
+            key (str): Name of the first word of the entries
+            leading (tuple): (name, words, default) of an optional word before the key,
+                e.g. the type of the routes
+            trailing (str): Name of the last word of the entries when it is upper case,
+                e.g. the state of the neighbors
+        """
+        self.key = key
+        self.leading = leading
+        self.trailing = trailing
+
+    def _value(self, field):
+        if field == self.key:
+            return 'key'
+        if self.leading and field == self.leading[0]:
+            return 'lead'
+        if field == self.trailing:
+            return 'tail'
+        return 'get({})'.format(_awk_str(field))
+
+    def _condition(self, field, value):
+        if isinstance(value, (list, tuple, set)):
+            return '(' + (' || '.join(self._condition(field, v) for v in value) or '0') + ')'
+        positional = self._value(field)
+        if not positional.startswith('get('):
+            if value is True:
+                return '{} != ""'.format(positional)
+            if value is False or value is None:
+                return '{} == ""'.format(positional)
+            if isinstance(value, re.Pattern):
+                return '{} ~ {}'.format(positional, _awk_str(value.pattern))
+            return '{} == {}'.format(positional, _awk_str(value))
+        if value is True:
+            return 'flag({})'.format(_awk_str(field))
+        if value is False or value is None:
+            return '!flag({})'.format(_awk_str(field))
+        if isinstance(value, re.Pattern):
+            return 'like({}, {})'.format(_awk_str(field), _awk_str(value.pattern))
+        return 'has({}, {})'.format(_awk_str(field), _awk_str(value))
+
+    def program(self, count=True, where=None, fields=None):
+        """
+        Compile the query to an awk program
+
+        Args:
+            count (bool): Count the matching entries, select them otherwise
+            where (dict): Conditions on the fields of the entries
+            fields (list): Fields to select, all the words of the entries when not given
+
+        Returns:
+            the awk program
+        """
+        cond = ' && '.join(self._condition(f, v) for f, v in (where or {}).items()) or '1'
+        lines = [_HELPERS.rstrip('\n'), 'function entry() {', '    n = split(rec, t, " "); s = 1', '    key = t[1]']
+        if self.leading:
+            name, words, default = self.leading
+            lines.append('    lead = {}'.format(_awk_str(default)))
+            lines.append('    if (t[1] ~ /^({})$/) {{ lead = t[1]; s = 2; key = t[2] }}'.format('|'.join(words)))
+        if self.trailing:
+            lines.append('    tail = (t[n] ~ /^[A-Z_]+$/) ? t[n] : ""')
+        if count:
+            lines.append('    if ({}) c++'.format(cond))
+            begin = ''
+            end = 'print "#count\\t" c + 0'
+        else:
+            if fields:
+                row = ' "\\t" '.join(self._value(f) for f in fields)
+                header = _awk_str('\t'.join(fields))
+            else:
+                row = 'rec'
+                header = '""'
+            lines.append('    if ({}) print {}'.format(cond, row))
+            begin = 'BEGIN { print "#select\\t" ' + header + ' }'
+            end = 'print "#end"'
+        lines.append('}')
+        lines.append(begin)
+        # the exit status of the show command is passed in by pipeline()
+        lines.append('/^#rc / { rc = $2; next }')
+        lines.append('/^[ \\t]/ { rec = rec " " $0; next }')
+        lines.append('{ if (rec != "") entry(); rec = $0 }')
+        lines.append('END { if (rec != "") entry(); ' + end + '; exit rc + 0 }')
+        return '\n'.join(line for line in lines if line) + '\n'
+
+    def pipeline(self, cmd, count=True, where=None, fields=None):
+        """
+        Pipe the show command into the compiled query, the pipeline exits with the
+        status of the show command
+
+        Returns:
+            the command to run on the device
+        """
+        # a plain command in front so the APIs can still prefix it with sudo
+        show = shlex.quote(cmd.strip() + '; echo "#rc $?"')
+        return 'sh -c {} | awk {}'.format(show, shlex.quote(self.program(count, where, fields)))
+
+    @staticmethod
+    def parse(output):
+        """
+        Parse the output of one or more (chained) pipelines, the error messages of the
+        show commands are left out
+
+        Returns:
+            the count (int) or the selected entries (list of dicts, the missing fields are
+            None, all the words in 'entry' when no fields were given), a list of them for
+            chained pipelines or None when the output has no result
+        """
+        results = []
+        names = None
+        rows = None
+        for line in output.splitlines():
+            if line.startswith('#count\t'):
+                results.append(int(line.split('\t')[1]))
+            elif line.startswith('#select\t'):
+                names = line.split('\t')[1:] if line != '#select\t' else None
+                rows = []
+            elif rows is None:
+                continue
+            elif line == '#end':
+                results.append(rows)
+                rows = None
+            elif names:
+                rows.append({name: value or None for name, value in zip(names, line.split('\t'))})
+            else:
+                rows.append({'entry': line.split()})
+        if not results:
+            return None
+        return results[0] if len(results) == 1 else results
@@ -4,6 +4,7 @@
 #
 # DONOT EDIT - generated by diligent bots
 
+from dent_os_testbed.lib.command_formatter import CommandFormatter
 from dent_os_testbed.lib.test_lib_object import TestLibObject
 
 
@@ -12,14 +13,48 @@ class LinuxTcFilter(TestLibObject):
 
     """
 
+    FORMAT_MODIFY = CommandFormatter(
+        'tc {options} filter {command}',
+        [
+            'dev',
+            'block',
+            'direction={}',
+            'protocol',
+            'handle',
+            'pref',
+            'chain',
+            'filtertype{}=flower',
+            'action{trap,police,pass,drop,xt}=action',
+        ],
+    )
+
+    FORMAT_SHOW = CommandFormatter(
+        'tc {options} filter {command}',
+        [
+            'dev',
+            'block',
+            'direction={}',
+            'pref',
+        ],
+    )
+
+    FORMATTERS = {
+        'add': FORMAT_MODIFY,
+        'change': FORMAT_MODIFY,
+        'replace': FORMAT_MODIFY,
+        'delete': FORMAT_MODIFY,
+        'get': FORMAT_MODIFY,
+        'show': FORMAT_SHOW,
+    }
+
     def format_modify(self, command, *argv, **kwarg):
-        raise NotImplementedError
+        return self.FORMAT_MODIFY.format(command, kwarg['params'])
 
     def parse_modify(self, command, output, *argv, **kwarg):
         raise NotImplementedError
 
     def format_show(self, command, *argv, **kwarg):
-        raise NotImplementedError
+        return self.FORMAT_SHOW.format(command, kwarg['params'])
 
     def parse_show(self, command, output, *argv, **kwarg):
         raise NotImplementedError
@@ -1,4 +1,5 @@
 from dent_os_testbed.lib.tc.linux.linux_tc_monitor import LinuxTcMonitor
+from dent_os_testbed.utils.netlink_monitor import NetlinkParser
 
 
 class LinuxTcMonitorImpl(LinuxTcMonitor):
@@ -8,8 +9,16 @@ class LinuxTcMonitorImpl(LinuxTcMonitor):
         """
         tc [ OPTIONS ] monitor [ file FILENAME ]
 
+        The monitor never exits unless it reads a file,
+        use dent_os_testbed.utils.netlink_monitor.NetlinkMonitor to follow the events.
         """
-        cmd = 'tc  {} '.format(command)
-        # TODO: Implement me
-
+        params = kwarg['params']
+        cmd = 'tc {} {} '.format(params.get('options', ''), command)
+        # custom code here
+        if 'file' in params:
+            cmd += 'file {} '.format(params['file'])
         return cmd
+
+    def parse_show(self, command, output, *argv, **kwarg):
+        parser = NetlinkParser('tc')
+        return [event for event in map(parser.parse, output.splitlines()) if event]
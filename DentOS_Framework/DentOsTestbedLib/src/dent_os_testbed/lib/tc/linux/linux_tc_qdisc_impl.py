@@ -1,5 +1,3 @@
-import json
-
 from dent_os_testbed.lib.tc.linux.linux_tc_qdisc import LinuxTcQdisc
 
 
@@ -66,4 +64,4 @@ class LinuxTcQdiscImpl(LinuxTcQdisc):
         return cmd
 
     def parse_show(self, command, output, *argv, **kwarg):
-        return json.loads(output)
+        return self.parse_json(output, *argv, **kwarg)
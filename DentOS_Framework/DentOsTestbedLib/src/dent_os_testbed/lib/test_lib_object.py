@@ -1,2 +1,170 @@
+import asyncio
+import functools
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dent_os_testbed.lib.json_parser import json_parse
+
+
 class TestLibObject(object):
-    pass
+    # max number of devices a generated _run_command works on at the same time,
+    # can be overridden per call with the max_concurrency kwarg
+    MAX_CONCURRENCY = 8
+    # tools that can read their commands from stdin with -batch
+    BATCH_TOOLS = ['ip', 'tc', 'bridge']
+    # global options of the BATCH_TOOLS that take a value
+    BATCH_OPTIONS_WITH_VALUE = ['-n', '-netns', '-f', '-family']
+    # max age in seconds of a cached show/get result used by an API called with
+    # cache=True, can be overridden per call with the cache_ttl kwarg
+    CACHE_TTL = 5
+    # APIs whose results can be cached, every other API invalidates the cache
+    READ_ONLY_APIS = ('show', 'get', 'list', 'dump', 'count', 'select')
+    # (device name, family) -> {(api, commands): (timestamp, rc, output)}
+    _CACHE = {}
+    CACHE_STATS = {'hits': 0, 'misses': 0, 'invalidations': 0}
+    # dedicated thread per local implementation class, their client libraries
+    # are blocking and keep their session in class attributes
+    _EXECUTORS = {}
+    # api -> CommandFormatter compiled from the format table of the command in
+    # the yaml model, set by the generated classes of the commands that have one
+    FORMATTERS = {}
+
+    async def run_command_async(self, device_obj, command, *argv, **kwarg):
+        """
+        Run the blocking run_command of a local implementation (e.g. the traffic
+        generator clients) on the implementation's own executor thread so the
+        event loop keeps serving the other devices meanwhile. The calls of an
+        implementation class are serialized on its thread.
+
+        Returns:
+            (rc, output) of run_command
+        """
+        name = self.__class__.__name__
+        if name not in TestLibObject._EXECUTORS:
+            TestLibObject._EXECUTORS[name] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        return await asyncio.get_running_loop().run_in_executor(
+            TestLibObject._EXECUTORS[name],
+            functools.partial(self.run_command, device_obj, command, *argv, **kwarg),
+        )
+
+    def format_many(self, command, params_list):
+        """
+        Format the command for each params of params_list, in one pass over the
+        compiled formatter of the command when the model has a format table.
+
+        Returns:
+            list of the commands
+        """
+        formatter = self.FORMATTERS.get(command)
+        if formatter:
+            return formatter.format_many(command, params_list)
+        return [self.format_command(command=command, params=p) for p in params_list]
+
+    def format_batch(self, command, params):
+        """
+        Form a single '<tool> -force -batch -' command for a list of params, used
+        when the generated APIs are called with batch=True. The batch is fed to
+        the tool over stdin so any number of entries costs one fork on the device.
+
+        Returns:
+            (cmd, batch_input) or None if the commands cannot be batched and
+            need to run one by one
+        """
+        head = None
+        lines = []
+        for cmd in self.format_many(command, params):
+            if re.search(r'[|;&<>\'"`$]', cmd):
+                return None
+            tokens = cmd.split()
+            if not tokens or tokens[0] not in TestLibObject.BATCH_TOOLS:
+                return None
+            idx = 1
+            while idx < len(tokens) and tokens[idx].startswith('-'):
+                idx += 2 if tokens[idx] in TestLibObject.BATCH_OPTIONS_WITH_VALUE else 1
+            # all the entries have to share the tool and its global options
+            if head is None:
+                head = tokens[:idx]
+            elif head != tokens[:idx]:
+                return None
+            lines.append(' '.join(tokens[idx:]))
+        if head is None:
+            return None
+        return ' '.join(head + ['-force', '-batch', '-']), '\n'.join(lines) + '\n'
+
+    def parse_batch_errors(self, output):
+        """
+        Map the 'Command failed -:<line>' reports of a batch run to the index of
+        the failed entry in the input params.
+
+        Returns:
+            dict of entry index to the error reported for it
+        """
+        errors = {}
+        message = []
+        for line in output.splitlines():
+            match = re.match(r'Command failed -:(\d+)', line.strip())
+            if match:
+                errors[int(match.group(1)) - 1] = '\n'.join(message).strip()
+                message = []
+            else:
+                message.append(line)
+        return errors
+
+    def parse_json(self, output, *argv, **kwarg):
+        """
+        Decode the JSON output of a command with the fastest decoder installed, the
+        APIs called with parse_fields (list) get only these fields of the entries and
+        the ones called with parse_lazy=True get a generator decoding them on demand.
+
+        Returns:
+            the decoded output
+        """
+        return json_parse(output, fields=kwarg.get('fields'), lazy=kwarg.get('lazy', False))
+
+    def cache_family(self):
+        """
+        Object family the results are cached under, the lib module of the
+        implementation (ip, bridge, tc, ...): a change made through any class
+        of the module invalidates the results of all of them.
+        """
+        return self.__class__.__module__.split('.')[-3]
+
+    def cache_get(self, device_name, api, commands, kwarg):
+        """
+        Look up the result of a read-only API called with cache=True that is
+        at most cache_ttl seconds old.
+
+        Returns:
+            (rc, output) or None on a miss
+        """
+        if not kwarg.get('cache', False) or not api.startswith(TestLibObject.READ_ONLY_APIS):
+            return None
+        entries = TestLibObject._CACHE.get((device_name, self.cache_family()), {})
+        entry = entries.get((api, commands))
+        if entry and time.monotonic() - entry[0] < kwarg.get('cache_ttl', TestLibObject.CACHE_TTL):
+            TestLibObject.CACHE_STATS['hits'] += 1
+            return entry[1:]
+        TestLibObject.CACHE_STATS['misses'] += 1
+        return None
+
+    def cache_update(self, device_name, api, commands, rc, output, kwarg):
+        """
+        Store the successful result of a read-only API called with cache=True,
+        any other API drops the cached results of its family on the device.
+        """
+        key = (device_name, self.cache_family())
+        if not api.startswith(TestLibObject.READ_ONLY_APIS):
+            if TestLibObject._CACHE.pop(key, None):
+                TestLibObject.CACHE_STATS['invalidations'] += 1
+        elif kwarg.get('cache', False) and rc == 0:
+            TestLibObject._CACHE.setdefault(key, {})[(api, commands)] = (time.monotonic(), rc, output)
+
+    @staticmethod
+    def cache_clear(device_name=None):
+        """
+        Drop the cached results of a device, or of all the devices
+        """
+        for key in list(TestLibObject._CACHE):
+            if device_name is None or key[0] == device_name:
+                del TestLibObject._CACHE[key]
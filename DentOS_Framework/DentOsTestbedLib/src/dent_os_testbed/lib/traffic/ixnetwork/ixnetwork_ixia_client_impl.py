@@ -319,6 +319,34 @@ class IxnetworkIxiaClientImpl(IxnetworkIxiaClient):
             tracker = ti.EgressTracking.add()
             tracker.Offset = 'IPv4 DSCP (6 bits)'  # dscp 0..63
 
+    @staticmethod
+    def __get_stats_columns(stats):
+        """
+        Read a statistics view a whole page per request instead of walking
+        stats.Rows cell by cell. Returns {column caption: [values of all rows]}.
+        """
+        # the StatViewAssistant has no public API for the pages of its view, the view
+        # data is the only private attribute of it used here
+        return IxnetworkIxiaClientImpl._read_view_columns(stats._View.Data)
+
+    @staticmethod
+    def _read_view_columns(data):
+        """
+        Read the pages of the view data (ColumnCaptions, TotalPages, CurrentPage and
+        PageValues) into {column caption: [values of all rows]}
+        """
+        captions = data.ColumnCaptions
+        columns = {caption: [] for caption in captions}
+        for page in range(1, max(data.TotalPages, 1) + 1):
+            if page != data.CurrentPage:
+                data.CurrentPage = page
+            for row in data.PageValues:
+                # drilldown views can have several sub rows per row
+                for values in row:
+                    for caption, value in zip(captions, values):
+                        columns[caption].append(value)
+        return columns
+
     @staticmethod
     def __parse_multivalue(value):
         if 'type' not in value:
@@ -724,6 +752,8 @@ class IxnetworkIxiaClientImpl(IxnetworkIxiaClient):
                 stats_type = params[0].get('stats_type', stats_type)
             stats = SVA(IxnetworkIxiaClientImpl.ixnet, stats_type)
             # device.applog.info(stats)
+            if params and params[0].get('columnar', False):
+                return 0, self.__get_stats_columns(stats)
             return 0, stats
         elif command == 'get_drilldown_stats':
             UDS = 'User Defined Statistics'
@@ -735,7 +765,7 @@ class IxnetworkIxiaClientImpl(IxnetworkIxiaClient):
             if param.get('num_of_rows'):
                 uds_view.Page.EgressPageSize = int(param['num_of_rows'])
             uds_view.Enabled = True  # have to enable uds view every time it is changed
-            return self.run_traffic_item(device, 'get_stats', params=[{'stats_type': UDS}])
+            return self.run_traffic_item(device, 'get_stats', params=[{'stats_type': UDS, 'columnar': param.get('columnar', False)}])
         elif command == 'clear_stats':
             device.applog.info('Clear Stats')
             IxnetworkIxiaClientImpl.ixnet.ClearStats()
@@ -0,0 +1,251 @@
+"""
+  Utility to follow the netlink state of a device
+  1. ip monitor (link, address, route, neigh)
+  2. bridge monitor (link, fdb, mdb, vlan)
+  3. tc monitor (qdisc, class, filter, action)
+
+  A single long-lived monitor command per device and tool streams its events
+  over one SSH channel, the events are parsed and handed to the waiters so a
+  test can continue the moment the expected state change shows up instead of
+  sleeping for a fixed time.
+"""
+
+import asyncio
+import collections
+import re
+import time
+
+
+class NetlinkParser(object):
+    """
+    Turns a line of ip/bridge/tc monitor output into an event:
+    {'time': epoch, 'tool': 'ip', 'object': 'route', 'action': 'add', 'target': '10.0.0.0/24',
+     'fields': {'dev': 'swp1', 'via': '1.1.1.2', ...}, 'flags': ['offload', ...], 'line': '...'}
+    """
+
+    OBJECT_RE = re.compile(r'^\[(\w+)\]\s*')
+    # NN: ifname[@link]: <FLAGS> ...
+    LINK_RE = re.compile(r'^(\d+):\s+([^:@\s]+)(?:@\S+)?:\s+(?:<([^>]*)>)?\s*')
+    KEYS = {
+        'dev', 'via', 'lladdr', 'vlan', 'master', 'proto', 'metric', 'table', 'src', 'scope', 'mtu', 'state',
+        'qdisc', 'link', 'brd', 'dst', 'nhid', 'port', 'parent', 'handle', 'pref', 'protocol', 'chain',
+        'group', 'mode', 'type', 'temp', 'vid', 'addr', 'inet', 'inet6', 'mac',
+    }
+    TC_ACTIONS = {'added': 'add', 'deleted': 'del', 'replaced': 'replace'}
+
+    def __init__(self, tool):
+        self.tool = tool
+
+    def parse(self, line):
+        """
+        Returns:
+            the event of the line or None for continuation/empty lines
+        """
+        if not line.strip() or line[0].isspace():
+            return None
+        text = line.strip()
+        event = {'time': time.time(), 'tool': self.tool, 'object': None, 'action': 'add', 'target': None,
+                 'fields': {}, 'flags': [], 'line': text}
+        m = NetlinkParser.OBJECT_RE.match(text)
+        if m:
+            event['object'] = m.group(1).lower()
+            text = text[m.end():]
+        words = text.split()
+        if words and words[0] == 'Deleted':
+            event['action'] = 'del'
+            words = words[1:]
+        elif words and words[0] in NetlinkParser.TC_ACTIONS:
+            event['action'] = NetlinkParser.TC_ACTIONS[words[0]]
+            words = words[1:]
+        text = ' '.join(words)
+        m = NetlinkParser.LINK_RE.match(text)
+        if m:
+            # link and address events
+            event['fields']['ifindex'] = int(m.group(1))
+            event['target'] = m.group(2)
+            if m.group(3):
+                event['flags'].extend(m.group(3).split(','))
+            words = text[m.end():].split()
+        elif self.tool == 'tc' and words:
+            # qdisc|class|filter|action ...
+            event['object'] = event['object'] or words[0]
+            words = words[1:]
+        elif words:
+            event['target'] = words[0]
+            words = words[1:]
+        i = 0
+        while i < len(words):
+            if words[i] in NetlinkParser.KEYS and i + 1 < len(words):
+                event['fields'][words[i]] = words[i + 1]
+                i += 2
+            else:
+                event['flags'].append(words[i])
+                i += 1
+        if event['object'] is None:
+            event['object'] = self._guess_object(event)
+        return event
+
+    def _guess_object(self, event):
+        # without "all" the monitors do not prefix the lines with the object
+        if 'ifindex' in event['fields']:
+            return 'address' if 'inet' in event['fields'] or 'inet6' in event['fields'] else 'link'
+        if 'lladdr' in event['fields'] or set(event['flags']) & {'REACHABLE', 'STALE', 'PERMANENT', 'FAILED'}:
+            return 'neigh'
+        target = event['target'] or ''
+        if self.tool == 'bridge' and re.match(r'^([0-9a-f]{2}:){5}[0-9a-f]{2}$', target, re.I):
+            return 'fdb'
+        return 'route'
+
+
+class NetlinkMonitor(object):
+    """
+    Streams "<tool> monitor <objects>" of a device, use NetlinkMonitor.get to share
+    a single monitor per device and tool.
+    """
+
+    COMMANDS = {
+        'ip': 'ip monitor {}',
+        'bridge': 'bridge monitor {}',
+        'tc': 'tc monitor',
+    }
+    MAX_EVENTS = 1000
+    RECONNECT_INTERVAL = 5
+    _MONITORS = {}
+
+    def __init__(self, device, tool='ip', objects='all', max_events=MAX_EVENTS):
+        if tool not in NetlinkMonitor.COMMANDS:
+            raise ValueError(f'Unsupported monitor {tool}')
+        self.device = device
+        self.tool = tool
+        self.objects = objects
+        self.events = collections.deque(maxlen=max_events)
+        self._queues = []
+        self._task = None
+
+    @classmethod
+    def get(cls, device, tool='ip', objects='all'):
+        """
+        Get the shared monitor of the device, started on the running loop
+        """
+        key = (device.host_name, tool, objects)
+        if key not in cls._MONITORS:
+            cls._MONITORS[key] = cls(device, tool=tool, objects=objects)
+        monitor = cls._MONITORS[key]
+        monitor.start()
+        return monitor
+
+    @classmethod
+    def stop_all(cls):
+        for monitor in cls._MONITORS.values():
+            monitor.stop()
+        cls._MONITORS.clear()
+
+    def command(self):
+        return NetlinkMonitor.COMMANDS[self.tool].format(self.objects)
+
+    def start(self, loop=None):
+        try:
+            loop = loop or asyncio.get_running_loop()
+        except RuntimeError:
+            loop = asyncio.get_event_loop()
+        # a task left on another loop (e.g. the one of a previous test) never runs again
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = asyncio.ensure_future(self.run(), loop=loop)
+
+    def stop(self):
+        task, self._task = self._task, None
+        # nothing to cancel on a loop that is already closed
+        if task and not task.get_loop().is_closed():
+            task.cancel()
+
+    def subscribe(self):
+        queue = asyncio.Queue()
+        self._queues.append(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        if queue in self._queues:
+            self._queues.remove(queue)
+
+    def publish(self, event):
+        self.events.append(event)
+        for queue in self._queues:
+            queue.put_nowait(event)
+
+    async def run(self):
+        parser = NetlinkParser(self.tool)
+        sudo = self.device.ssh_conn_params.pssh
+        while True:
+            try:
+                async for line in self.device.stream_cmd(self.command(), sudo=sudo):
+                    event = parser.parse(line)
+                    if event:
+                        self.publish(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print('{} monitor on {} failed: {}'.format(self.tool, self.device.host_name, str(e)))
+            # the device went away (e.g. reboot), restart the monitor when it is back
+            await asyncio.sleep(NetlinkMonitor.RECONNECT_INTERVAL)
+
+    async def wait_for(self, predicate, timeout=60, check=None):
+        """
+        Wait for the first event matching predicate
+
+        Args:
+            predicate (callable): called with each event, returns True on the expected one
+            timeout (int): seconds to wait for the event
+            check (coroutine function): optional, called once after subscribing, returns True when
+                the expected state is already there (so changes made before the wait are not missed)
+
+        Returns:
+            the matching event or None if check found the state already there
+
+        Raises:
+            TimeoutError: when no event matched in time
+        """
+        queue = self.subscribe()
+        try:
+            if check and await check():
+                return None
+            deadline = time.time() + timeout
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TimeoutError(f'No matching {self.tool} event on {self.device.host_name} in {timeout}s')
+                try:
+                    event = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    continue
+                if predicate(event):
+                    return event
+        finally:
+            self.unsubscribe(queue)
+
+
+def netlink_match(obj=None, action=None, target=None, **fields):
+    """
+    Build a predicate for NetlinkMonitor.wait_for matching the given event object, action,
+    target and fields, flags given as field=True must be set on the event, e.g.
+    netlink_match('link', target='swp1', LOWER_UP=True) or netlink_match('fdb', action='del', dev='swp2')
+    """
+
+    def predicate(event):
+        if obj and event['object'] != obj:
+            return False
+        if action and event['action'] != action:
+            return False
+        if target and event['target'] != target:
+            return False
+        for key, val in fields.items():
+            if val is True:
+                if key not in event['flags']:
+                    return False
+            elif val is False:
+                if key in event['flags']:
+                    return False
+            elif event['fields'].get(key) != str(val):
+                return False
+        return True
+
+    return predicate
@@ -2,129 +2,123 @@
   Utility to monitor system resources
   1. CPU
   2. Memory
-  3. Process
+  3. Disk
+  4. Process
+
+  A single long-lived shell loop per device prints the /proc stats every
+  frequency seconds over one SSH channel, the samples are kept in a per
+  device ring buffer and checked against the thresholds as they arrive.
+  The samplers run either on the loop of the caller (start_monitoring) or
+  on a loop of their own in a background thread (start_thread), which keeps
+  sampling whatever the tests do with their loops.
 """
 
 import asyncio
+import collections
+import csv
+import os
 import threading
 import time
 
-from dent_os_testbed.lib.os.cpu_usage import CpuUsage
-from dent_os_testbed.lib.os.memory_usage import MemoryUsage
-from dent_os_testbed.lib.os.process import Process
-
 
 class PerfValueException(ValueError):
     pass
 
 
-class PerfBase(object):
-    def __init__(self, *args, **kwargs):
-        self._device = kwargs['device']
-        self._type = kwargs['type']
-        self._data = []
-        self._threshold = kwargs['thresholds'].get(self._type, {})
-        self._max_records = kwargs['max_records']
-
-    def set_thresholds(self, thresholds):
-        if self._type in thresholds:
-            self._threshold = thresholds[self._type]
-
-    def get_thresholds(self, thresholds):
-        if self._type in thresholds:
-            thresholds[self._type] = self._threshold
-
-    def add_data(self, data):
-        self._data.append(data)
-        if len(self._data) > self._max_records:
-            # get rid of the oldest item
-            self._data.pop(0)
-
-
-class PerfCpu(PerfBase):
-    def __init__(self, *args, **kwargs):
-        super(PerfCpu, self).__init__(*args, **kwargs)
-
-    def run(self):
-        output = CpuUsage.show(
-            input_data=[
-                {
-                    self._device.host_name: [{}],
-                }
-            ],
-            device_obj={self._device.host_name: self._device},
-            parse_output=True,
-        )
+class PerfParser(object):
+    """
+    Turns the output of PerfSampler.command into samples:
+    {'time': epoch, 'CPU': {...}, 'Memory': {...}, 'Disk': {...}, 'Process': {name: {...}}}
+    CPU values are % of the interval like mpstat (usr, nice, sys, iowait, irq, soft, steal, idle),
+    Memory, Disk and Process values are in kB as reported by the kernel.
+    """
+
+    BEGIN = '@sample'
+    END = '@end'
+    CPU_FIELDS = ['usr', 'nice', 'sys', 'idle', 'iowait', 'irq', 'soft', 'steal']
+
+    def __init__(self):
+        self._sample = None
+        self._cpu = None
+
+    def feed(self, line):
+        """
+        Feed a line of output
+
+        Returns:
+            the sample completed by this line or None
+        """
+        words = line.split()
+        if not words:
+            return None
+        if words[0] == PerfParser.BEGIN:
+            self._sample = {'time': float(words[1]), 'Memory': {}, 'Process': {}}
+            return None
+        if self._sample is None:
+            return None
+        sample = self._sample
         try:
-            ctime = time.strftime('%X %x %Z')
-            record = output[0][self._device.host_name]['parsed_output']
-            if self._threshold:
-                self.analyze_data(ctime, record, self._threshold)
-            self.add_data((ctime, record))
-        except Exception as e:
-            print(str(e))
-            pass
-
-    def analyze_data(self, time, record, threshold):
-        # 1. check for analomies using threshold
-        # 06:56:44 AM  CPU    %usr   %nice    %sys %iowait    %irq   %soft  %steal  %guest   %idle
-        # 06:56:44 AM  all    0.50    0.05    0.07    0.02    0.00    0.00    0.00    0.00   99.36
-        for k, v in record[0].items():
-            if k in threshold:
-                if v < threshold[k][0] or v > threshold[k][1]:
-                    raise PerfValueException(
-                        'Cpu {} Usage out of range usage {} threshold {} at {}'.format(
-                            k, v, threshold[k], time
-                        )
-                    )
-
-    def analyze(self, thresholds):
-        threshold = thresholds.get('CPU', self._threshold)
-        for cpu_time, record in self._data:
-            self.analyze_data(cpu_time, record, threshold)
-
-
-class PerfMemory(PerfBase):
-    def __init__(self, *args, **kwargs):
-        super(PerfMemory, self).__init__(*args, **kwargs)
-
-    def run(self):
-        output = MemoryUsage.show(
-            input_data=[
-                {
-                    self._device.host_name: [{}],
+            if words[0] == PerfParser.END:
+                self._sample = None
+                return sample
+            if words[0] == 'cpu':
+                jiffies = [int(w) for w in words[1:len(PerfParser.CPU_FIELDS) + 1]]
+                if self._cpu:
+                    delta = [now - prev for now, prev in zip(jiffies, self._cpu)]
+                    total = sum(delta) or 1
+                    sample['CPU'] = {
+                        name: round(100.0 * d / total, 2) for name, d in zip(PerfParser.CPU_FIELDS, delta)
+                    }
+                self._cpu = jiffies
+            elif words[0] == 'disk':
+                # disk <filesystem> <1k-blocks> <used> <available> <use%> <mounted on>
+                sample['Disk'] = {
+                    'size': int(words[2]),
+                    'used': int(words[3]),
+                    'available': int(words[4]),
+                    'use_percent': float(words[5].rstrip('%')),
                 }
-            ],
-            device_obj={self._device.host_name: self._device},
-            parse_output=True,
-        )
-        try:
-            ctime = time.strftime('%X %x %Z')
-            record = output[0][self._device.host_name]['parsed_output']
-            if self._threshold:
-                self.analyze_data(ctime, record, self._threshold)
-            self.add_data((ctime, record))
-        except Exception as e:
-            print(str(e))
+            elif words[0] == 'proc':
+                # proc <name> <VmKey>: <value> kB
+                sample['Process'].setdefault(words[1], {})[words[2].rstrip(':')] = int(words[3])
+            elif words[0].endswith(':'):
+                sample['Memory'][words[0].rstrip(':')] = int(words[1])
+        except (IndexError, ValueError):
             pass
-
-    def analyze_data(self, time, record, threshold):
+        return None
+
+
+def perf_check_sample(sample, thresholds):
+    """
+    Check a sample against thresholds of the form
+    {'CPU': {'idle': (min, max)}, 'Memory': {'MemFree': (min, max)}, 'Disk': {'use_percent': (min, max)},
+     'Process': {'all': {'VmRSS': (min, max)}, 'sshd': {'VmPeak': (min, max)}}}
+
+    Returns:
+        list of the violations found
+    """
+    violations = []
+    ctime = time.strftime('%X %x %Z', time.localtime(sample['time']))
+    for kind in ['CPU', 'Memory', 'Disk']:
+        for key, val in sample.get(kind, {}).items():
+            limits = thresholds.get(kind, {}).get(key)
+            if limits and (val < limits[0] or val > limits[1]):
+                violations.append(
+                    '{} {} Usage out of range usage {} threshold {} at {}'.format(kind, key, val, limits, ctime)
+                )
+    proc_thresholds = thresholds.get('Process', {})
+    for name, record in sample.get('Process', {}).items():
+        threshold = proc_thresholds.get(name, proc_thresholds.get('all', {}))
         for key, val in record.items():
-            if key in threshold:
-                if val < threshold[key][1] or val > threshold[key][1]:
-                    raise PerfValueException(
-                        'Memory {} Usage(in kB) out of range usage {} threshold {} at {}'.format(
-                            key, val, threshold[key], time
-                        )
-                    )
-
-    def analyze(self, thresholds):
-        threshold = thresholds.get('Memory', self._threshold)
-        for memory_time, record in self._data:
-            self.analyze_data(memory_time, record, threshold)
+            limits = threshold.get(key)
+            if limits and (val < limits[0] or val > limits[1]):
+                violations.append(
+                    'Process {} {} Usage out of range usage {} threshold {} at {}'.format(name, key, val, limits, ctime)
+                )
+    return violations
 
 
-class PerfProcesses(PerfBase):
+class PerfSampler(object):
     critical_processes = [
         'sshd',
         'zebra',
@@ -133,153 +127,108 @@ class PerfProcesses(PerfBase):
         'staticd',
         'tfpd',
     ]
+    MEMORY_KEYS = ['MemTotal', 'MemFree', 'MemAvailable', 'Buffers', 'Cached', 'SwapTotal', 'SwapFree']
+    PROCESS_KEYS = ['VmPeak', 'VmRSS']
+    MAX_VIOLATIONS = 100
 
     def __init__(self, *args, **kwargs):
-        super(PerfProcesses, self).__init__(*args, **kwargs)
-        self._data = dict()
-        for name in PerfProcesses.critical_processes:
-            self._data[name] = {}
-            self._data[name]['pid'] = None
-            self._data[name]['data'] = []
-
-    def construct_command(self):
-        return 'ps -eo pid,comm'
-
-    def run(self):
-        # 1. get the PID of the process
-        cmd = self.construct_command()
-        rc, lines = self._device.run_command(cmd)
-        for line in lines.split('\\n'):
-            words = line.strip().split(' ')
-            if len(words) != 2:
-                continue
-            pid, name = words[0], words[1]
-            # if this is a process to monitor
-            if name in PerfProcesses.critical_processes:
-                self._data[name]['pid'] = pid
-        # 2. get the stats for the process
-        for proc in PerfProcesses.critical_processes:
-            if not self._data[proc]['pid']:
-                continue
-            pid = self._data[proc]['pid']
-            output = Process.show(
-                input_data=[
-                    {
-                        self._device.host_name: [{'pid': pid}],
-                    }
-                ],
-                device_obj={self._device.host_name: self._device},
-                parse_output=True,
-            )
-            try:
-                ctime = time.strftime('%X %x %Z')
-                record = output[0][self._device.host_name]['parsed_output']
-                if pid in self._threshold or 'all' in self._threshold:
-                    self.analyze_data(
-                        proc, ctime, record, self._threshold.get(pid, self._threshold['all'])
-                    )
-                # save for future processing.
-                self._data[proc]['data'].append((ctime, record))
-                if len(self._data[proc]['data'] > self._max_records):
-                    self._data[proc]['data'].pop(0)
-            except Exception as e:
-                print(str(e))
-                pass
-
-    def analyze_data(self, name, time, record, threshold):
-        for key, val in record[0].items():
-            if key in threshold:
-                if val < threshold[key][0] or val > threshold[key][1]:
-                    raise PerfValueException(
-                        'Process {} {} Usage out of range usage {} threshold {} at {}'.format(
-                            name, key, val, threshold[key], time
-                        )
-                    )
-
-    def analyze(self, thresholds):
-        if thresholds:
-            threshold = thresholds['Process']
-        else:
-            threshold = self._threshold
-        for name, proc in self._data.items():
-            if name not in threshold:
-                # if there no process name then try for all
-                if 'all' in threshold:
-                    threshold = threshold['all']
-                else:
-                    continue
-            else:
-                threshold = threshold[name]
-            for x_time, record in proc['data']:
-                self.analyze_data(name, x_time, record, threshold)
-
-
-class PerfRunner(threading.Thread):
-    def __init__(self, *args, **kwargs):
-        super(PerfRunner, self).__init__()
-        self._event = threading.Event()
-        self._event.set()
         self.device = kwargs['device']
         self._frequency = kwargs['frequency']
-        self._max_records = kwargs['max_records']
-        self._thresholds = kwargs['thresholds']
-        self._run = True
-        self._objects = []
-        self._objects.append(
-            PerfCpu(
-                device=self.device,
-                type='CPU',
-                thresholds=self._thresholds,
-                max_records=self._max_records,
-            )
-        )
-        self._objects.append(
-            PerfMemory(
-                device=self.device,
-                type='Memory',
-                thresholds=self._thresholds,
-                max_records=self._max_records,
-            )
+        self._thresholds = dict(kwargs['thresholds'])
+        self.samples = collections.deque(maxlen=kwargs['max_records'])
+        self.violations = collections.deque(maxlen=PerfSampler.MAX_VIOLATIONS)
+        self._paused = False
+        self._task = None
+
+    def command(self):
+        procs = ' '.join(PerfSampler.critical_processes)
+        return (
+            'while true; do '
+            f'echo "{PerfParser.BEGIN} $(date +%s)"; '
+            'head -n1 /proc/stat; '
+            'grep -E "^({}):" /proc/meminfo; '.format('|'.join(PerfSampler.MEMORY_KEYS)) +
+            'df -Pk / | tail -n1 | sed "s/^/disk /"; '
+            f'for p in {procs}; do '
+            'pid=$(pidof -s $p) && '
+            'grep -E "^({}):" /proc/$pid/status | sed "s/^/proc $p /"; '.format('|'.join(PerfSampler.PROCESS_KEYS)) +
+            'done; '
+            f'echo "{PerfParser.END}"; '
+            f'sleep {self._frequency}; '
+            'done'
         )
-        self._objects.append(
-            PerfProcesses(
-                device=self.device,
-                type='Process',
-                thresholds=self._thresholds,
-                max_records=self._max_records,
-            )
-        )
-        self._loop = asyncio.new_event_loop()
 
     def set_thresholds(self, thresholds):
-        for o in self._objects:
-            o.set_thresholds(thresholds)
+        self._thresholds.update(thresholds)
 
     def get_thresholds(self, thresholds):
-        for o in self._objects:
-            o.get_thresholds(thresholds)
-
-    def analyze(self, thresholds=None):
-        for o in self._objects:
-            o.analyze(thresholds)
+        thresholds.update(self._thresholds)
+
+    def add_sample(self, sample):
+        if self._paused:
+            return
+        self.samples.append(sample)
+        for violation in perf_check_sample(sample, self._thresholds):
+            self.violations.append(violation)
+
+    def analyze(self, thresholds=None, since=None):
+        thresholds = thresholds or self._thresholds
+        # a copy, the sampler thread may be adding samples
+        for sample in list(self.samples):
+            if since is not None and sample['time'] < since:
+                continue
+            violations = perf_check_sample(sample, thresholds)
+            if violations:
+                raise PerfValueException('{}: {}'.format(self.device.host_name, violations[0]))
 
     def pause(self):
-        self._event.clear()
+        self._paused = True
 
     def resume(self):
-        self._event.set()
+        self._paused = False
 
-    def stop(self):
-        self._run = False
+    def start(self, loop, stream=None):
+        # a task left on another loop (e.g. the one of a previous test) never runs again
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = asyncio.ensure_future(self.run(stream), loop=loop)
 
-    def run(self):
-        asyncio.set_event_loop(self._loop)
-        while self._run:
-            self._event.wait()
-            if self.device.is_connected():
-                for o in self._objects:
-                    o.run()
-            time.sleep(self._frequency)
+    def stop(self):
+        task, self._task = self._task, None
+        # nothing to cancel on a loop that is already closed
+        if task and not task.get_loop().is_closed():
+            task.cancel()
+        return task
+
+    async def run(self, stream=None):
+        stream = stream or self.device.stream_cmd
+        while True:
+            parser = PerfParser()
+            try:
+                async for line in stream(self.command()):
+                    sample = parser.feed(line)
+                    if sample:
+                        self.add_sample(sample)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print('Perf sampling on {} failed: {}'.format(self.device.host_name, str(e)))
+            # the device went away (e.g. reboot), restart the stream when it is back
+            await asyncio.sleep(self._frequency)
+
+    def rows(self):
+        """
+        Flatten the samples for export, e.g. {'time': .., 'CPU.idle': .., 'Process.sshd.VmRSS': ..}
+        """
+        rows = []
+        for sample in list(self.samples):
+            row = {'device': self.device.host_name, 'time': sample['time']}
+            for kind in ['CPU', 'Memory', 'Disk']:
+                for key, val in sample.get(kind, {}).items():
+                    row[f'{kind}.{key}'] = val
+            for name, record in sample.get('Process', {}).items():
+                for key, val in record.items():
+                    row[f'Process.{name}.{key}'] = val
+            rows.append(row)
+        return rows
 
 
 class PerfUtil(object):
@@ -288,61 +237,150 @@ class PerfUtil(object):
         frequency = kwargs.get('frequency', 10)
         max_records = kwargs.get('max_records', 1000)
         thresholds = kwargs.get('thresholds', {})
-        self.threads = {}
+        self.loop = kwargs.get('loop', None)
+        self._thread = None
+        self._thread_loop = None
+        self._conns = []
+        self.samplers = {}
         for device in devices:
-            self.threads[device.host_name] = PerfRunner(
+            self.samplers[device.host_name] = PerfSampler(
                 device=device, frequency=frequency, max_records=max_records, thresholds=thresholds
             )
 
-    def start_monitoring(self, device=None):
+    def _select(self, device=None):
         if device:
-            self.threads[device.host_name].start()
-        else:
-            for _, t in self.threads.items():
-                t.start()
+            return [self.samplers[device.host_name]]
+        return list(self.samplers.values())
 
-    def analyze(self, device=None, thresholds={}):
-        if device:
-            self.threads[device.host_name].pause()
-            self.threads[device.host_name].analyze(thresholds)
-            self.threads[device.host_name].resume()
-        else:
-            for _, t in self.threads.items():
-                t.pause()
-                t.analyze(thresholds)
-                t.resume()
+    def start_monitoring(self, device=None):
+        if self._thread:
+            # already sampling on the thread
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = self.loop or asyncio.get_event_loop()
+        for s in self._select(device):
+            s.start(loop)
+
+    def stop_monitoring(self, device=None):
+        if self._thread:
+            self.stop_thread()
+            return
+        for s in self._select(device):
+            s.stop()
+
+    def start_thread(self):
+        """
+        Run the samplers on an event loop of their own in a background thread. Each device
+        is sampled over a dedicated SSH connection (Device.open_ssh_connection) so the
+        connections of the device stay with the loop of the tests.
+        """
+        if self._thread:
+            return
+        loop = asyncio.new_event_loop()
+        self._thread_loop = loop
+        self._thread = threading.Thread(target=self._run_thread, args=(loop,), name='PerfSampler', daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start_samplers(), loop).result()
+
+    def stop_thread(self, timeout=30):
+        """
+        Stop the samplers and the thread started by start_thread
+        """
+        thread, loop = self._thread, self._thread_loop
+        if not thread:
+            return
+        self._thread = self._thread_loop = None
+        try:
+            asyncio.run_coroutine_threadsafe(self._stop_samplers(), loop).result(timeout)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+
+    def _run_thread(self, loop):
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    async def _start_samplers(self):
+        loop = asyncio.get_running_loop()
+        for s in self.samplers.values():
+            # the test devices have no SSH connection of their own
+            open_conn = getattr(s.device, 'open_ssh_connection', None)
+            conn = open_conn(loop) if open_conn else None
+            if conn:
+                self._conns.append(conn)
+            s.start(loop, stream=conn.stream_cmd if conn else None)
+
+    async def _stop_samplers(self):
+        tasks = [task for task in [s.stop() for s in self.samplers.values()] if task]
+        await asyncio.gather(*tasks, return_exceptions=True)
+        conns, self._conns = self._conns, []
+        await asyncio.gather(*[conn.disconnect() for conn in conns], return_exceptions=True)
+
+    def analyze(self, device=None, thresholds={}, since=None):
+        for s in self._select(device):
+            s.analyze(thresholds, since=since)
 
     def set_thresholds(self, device=None, thresholds={}):
-        if device:
-            self.threads[device.host_name].set_thresholds(thresholds)
-        else:
-            for _, t in self.threads.items():
-                t.set_thresholds(thresholds)
+        for s in self._select(device):
+            s.set_thresholds(thresholds)
 
     def get_thresholds(self, device=None, thresholds={}):
-        if device:
-            self.threads[device.host_name].get_thresholds(thresholds)
-        else:
-            for _, t in self.threads.items():
-                t.get_thresholds(thresholds)
+        for s in self._select(device):
+            s.get_thresholds(thresholds)
 
-    def stop_monitoring(self, device=None):
-        if device:
-            self.threads[device.host_name].stop()
-        else:
-            for _, t in self.threads.items():
-                t.stop()
+    def get_samples(self, device):
+        return list(self.samplers[device.host_name].samples)
+
+    def get_violations(self, device=None):
+        violations = []
+        for s in self._select(device):
+            violations.extend(s.violations)
+        return violations
 
     def resume(self, device=None):
-        if device:
-            self.threads[device.host_name].resume()
-        else:
-            for _, t in self.threads.items():
-                t.resume()
+        for s in self._select(device):
+            s.resume()
 
     def pause(self, device=None):
-        if device:
-            self.threads[device.host_name].pause()
-        else:
-            for _, t in self.threads.items():
-                t.pause()
+        for s in self._select(device):
+            s.pause()
+
+    def export_csv(self, path, device=None):
+        rows = [row for s in self._select(device) for row in s.rows()]
+        fields = ['device', 'time']
+        for row in rows:
+            fields.extend(k for k in row if k not in fields)
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def export_parquet(self, path, device=None):
+        # pyarrow is only needed for this export
+        import pyarrow
+        import pyarrow.parquet
+
+        rows = [row for s in self._select(device) for row in s.rows()]
+        pyarrow.parquet.write_table(pyarrow.Table.from_pylist(rows), path)
+        return path
+
+    def export(self, log_dir, fmt='csv'):
+        """
+        Export the samples of each device to <log_dir>/perf_<host_name>.<fmt>
+        """
+        paths = []
+        for name, s in self.samplers.items():
+            if not s.samples:
+                continue
+            path = os.path.join(log_dir, f'perf_{name}.{fmt}')
+            if fmt == 'parquet':
+                paths.append(self.export_parquet(path, device=s.device))
+            else:
+                paths.append(self.export_csv(path, device=s.device))
+        return paths
@@ -0,0 +1,30 @@
+from dent_os_testbed.lib.command_formatter import CommandFormatter
+from dent_os_testbed.lib.ip.linux.linux_ip_route_impl import LinuxIpRouteImpl
+
+
+def test_that_command_formatter(capfd):
+    fmt = CommandFormatter(
+        'ip {cmd_options} route {command}',
+        ['dst={}', 'protocol=proto {}', 'metric', 'nexthop[via,dev]=nexthop', 'address{}=', 'action{drop,pass}=action'],
+    )
+    assert fmt.format('add', {'dst': '10.0.0.0/24', 'metric': 10}) == 'ip route add 10.0.0.0/24 metric 10 '
+    assert fmt.format('add', {'cmd_options': '-j', 'protocol': 'static'}) == 'ip -j route add proto static '
+    cmd = fmt.format('replace', {'nexthop': [{'via': '1.1.1.1', 'dev': 'swp1'}, {'via': '2.2.2.2'}]})
+    assert cmd == 'ip route replace nexthop via 1.1.1.1 dev swp1 nexthop via 2.2.2.2 '
+    # dict fields render their items, non dict values are skipped
+    assert fmt.format('show', {'address': {'to': '1.1.1.1'}}) == 'ip route show address to 1.1.1.1 '
+    assert fmt.format('show', {'address': '1.1.1.1'}) == 'ip route show '
+    cmd = fmt.format('add', {'action': {'pass': {'index': 1}, 'drop': {}}})
+    assert cmd == 'ip route add action drop action pass index 1 '
+    assert fmt.format_many('del', [{'dst': '1.1.1.1'}, {'dst': '2.2.2.2'}]) == [
+        'ip route del 1.1.1.1 ',
+        'ip route del 2.2.2.2 ',
+    ]
+
+
+def test_that_command_formatter_generated(capfd):
+    impl = LinuxIpRouteImpl()
+    params = [{'dst': '10.0.%d.0/24' % i, 'dev': 'swp1', 'protocol': 'static'} for i in range(3)]
+    cmds = impl.format_many('add', params)
+    assert cmds == [impl.format_command(command='add', params=p) for p in params]
+    assert cmds[0] == 'ip route add 10.0.0.0/24 proto static dev swp1 '
@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip('ixnetwork_restpy')
+
+from dent_os_testbed.lib.traffic.ixnetwork.ixnetwork_ixia_client_impl import IxnetworkIxiaClientImpl  # noqa: E402
+
+
+class ViewData:
+    # pages of a statistics view, each row is a list of sub rows
+    def __init__(self, captions, pages):
+        self.ColumnCaptions = captions
+        self.TotalPages = len(pages)
+        self.pages = pages
+        self.CurrentPage = 1
+        self.reads = []
+
+    @property
+    def PageValues(self):
+        self.reads.append(self.CurrentPage)
+        return self.pages[self.CurrentPage - 1] if self.pages else []
+
+
+class View:
+    def __init__(self, data):
+        self.Data = data
+
+
+class StatViewAssistant:
+    def __init__(self, data):
+        self._View = View(data)
+
+
+def test_that_ixnetwork_stats_columns(capfd):
+    data = ViewData(
+        ['Traffic Item', 'Loss %'],
+        [
+            [[['ti1', '0.000']], [['ti2', '1.500']]],
+            [[['ti3', '']]],
+        ],
+    )
+    columns = IxnetworkIxiaClientImpl._IxnetworkIxiaClientImpl__get_stats_columns(StatViewAssistant(data))
+    assert columns == {'Traffic Item': ['ti1', 'ti2', 'ti3'], 'Loss %': ['0.000', '1.500', '']}
+    # a single read per page
+    assert data.reads == [1, 2]
+
+
+def test_that_ixnetwork_stats_columns_drilldown(capfd):
+    # the egress rows of a drilldown view come as sub rows of the traffic item
+    data = ViewData(
+        ['Egress Tracking', 'Rx Frames'],
+        [[[['ti1', '30'], ['vlan 1', '10'], ['vlan 2', '20']]]],
+    )
+    assert IxnetworkIxiaClientImpl._read_view_columns(data) == {
+        'Egress Tracking': ['ti1', 'vlan 1', 'vlan 2'],
+        'Rx Frames': ['30', '10', '20'],
+    }
+
+
+def test_that_ixnetwork_stats_columns_empty(capfd):
+    data = ViewData(['Traffic Item', 'Loss %'], [])
+    assert IxnetworkIxiaClientImpl._read_view_columns(data) == {'Traffic Item': [], 'Loss %': []}
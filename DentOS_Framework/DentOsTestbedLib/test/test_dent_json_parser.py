@@ -0,0 +1,36 @@
+import json
+
+import pytest
+from dent_os_testbed.lib import json_parser
+from dent_os_testbed.lib.ip.linux.linux_ip_route_impl import LinuxIpRouteImpl
+
+ROUTES = [
+    {'dst': '10.0.%d.0/24' % i, 'gateway': '1.1.1.1', 'dev': 'swp1', 'protocol': 'static', 'flags': ['offload']}
+    for i in range(5)
+]
+
+
+def test_that_json_parser(capfd):
+    text = json.dumps(ROUTES, indent=4)
+    assert json_parser.json_parse(text) == ROUTES
+    assert list(json_parser.json_iter(text)) == ROUTES
+    assert list(json_parser.json_iter(' [ ] ')) == []
+    projected = [{'dst': r['dst'], 'dev': r['dev']} for r in ROUTES]
+    assert json_parser.json_parse(text, fields=['dst', 'dev', 'missing']) == projected
+    lazy = json_parser.json_parse(text, fields=['dst', 'dev'], lazy=True)
+    assert next(lazy) == projected[0]
+    assert list(lazy) == projected[1:]
+    # not an array, the fields do not apply
+    assert json_parser.json_parse('{"a": 1}', fields=['b']) == {'a': 1}
+    with pytest.raises(ValueError):
+        list(json_parser.json_iter('{"a": 1}'))
+    with pytest.raises(ValueError):
+        list(json_parser.json_iter('[{"a": 1} {"b": 2}]'))
+
+
+def test_that_json_parser_impl(capfd):
+    impl = LinuxIpRouteImpl()
+    text = json.dumps(ROUTES)
+    assert impl.parse_output(command='show', output=text, commands='') == ROUTES
+    parsed = impl.parse_output(command='show', output=text, commands='', fields=['dst'], lazy=False)
+    assert parsed == [{'dst': r['dst']} for r in ROUTES]
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+from dent_os_testbed.lib.bridge.bridge_monitor import BridgeMonitor
+from dent_os_testbed.utils.netlink_monitor import NetlinkMonitor, NetlinkParser, netlink_match
+
+from .utils import TestDevice
+
+IP_EVENTS = [
+    '[LINK]3: swp1: <BROADCAST,MULTICAST,UP> mtu 1500 qdisc mq master br0 state DOWN group default',
+    '    link/ether 68:21:5f:f4:57:c2 brd ff:ff:ff:ff:ff:ff',
+    '[ROUTE]Deleted 10.1.1.0/24 via 10.0.0.2 dev swp2 proto bgp metric 20 offload',
+    '[NEIGH]10.0.0.2 dev swp2 lladdr 68:21:5f:f4:57:c3 REACHABLE',
+    '[LINK]3: swp1: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc mq master br0 state UP group default',
+]
+
+
+class MonitorDevice(TestDevice):
+    def __init__(self, lines, name='test_dev'):
+        super(MonitorDevice, self).__init__(name=name)
+        self.lines = lines
+        self.cmds = []
+
+    async def stream_cmd(self, cmd, sudo=False):
+        self.cmds.append(cmd)
+        for line in self.lines:
+            await asyncio.sleep(0.05)
+            yield line + '\n'
+        await asyncio.sleep(10)
+
+
+def test_that_netlink_parser(capfd):
+    parser = NetlinkParser('ip')
+    events = [e for e in map(parser.parse, IP_EVENTS) if e]
+    print(events)
+    assert len(events) == 4
+    assert events[0]['object'] == 'link'
+    assert events[0]['target'] == 'swp1'
+    assert events[0]['fields']['state'] == 'DOWN'
+    assert 'LOWER_UP' not in events[0]['flags']
+    assert events[1]['object'] == 'route'
+    assert events[1]['action'] == 'del'
+    assert events[1]['target'] == '10.1.1.0/24'
+    assert events[1]['fields']['via'] == '10.0.0.2'
+    assert 'offload' in events[1]['flags']
+    assert events[2]['object'] == 'neigh'
+    assert events[2]['fields']['lladdr'] == '68:21:5f:f4:57:c3'
+
+    fdb = NetlinkParser('bridge').parse('Deleted 68:21:5f:f4:57:c3 dev swp3 vlan 10 master br0')
+    assert fdb['object'] == 'fdb'
+    assert fdb['action'] == 'del'
+    assert fdb['fields']['vlan'] == '10'
+
+    tc = NetlinkParser('tc').parse('added filter dev swp1 ingress protocol all pref 49152 flower chain 0')
+    assert tc['object'] == 'filter'
+    assert tc['action'] == 'add'
+    assert tc['fields']['pref'] == '49152'
+
+
+def test_that_netlink_monitor_waits_for_event(capfd):
+    dv = MonitorDevice(IP_EVENTS)
+
+    async def run():
+        monitor = NetlinkMonitor.get(dv, 'ip')
+        try:
+            event = await monitor.wait_for(netlink_match('link', target='swp1', LOWER_UP=True), timeout=5)
+            # the state is already there, no need to wait for an event
+            ready = await monitor.wait_for(netlink_match('link'), timeout=5, check=lambda: asyncio.sleep(0, True))
+            with pytest.raises(TimeoutError):
+                await monitor.wait_for(netlink_match('fdb'), timeout=0.2)
+            return event, ready
+        finally:
+            NetlinkMonitor.stop_all()
+
+    event, ready = asyncio.get_event_loop().run_until_complete(run())
+    print(event)
+    assert dv.cmds == ['ip monitor all']
+    assert event['fields']['state'] == 'UP'
+    assert ready is None
+
+
+class OutputDevice(TestDevice):
+    async def run_cmd(self, cmd, input=None):
+        return 0, '68:21:5f:f4:57:c3 dev swp3 vlan 10 master br0\n'
+
+
+def test_that_bridge_monitor_formats(capfd):
+    dv = OutputDevice()
+    out = asyncio.get_event_loop().run_until_complete(
+        BridgeMonitor.monitor(
+            input_data=[{'test_dev': [{'options': 'fdb'}]}], device_obj={'test_dev': dv}, parse_output=True
+        )
+    )
+    print(out)
+    assert out[0]['test_dev']['command'].strip() == 'bridge monitor fdb'
+    assert out[0]['test_dev']['parsed_output'][0]['target'] == '68:21:5f:f4:57:c3'
+
+
+def test_that_netlink_monitor_stops_on_a_closed_loop(capfd):
+    dv = MonitorDevice(IP_EVENTS)
+    loop = asyncio.new_event_loop()
+
+    async def run():
+        NetlinkMonitor.get(dv, 'ip')
+        await asyncio.sleep(0.1)
+
+    loop.run_until_complete(run())
+    loop.close()
+    NetlinkMonitor.stop_all()
+    assert not NetlinkMonitor._MONITORS
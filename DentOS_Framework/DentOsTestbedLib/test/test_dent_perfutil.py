@@ -1,75 +1,142 @@
+import asyncio
+import csv
+import threading
 import time
 
-from dent_os_testbed.utils.perf_util import PerfUtil
+import pytest
+from dent_os_testbed.utils.perf_util import PerfParser, PerfUtil, PerfValueException
 
 from .utils import TestDevice
 
+SAMPLE = """@sample {time}
+cpu  {busy} 0 100 {idle} 0 0 0 0 0 0
+MemTotal:        8000000 kB
+MemFree:         {free} kB
+disk /dev/sda1 1000000 250000 750000 25% /
+proc sshd VmPeak:    12000 kB
+proc sshd VmRSS:      4000 kB
+@end
+"""
 
-def test_that_perf_util(capfd):
-    dv = TestDevice()
+
+class StreamDevice(TestDevice):
+    def __init__(self, samples, name='test_dev'):
+        super(StreamDevice, self).__init__(name=name)
+        self.samples = samples
+        self.cmds = []
+
+    async def stream_cmd(self, cmd, sudo=False):
+        self.cmds.append(cmd)
+        for sample in self.samples:
+            for line in sample.splitlines():
+                yield line + '\n'
+            await asyncio.sleep(0)
+        await asyncio.sleep(10)
+
+
+def make_samples(count, free=4000000):
+    return [
+        SAMPLE.format(time=1000 + i, busy=100 * i, idle=1000 + 300 * i, free=free if i < count - 1 else 100)
+        for i in range(count)
+    ]
+
+
+def test_that_perf_parser(capfd):
+    parser = PerfParser()
+    samples = []
+    for sample in make_samples(3):
+        for line in sample.splitlines():
+            s = parser.feed(line)
+            if s:
+                samples.append(s)
+    print(samples)
+    assert len(samples) == 3
+    # the CPU usage needs two /proc/stat readings
+    assert 'CPU' not in samples[0]
+    assert samples[1]['CPU']['usr'] == 25.0
+    assert samples[1]['CPU']['sys'] == 0.0
+    assert samples[1]['CPU']['idle'] == 75.0
+    assert samples[1]['Memory'] == {'MemTotal': 8000000, 'MemFree': 4000000}
+    assert samples[1]['Disk']['use_percent'] == 25.0
+    assert samples[1]['Process'] == {'sshd': {'VmPeak': 12000, 'VmRSS': 4000}}
+
+
+def test_that_perf_util(capfd, tmp_path):
+    dv = StreamDevice(make_samples(4))
+    util = PerfUtil(devices=[dv], frequency=1, max_records=3, thresholds={'Memory': {'MemFree': (1000, 8000000)}})
+
+    async def run():
+        util.start_monitoring()
+        await asyncio.sleep(0.1)
+        util.stop_monitoring()
+
+    asyncio.get_event_loop().run_until_complete(run())
+    # a single streaming command for all the samples of the device
+    assert len(dv.cmds) == 1
+    samples = util.get_samples(dv)
+    assert [s['time'] for s in samples] == [1001, 1002, 1003]
+    violations = util.get_violations()
+    print(violations)
+    assert len(violations) == 1
+    assert 'MemFree' in violations[0]
+
+    util.analyze(thresholds={'CPU': {'idle': (10.0, 100.0)}})
+    with pytest.raises(PerfValueException):
+        util.analyze(thresholds={'Process': {'all': {'VmPeak': (0, 1024)}}})
+    # only the samples taken after since are checked
+    util.analyze(since=1004)
+    with pytest.raises(PerfValueException):
+        util.analyze(since=1003)
+
+    paths = util.export(str(tmp_path))
+    with open(paths[0]) as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 3
+    assert rows[-1]['Memory.MemFree'] == '100'
+    assert rows[-1]['Process.sshd.VmRSS'] == '4000'
+
+
+def test_that_perf_util_pauses(capfd):
+    dv = StreamDevice(make_samples(3))
+    util = PerfUtil(devices=[dv], frequency=1)
+    util.pause()
+
+    async def run():
+        util.start_monitoring()
+        await asyncio.sleep(0.1)
+        util.stop_monitoring()
+
+    asyncio.get_event_loop().run_until_complete(run())
+    assert util.get_samples(dv) == []
+
+
+def test_that_perf_util_samples_on_its_thread(capfd):
+    dv = StreamDevice(make_samples(3))
     util = PerfUtil(devices=[dv], frequency=1)
+    util.start_thread()
+    # no loop runs in this thread while the samples come in
+    for _ in range(500):
+        if len(util.get_samples(dv)) == 3:
+            break
+        time.sleep(0.01)
+    # the samplers are already running, the test loops do not start them again
     util.start_monitoring()
-    time.sleep(5)
     util.stop_monitoring()
-    try:
-        util.analyze(thresholds={'CPU': {'idle': (0.0, 50.0)}})
-    except Exception as e:
-        print(e)
+    assert [s['time'] for s in util.get_samples(dv)] == [1000, 1001, 1002]
+    assert len(dv.cmds) == 1
+    assert not any(t.name == 'PerfSampler' for t in threading.enumerate())
 
-    try:
-        util.analyze(thresholds={'Memory': {'mem_total': (0, 1024)}})
-    except Exception as e:
-        print(e)
 
-    try:
-        util.analyze(thresholds={'Process': {'all': {'VmPeak': (0, 1024)}}})
-    except Exception as e:
-        print(e)
-
-    try:
-        util.analyze(thresholds={'Process': {'sshd': {'VmPeak': (0, 1024)}}})
-    except Exception as e:
-        print(e)
-
-
-def test_that_perf_during_test(capfd):
-    dv = TestDevice()
-    util = PerfUtil(
-        devices=[dv],
-        frequency=1,
-        thresholds={
-            'CPU': {'idle': (0.0, 100.0)},
-            'Memory': {'mem_total': (0, 102400000)},
-            'Process': {'all': {'VmPeak': (0, 102400000)}, 'sshd': {'VmPeak': (0, 102400000)}},
-        },
-    )
-    util.start_monitoring()
-    time.sleep(2)
-    util.set_thresholds(
-        device=dv,
-        thresholds={
-            'CPU': {'idle': (0.0, 10.0)},
-            'Memory': {'mem_total': (0, 102400000)},
-            'Process': {'all': {'VmPeak': (0, 102400000)}, 'sshd': {'VmPeak': (0, 102400000)}},
-        },
-    )
-    time.sleep(2)
-    util.set_thresholds(
-        device=dv,
-        thresholds={
-            'CPU': {'idle': (0.0, 100.0)},
-            'Memory': {'mem_total': (0, 10)},
-            'Process': {'all': {'VmPeak': (0, 102400000)}, 'sshd': {'VmPeak': (0, 102400000)}},
-        },
-    )
-    time.sleep(2)
-    util.set_thresholds(
-        device=dv,
-        thresholds={
-            'CPU': {'idle': (0.0, 100.0)},
-            'Memory': {'mem_total': (0, 102400000)},
-            'Process': {'all': {'VmPeak': (0, 1024)}, 'sshd': {'VmPeak': (0, 1024)}},
-        },
-    )
-    time.sleep(2)
+def test_that_perf_util_stops_on_a_closed_loop(capfd):
+    dv = StreamDevice(make_samples(1))
+    util = PerfUtil(devices=[dv], frequency=1)
+    loop = asyncio.new_event_loop()
+
+    async def run():
+        util.start_monitoring()
+        await asyncio.sleep(0.1)
+
+    loop.run_until_complete(run())
+    loop.close()
     util.stop_monitoring()
+    assert len(util.get_samples(dv)) == 1
@@ -0,0 +1,202 @@
+import asyncio
+import threading
+
+from dent_os_testbed.lib.ip.ip_address import IpAddress
+from dent_os_testbed.lib.ip.ip_link import IpLink
+from dent_os_testbed.lib.tc.tc_filter import TcFilter
+from dent_os_testbed.lib.test_lib_object import TestLibObject
+
+from .utils import TestDevice
+
+
+class SlowDevice(TestDevice):
+    def __init__(self, name, delay, tracker):
+        super(SlowDevice, self).__init__(name=name)
+        self.delay = delay
+        self.tracker = tracker
+
+    async def run_cmd(self, cmd, input=None):
+        self.tracker['active'] += 1
+        self.tracker['peak'] = max(self.tracker['peak'], self.tracker['active'])
+        self.tracker.setdefault('events', []).append(('start', self.name))
+        await asyncio.sleep(self.delay)
+        self.tracker['events'].append(('end', self.name))
+        self.tracker['active'] -= 1
+        return 0, self.name
+
+
+def test_that_run_command_is_concurrent(capfd):
+    tracker = {'active': 0, 'peak': 0}
+    # slowest device first to make sure the results keep the input order
+    devs = {f'test_dev{i}': SlowDevice(f'test_dev{i}', 0.5 - i * 0.05, tracker) for i in range(6)}
+    loop = asyncio.get_event_loop()
+    out = loop.run_until_complete(
+        IpLink.show(
+            input_data=[{name: [{}] for name in devs}],
+            device_obj=devs,
+        )
+    )
+    print(out)
+    assert [list(o.keys())[0] for o in out] == list(devs.keys())
+    for name, o in zip(devs, out):
+        assert o[name]['rc'] == 0
+        assert o[name]['result'] == name
+        assert 'command' in o[name]
+    assert tracker['peak'] == len(devs)
+    # all the devices were started before the first one finished
+    kinds = [kind for kind, _ in tracker['events']]
+    assert kinds == ['start'] * len(devs) + ['end'] * len(devs)
+    # the fastest device finished first even though it was started last
+    assert tracker['events'][len(devs)] == ('end', 'test_dev5')
+
+
+def test_that_run_command_honors_max_concurrency(capfd):
+    tracker = {'active': 0, 'peak': 0}
+    devs = {f'test_dev{i}': SlowDevice(f'test_dev{i}', 0.1, tracker) for i in range(6)}
+    loop = asyncio.get_event_loop()
+    out = loop.run_until_complete(
+        IpLink.show(
+            input_data=[{name: [{}]} for name in devs],
+            device_obj=devs,
+            max_concurrency=2,
+        )
+    )
+    print(out)
+    assert len(out) == len(devs)
+    assert tracker['peak'] == 2
+
+
+def test_that_run_command_stops_at_unknown_os(capfd):
+    tracker = {'active': 0, 'peak': 0}
+    devs = {f'test_dev{i}': SlowDevice(f'test_dev{i}', 0.1, tracker) for i in range(3)}
+    devs['test_dev1'].os = 'unknown'
+    loop = asyncio.get_event_loop()
+    out = loop.run_until_complete(
+        IpLink.show(
+            input_data=[{name: [{}] for name in devs}],
+            device_obj=devs,
+        )
+    )
+    print(out)
+    # devices before the failing one still run, the ones after it are skipped
+    assert len(out) == 2
+    assert out[0]['test_dev0']['rc'] == 0
+    assert out[1]['test_dev1']['rc'] == -1
+
+
+class BatchDevice(TestDevice):
+    def __init__(self, name, output):
+        super(BatchDevice, self).__init__(name=name)
+        self.output = output
+        self.cmds = []
+
+    async def run_cmd(self, cmd, input=None):
+        self.cmds.append((cmd, input))
+        return 1 if 'Command failed' in self.output else 0, self.output
+
+
+def test_that_run_command_batches_entries(capfd):
+    output = 'Error: Exclusivity flag on, cannot modify.\nCommand failed -:2\n'
+    dv = BatchDevice('test_dev', output)
+    entries = [{'dev': 'swp1', 'direction': 'ingress', 'pref': pref} for pref in range(1, 4)]
+    loop = asyncio.get_event_loop()
+    out = loop.run_until_complete(
+        TcFilter.add(
+            input_data=[{'test_dev': entries}],
+            device_obj={'test_dev': dv},
+            batch=True,
+        )
+    )
+    print(out)
+    # one command for all the entries with the batch fed over stdin
+    assert len(dv.cmds) == 1
+    cmd, batch_input = dv.cmds[0]
+    assert cmd == out[0]['test_dev']['command'] == 'tc -force -batch -'
+    lines = batch_input.splitlines()
+    assert len(lines) == len(entries)
+    assert all(line.startswith('filter add dev swp1 ingress pref') for line in lines)
+    assert out[0]['test_dev']['rc'] == 1
+    assert out[0]['test_dev']['batch_errors'] == {1: 'Error: Exclusivity flag on, cannot modify.'}
+
+
+def test_that_run_command_chains_without_batch(capfd):
+    dv = BatchDevice('test_dev', '')
+    loop = asyncio.get_event_loop()
+    out = loop.run_until_complete(
+        IpLink.add(
+            input_data=[{'test_dev': [{'name': 'br0', 'type': 'bridge'}, {'name': 'br1', 'type': 'bridge'}]}],
+            device_obj={'test_dev': dv},
+        )
+    )
+    print(out)
+    # without batch=True the commands are still chained in a single shell line
+    assert dv.cmds[0][1] is None
+    assert '&&' in dv.cmds[0][0]
+    assert 'batch_errors' not in out[0]['test_dev']
+
+
+class BlockingImpl(TestLibObject):
+    def run_command(self, device_obj, command, *argv, **kwarg):
+        # only released by the ticker, which cannot run if the call blocks the loop
+        released = self.released.wait(timeout=5)
+        return 0 if released else -1, threading.current_thread().name
+
+
+def test_that_local_run_command_does_not_block_the_loop(capfd):
+    impl = BlockingImpl()
+    impl.released = threading.Event()
+    ticks = []
+
+    async def ticker():
+        for i in range(3):
+            ticks.append(i)
+            await asyncio.sleep(0)
+        impl.released.set()
+
+    async def run():
+        return await asyncio.gather(
+            impl.run_command_async(None, command='start_traffic', params=[{}]),
+            ticker(),
+        )
+
+    loop = asyncio.get_event_loop()
+    (rc, thread_name), _ = loop.run_until_complete(run())
+    # the ticker kept running while the blocking call was in flight
+    assert rc == 0
+    assert ticks == [0, 1, 2]
+    assert thread_name.startswith('BlockingImpl')
+
+
+def test_that_run_command_caches_show(capfd):
+    TestLibObject.cache_clear()
+    dv = BatchDevice('test_dev', '[]')
+    stats = dict(TestLibObject.CACHE_STATS)
+    loop = asyncio.get_event_loop()
+
+    def show(**kwarg):
+        return loop.run_until_complete(
+            IpAddress.show(input_data=[{'test_dev': [{}]}], device_obj={'test_dev': dv}, **kwarg)
+        )
+
+    show(cache=True)
+    out = show(cache=True)
+    print(out)
+    assert out[0]['test_dev']['rc'] == 0
+    assert len(dv.cmds) == 1
+    # without cache=True the device is always queried
+    show()
+    assert len(dv.cmds) == 2
+    # a change through another class of the same module invalidates the cached result
+    loop.run_until_complete(
+        IpLink.add(input_data=[{'test_dev': [{'name': 'br0', 'type': 'bridge'}]}], device_obj={'test_dev': dv})
+    )
+    show(cache=True)
+    assert len(dv.cmds) == 4
+    # results older than cache_ttl are fetched again and refresh the cache
+    show(cache=True, cache_ttl=0)
+    assert len(dv.cmds) == 5
+    show(cache=True)
+    assert len(dv.cmds) == 5
+    assert TestLibObject.CACHE_STATS['hits'] - stats['hits'] == 2
+    assert TestLibObject.CACHE_STATS['misses'] - stats['misses'] == 3
+    assert TestLibObject.CACHE_STATS['invalidations'] - stats['invalidations'] == 1
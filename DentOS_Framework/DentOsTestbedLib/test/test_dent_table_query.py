@@ -0,0 +1,89 @@
+import re
+import subprocess
+
+from dent_os_testbed.lib.bridge.linux.linux_bridge_fdb_impl import LinuxBridgeFdbImpl
+from dent_os_testbed.lib.ip.linux.linux_ip_neighbor_impl import LinuxIpNeighborImpl
+from dent_os_testbed.lib.ip.linux.linux_ip_route_impl import LinuxIpRouteImpl
+from dent_os_testbed.lib.table_query import TableQuery
+
+FDB = '''\
+00:11:22:33:44:55 dev swp1 vlan 10 master br0 extern_learn offload
+00:11:22:33:44:56 dev swp2 vlan 10 master br0 extern_learn offload
+00:11:22:33:44:57 dev swp2 master br0 permanent
+33:33:00:00:00:01 dev swp1 self permanent
+'''
+
+ROUTES = '''\
+default via 10.0.0.1 dev eth0 proto dhcp metric 100
+10.0.0.0/24 dev eth0 proto kernel scope link src 10.0.0.5 offload
+blackhole 10.1.0.0/24 proto static
+1.1.1.0/24 proto static metric 20
+\tnexthop via 10.0.0.2 dev eth0 weight 1
+\tnexthop via 10.0.0.3 dev eth1 weight 1 offload
+'''
+
+NEIGHBORS = '''\
+10.0.0.1 dev eth0 lladdr 00:11:22:33:44:55 REACHABLE
+10.0.0.2 dev eth0 lladdr 00:11:22:33:44:56 extern_learn offload STALE
+10.0.0.9 dev eth1  FAILED
+'''
+
+
+def run(impl, command, params, show, table, tmp_path):
+    # run the pipeline locally with the show command reading the sample table
+    path = tmp_path / 'table'
+    path.write_text(table)
+    cmd = impl.format_command(command=command, params=params)
+    assert cmd.startswith('sh -c \'' + show + '; ')
+    proc = subprocess.run(['sh', '-c', cmd.replace(show, 'cat ' + str(path), 1)], capture_output=True, text=True)
+    return proc.returncode, impl.parse_output(command=command, output=proc.stdout + proc.stderr, commands=cmd)
+
+
+def test_that_table_query_fdb(capfd, tmp_path):
+    impl = LinuxBridgeFdbImpl()
+    params = {'br': 'br0', 'where': {'extern_learn': True, 'offload': True}}
+    assert run(impl, 'count', params, 'bridge  fdb show br br0', FDB, tmp_path) == (0, 2)
+    params = {'where': {'dev': 'swp2'}, 'fields': ['mac', 'vlan']}
+    rows = [{'mac': '00:11:22:33:44:56', 'vlan': '10'}, {'mac': '00:11:22:33:44:57', 'vlan': None}]
+    assert run(impl, 'select', params, 'bridge  fdb show', FDB, tmp_path) == (0, rows)
+    params = {'where': {'mac': re.compile('^33:33'), 'permanent': True}}
+    rows = [{'entry': ['33:33:00:00:00:01', 'dev', 'swp1', 'self', 'permanent']}]
+    assert run(impl, 'select', params, 'bridge  fdb show', FDB, tmp_path) == (0, rows)
+
+
+def test_that_table_query_route(capfd, tmp_path):
+    impl = LinuxIpRouteImpl()
+    assert run(impl, 'count', {'where': {'type': 'unicast'}}, 'ip  route show', ROUTES, tmp_path) == (0, 3)
+    assert run(impl, 'count', {'where': {'offload': True}}, 'ip  route show', ROUTES, tmp_path) == (0, 2)
+    params = {'where': {'via': '10.0.0.3'}, 'fields': ['dst', 'type', 'metric', 'src']}
+    rows = [{'dst': '1.1.1.0/24', 'type': 'unicast', 'metric': '20', 'src': None}]
+    assert run(impl, 'select', params, 'ip  route show', ROUTES, tmp_path) == (0, rows)
+    params = {'where': {'type': ['blackhole', 'unreachable']}, 'fields': ['dst', 'proto']}
+    rows = [{'dst': '10.1.0.0/24', 'proto': 'static'}]
+    assert run(impl, 'select', params, 'ip  route show', ROUTES, tmp_path) == (0, rows)
+
+
+def test_that_table_query_neighbor(capfd, tmp_path):
+    impl = LinuxIpNeighborImpl()
+    params = {'device': 'eth0', 'where': {'state': ['REACHABLE', 'STALE']}, 'fields': ['dst', 'lladdr', 'state']}
+    rows = [
+        {'dst': '10.0.0.1', 'lladdr': '00:11:22:33:44:55', 'state': 'REACHABLE'},
+        {'dst': '10.0.0.2', 'lladdr': '00:11:22:33:44:56', 'state': 'STALE'},
+    ]
+    assert run(impl, 'select', params, 'ip neigh show dev eth0', NEIGHBORS, tmp_path) == (0, rows)
+    params = {'where': {'offload': False, 'lladdr': True}}
+    assert run(impl, 'count', params, 'ip neigh show', NEIGHBORS, tmp_path) == (0, 1)
+
+
+def test_that_table_query_parse(capfd):
+    # the exit status of the show command is kept and its errors are left out
+    query = TableQuery('mac')
+    proc = subprocess.run(['sh', '-c', query.pipeline('cat /nonexistent')], capture_output=True, text=True)
+    assert proc.returncode != 0
+    assert TableQuery.parse(proc.stdout + proc.stderr) == 0
+    proc = subprocess.run(['sh', '-c', query.pipeline('cat /nonexistent', count=False)], capture_output=True, text=True)
+    assert TableQuery.parse(proc.stdout + proc.stderr) == []
+    # chained pipelines
+    assert TableQuery.parse('#count\t3\n#count\t0\n') == [3, 0]
+    assert TableQuery.parse('#select\tmac\na\n#end\n#select\tmac\n#end\n') == [[{'mac': 'a'}], []]
+    assert TableQuery.parse('Cannot find device "br9"\n') is None
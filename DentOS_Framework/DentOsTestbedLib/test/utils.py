@@ -17,7 +17,7 @@ class TestDevice:
     async def is_connected(self):
         return True
 
-    async def run_cmd(self, cmd):
+    async def run_cmd(self, cmd, input=None):
         print('\n[' + self.name + '] Running ' + cmd + '\n')
         if 'ip -j address show' in cmd:
             address_show = [